@@ -0,0 +1,53 @@
+"""Add ingestion_jobs table
+
+Revision ID: 5d1c8e2f4a7b
+Revises: 0b29bc6a3890
+Create Date: 2025-11-10 10:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1c8e2f4a7b'
+down_revision: Union[str, Sequence[str], None] = '0b29bc6a3890'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ingestion_jobs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('job_type', sa.String(), nullable=False),
+    sa.Column('chat_id', sa.UUID(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('stage', sa.String(), nullable=False),
+    sa.Column('progress', sa.Float(), nullable=False),
+    sa.Column('chunks_added', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('locked_by', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['chat_id'], ['chats.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ingestion_jobs_claim', 'ingestion_jobs', ['status', 'priority', 'run_after'], unique=False)
+    op.create_index('ix_ingestion_jobs_chat_id', 'ingestion_jobs', ['chat_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ingestion_jobs_chat_id', table_name='ingestion_jobs')
+    op.drop_index('ix_ingestion_jobs_claim', table_name='ingestion_jobs')
+    op.drop_table('ingestion_jobs')
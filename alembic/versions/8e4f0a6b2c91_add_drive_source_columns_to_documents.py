@@ -0,0 +1,34 @@
+"""Add drive source columns to documents
+
+Revision ID: 8e4f0a6b2c91
+Revises: 5d1c8e2f4a7b
+Create Date: 2025-11-12 15:40:08.114952
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4f0a6b2c91'
+down_revision: Union[str, Sequence[str], None] = '5d1c8e2f4a7b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('documents', sa.Column('drive_file_id', sa.String(), nullable=True))
+    op.add_column('documents', sa.Column('drive_md5', sa.String(), nullable=True))
+    op.add_column('documents', sa.Column('drive_modified_time', sa.String(), nullable=True))
+    op.create_index(op.f('ix_documents_drive_file_id'), 'documents', ['drive_file_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_documents_drive_file_id'), table_name='documents')
+    op.drop_column('documents', 'drive_modified_time')
+    op.drop_column('documents', 'drive_md5')
+    op.drop_column('documents', 'drive_file_id')
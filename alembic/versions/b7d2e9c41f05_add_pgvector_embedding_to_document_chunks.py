@@ -0,0 +1,40 @@
+"""Add pgvector embedding to document_chunks
+
+Revision ID: b7d2e9c41f05
+Revises: 8e4f0a6b2c91
+Create Date: 2026-10-17 10:12:44.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e9c41f05'
+down_revision: Union[str, Sequence[str], None] = '8e4f0a6b2c91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS vector')
+    op.add_column('document_chunks', sa.Column('embedding', pgvector.sqlalchemy.vector.VECTOR(dim=384), nullable=True))
+    # The column is empty here, so the HNSW build is instant; rows are indexed as they are written or backfilled
+    op.create_index('ix_document_chunks_embedding_hnsw', 'document_chunks', ['embedding'], unique=False,
+                    postgresql_using='hnsw', postgresql_with={'m': 16, 'ef_construction': 64},
+                    postgresql_ops={'embedding': 'vector_cosine_ops'})
+    op.create_index('ix_document_chunks_document_id', 'document_chunks', ['document_id'], unique=False)
+    op.create_index('ix_chat_document_association_chat_id', 'chat_document_association', ['chat_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chat_document_association_chat_id', table_name='chat_document_association')
+    op.drop_index('ix_document_chunks_document_id', table_name='document_chunks')
+    op.drop_index('ix_document_chunks_embedding_hnsw', table_name='document_chunks')
+    op.drop_column('document_chunks', 'embedding')
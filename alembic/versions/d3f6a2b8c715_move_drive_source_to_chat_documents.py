@@ -0,0 +1,54 @@
+"""Move drive source columns from documents to chat_document_association
+
+Revision ID: d3f6a2b8c715
+Revises: b7d2e9c41f05
+Create Date: 2026-10-17 16:05:31.472810
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f6a2b8c715'
+down_revision: Union[str, Sequence[str], None] = 'b7d2e9c41f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chat_document_association', sa.Column('drive_file_id', sa.String(), nullable=True))
+    op.add_column('chat_document_association', sa.Column('drive_md5', sa.String(), nullable=True))
+    op.add_column('chat_document_association', sa.Column('drive_modified_time', sa.String(), nullable=True))
+    # Each chat holding a Drive document starts from the metadata of the shared row
+    op.execute("""
+        UPDATE chat_document_association AS a
+        SET drive_file_id = d.drive_file_id, drive_md5 = d.drive_md5, drive_modified_time = d.drive_modified_time
+        FROM documents AS d
+        WHERE d.id = a.document_id AND d.drive_file_id IS NOT NULL
+    """)
+    op.drop_index(op.f('ix_documents_drive_file_id'), table_name='documents')
+    op.drop_column('documents', 'drive_modified_time')
+    op.drop_column('documents', 'drive_md5')
+    op.drop_column('documents', 'drive_file_id')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('documents', sa.Column('drive_file_id', sa.String(), nullable=True))
+    op.add_column('documents', sa.Column('drive_md5', sa.String(), nullable=True))
+    op.add_column('documents', sa.Column('drive_modified_time', sa.String(), nullable=True))
+    op.create_index(op.f('ix_documents_drive_file_id'), 'documents', ['drive_file_id'], unique=False)
+    # A document synced into several chats keeps one of their sources
+    op.execute("""
+        UPDATE documents AS d
+        SET drive_file_id = a.drive_file_id, drive_md5 = a.drive_md5, drive_modified_time = a.drive_modified_time
+        FROM chat_document_association AS a
+        WHERE a.document_id = d.id AND a.drive_file_id IS NOT NULL
+    """)
+    op.drop_column('chat_document_association', 'drive_modified_time')
+    op.drop_column('chat_document_association', 'drive_md5')
+    op.drop_column('chat_document_association', 'drive_file_id')
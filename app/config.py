@@ -8,16 +8,96 @@ class Settings:
     ROOT_DIR: Path = Path(__file__).parent.parent.resolve()
     CHROMA_PATH: Path = ROOT_DIR / "chroma_db"
     DATA_DIR: Path = ROOT_DIR / "data"
+    PARSE_CACHE_DIR: Path = DATA_DIR / "parse_cache"
+    EMBEDDING_CACHE_DIR: Path = DATA_DIR / "embedding_cache"
+    EMBEDDING_EXPORT_DIR: Path = DATA_DIR / "embedding_models"
+    # Uploaded files wait here for the ingestion worker; the API and worker must share this directory
+    UPLOAD_DIR: Path = DATA_DIR / "uploads"
 
     # Document Processing
     MAX_CHUNKS_PER_DOCUMENT: int = 2000
+    MAX_CHUNKS_PER_WORKBOOK: int = 20000  # BOQ workbooks run to hundreds of thousands of rows
+    INGEST_BATCH_SIZE: int = 64  # chunks embedded and written per batch
+    PROGRESS_MAX_UPDATES_PER_SECOND: float = 2.0  # per upload job
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    # "words" is the word splitter (CHUNK_SIZE/CHUNK_OVERLAP); "tokens" opts in to chunks budgeted with the
+    # tiktoken cl100k tokenizer (CHUNK_SIZE_TOKENS/CHUNK_OVERLAP_TOKENS). Switching changes chunk boundaries
+    # for new uploads only, so a chat can end up with both shapes. cl100k tokens are not the embedder's
+    # word pieces: all-MiniLM-L6-v2 truncates at 256 of those, and 200 cl100k tokens of tender text can
+    # exceed it. Check a budget with `python -m benchmarks.chunking` (embedding coverage) before opting in.
+    CHUNKING_STRATEGY: str = "words"
+    CHUNK_SIZE_TOKENS: int = 200
+    CHUNK_OVERLAP_TOKENS: int = 30
+    CHUNK_ACROSS_PAGES: bool = False
     MAX_PDFS_PER_CHAT: int = 5
     MAX_EXCEL_PER_CHAT: int = 2
     MAX_PDF_SIZE_MB: int = 50
     MAX_EXCEL_SIZE_MB: int = 10
 
+    # Parallel PDF extraction (page ranges are spread across a process pool)
+    PDF_EXTRACTION_WORKERS: int = max(1, (os.cpu_count() or 1) - 1)
+    PDF_PAGE_BATCH_SIZE: int = 20
+
+    # Per-page OCR routing: pages with a sparse text layer that are mostly images are OCR'd
+    PDF_OCR_MAX_TEXT_DENSITY: float = 1.0  # characters per square inch
+    PDF_OCR_MIN_IMAGE_COVERAGE: float = 0.5  # fraction of the page area
+
+    # OCR: grayscale render at a DPI picked per page from glyph size or scan resolution
+    PDF_OCR_MIN_DPI: int = 150
+    PDF_OCR_MAX_DPI: int = 300
+    PDF_OCR_DEFAULT_DPI: int = 200
+    PDF_OCR_MAX_MEGAPIXELS: float = 16.0
+    PDF_OCR_TIMEOUT_SECONDS: float = 60.0  # per page; 0 disables the limit
+    PDF_OCR_PAGE_BATCH_SIZE: int = 2  # pages per pool task for scanned documents
+
+    # Table detection only runs on pages whose vector drawings have enough rulings to form a grid
+    PDF_TABLE_PREFILTER: bool = True
+    PDF_TABLE_MIN_RULINGS: int = 6
+
+    # Cache of per-page LlamaParse/OCR output, keyed by file hash and extractor version
+    PARSE_CACHE_MAX_MB: int = 2048
+
+    # Embeddings
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    EMBEDDING_DIMENSIONS: int = 384  # size of the document_chunks.embedding column used by pgvector
+    # "torch", "onnx" or "onnx-int8" (ONNX Runtime with dynamic int8 quantization for the given CPU target)
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_QUANTIZATION: str = "avx2"
+    # Chunk vectors keyed by content hash, shared by the API and workers; 0 disables the cache.
+    # Changing the size starts a new cache directory (the old one can be deleted)
+    EMBEDDING_CACHE_MAX_MB: int = 1024
+    QUERY_CACHE_SIZE: int = 2048  # query embeddings kept in memory per process; 0 disables
+    # Concurrent query embeddings are collected for up to EMBEDDING_BATCH_MAX_WAIT_MS and encoded together; 1 disables
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+    # Chunk embeddings are encoded in batches of similar length, each padded to at most this many word pieces; 0 uses fixed batches of 32
+    EMBEDDING_BUCKET_TOKEN_BUDGET: int = 8192
+    EMBEDDING_BUCKET_MAX_BATCH: int = 256
+
+    # Where chunk vectors live: "weaviate", or "pgvector" (an embedding column on document_chunks with an HNSW
+    # index, searched with one SQL query per chat message). Existing documents: `python -m app.db.backfill_pgvector`.
+    VECTOR_BACKEND: str = "weaviate"
+    PGVECTOR_EF_SEARCH: int = 100  # HNSW candidate list size per query
+    PGVECTOR_ITERATIVE_SCAN: str = "relaxed_order"  # keeps scanning the index until a chat has enough matches (pgvector 0.8+); "off" disables
+
+    # Weaviate layout: a Chat_<uuid> collection per chat, or (multi-tenancy) one collection with a tenant per chat.
+    # Existing per-chat collections are moved with `python -m app.db.migrate_weaviate_tenants`.
+    WEAVIATE_MULTI_TENANCY: bool = False
+    WEAVIATE_TENANT_COLLECTION: str = "ChatChunks"
+
+    # Ingestion worker (python -m app.worker); jobs are queued in Postgres
+    INGESTION_WORKER_PROCESSES: int = 2
+    INGESTION_WORKER_THREADS: int = 4  # concurrent jobs per process; threads share the embedding model
+    INGESTION_POLL_SECONDS: float = 2.0
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_RETRY_DELAY_SECONDS: float = 30.0  # multiplied by the attempt number
+    INGESTION_JOB_LEASE_SECONDS: float = 900.0  # a running job with no heartbeat for this long is requeued
+    INGESTION_PRIORITY_UPLOAD: int = 10
+    INGESTION_PRIORITY_DRIVE: int = 0
+    DRIVE_DOWNLOAD_CONCURRENCY: int = 4  # parallel file downloads per Drive import
+    DRIVE_SCAN_CONCURRENCY: int = 8  # folders listed in parallel when scanning a Drive tree
+
     # RAG
     RAG_TOP_K: int = 15
 
@@ -85,5 +165,56 @@ class Settings:
         self.ALGORITHM = os.getenv("JWT_ALGORITHM", self.ALGORITHM)
         self.ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", self.ACCESS_TOKEN_EXPIRE_MINUTES))
 
+        # Load document processing settings
+        self.CHUNKING_STRATEGY = os.getenv("CHUNKING_STRATEGY", self.CHUNKING_STRATEGY)
+        self.CHUNK_SIZE_TOKENS = int(os.getenv("CHUNK_SIZE_TOKENS", self.CHUNK_SIZE_TOKENS))
+        self.CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", self.CHUNK_OVERLAP_TOKENS))
+        self.CHUNK_ACROSS_PAGES = os.getenv("CHUNK_ACROSS_PAGES", str(self.CHUNK_ACROSS_PAGES)).lower() in ("1", "true", "yes")
+        self.MAX_CHUNKS_PER_WORKBOOK = int(os.getenv("MAX_CHUNKS_PER_WORKBOOK", self.MAX_CHUNKS_PER_WORKBOOK))
+        self.INGEST_BATCH_SIZE = max(1, int(os.getenv("INGEST_BATCH_SIZE", self.INGEST_BATCH_SIZE)))
+        self.PROGRESS_MAX_UPDATES_PER_SECOND = float(os.getenv("PROGRESS_MAX_UPDATES_PER_SECOND", self.PROGRESS_MAX_UPDATES_PER_SECOND))
+        self.PDF_EXTRACTION_WORKERS = max(1, int(os.getenv("PDF_EXTRACTION_WORKERS", self.PDF_EXTRACTION_WORKERS)))
+        self.PDF_PAGE_BATCH_SIZE = max(1, int(os.getenv("PDF_PAGE_BATCH_SIZE", self.PDF_PAGE_BATCH_SIZE)))
+        self.PDF_OCR_MAX_TEXT_DENSITY = float(os.getenv("PDF_OCR_MAX_TEXT_DENSITY", self.PDF_OCR_MAX_TEXT_DENSITY))
+        self.PDF_OCR_MIN_IMAGE_COVERAGE = float(os.getenv("PDF_OCR_MIN_IMAGE_COVERAGE", self.PDF_OCR_MIN_IMAGE_COVERAGE))
+        self.PDF_OCR_MIN_DPI = int(os.getenv("PDF_OCR_MIN_DPI", self.PDF_OCR_MIN_DPI))
+        self.PDF_OCR_MAX_DPI = int(os.getenv("PDF_OCR_MAX_DPI", self.PDF_OCR_MAX_DPI))
+        self.PDF_OCR_DEFAULT_DPI = int(os.getenv("PDF_OCR_DEFAULT_DPI", self.PDF_OCR_DEFAULT_DPI))
+        self.PDF_OCR_MAX_MEGAPIXELS = float(os.getenv("PDF_OCR_MAX_MEGAPIXELS", self.PDF_OCR_MAX_MEGAPIXELS))
+        self.PDF_OCR_TIMEOUT_SECONDS = float(os.getenv("PDF_OCR_TIMEOUT_SECONDS", self.PDF_OCR_TIMEOUT_SECONDS))
+        self.PDF_OCR_PAGE_BATCH_SIZE = max(1, int(os.getenv("PDF_OCR_PAGE_BATCH_SIZE", self.PDF_OCR_PAGE_BATCH_SIZE)))
+        self.PDF_TABLE_PREFILTER = os.getenv("PDF_TABLE_PREFILTER", str(self.PDF_TABLE_PREFILTER)).lower() in ("1", "true", "yes")
+        self.PDF_TABLE_MIN_RULINGS = int(os.getenv("PDF_TABLE_MIN_RULINGS", self.PDF_TABLE_MIN_RULINGS))
+        self.UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", self.UPLOAD_DIR))
+        self.PARSE_CACHE_DIR = Path(os.getenv("PARSE_CACHE_DIR", self.PARSE_CACHE_DIR))
+        self.PARSE_CACHE_MAX_MB = int(os.getenv("PARSE_CACHE_MAX_MB", self.PARSE_CACHE_MAX_MB))
+        self.EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", self.EMBEDDING_MODEL)
+        self.EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", self.EMBEDDING_BACKEND).lower()
+        self.EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", self.EMBEDDING_QUANTIZATION).lower()
+        self.EMBEDDING_EXPORT_DIR = Path(os.getenv("EMBEDDING_EXPORT_DIR", self.EMBEDDING_EXPORT_DIR))
+        self.EMBEDDING_CACHE_DIR = Path(os.getenv("EMBEDDING_CACHE_DIR", self.EMBEDDING_CACHE_DIR))
+        self.EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", self.EMBEDDING_CACHE_MAX_MB))
+        self.QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", self.QUERY_CACHE_SIZE))
+        self.EMBEDDING_BATCH_MAX_SIZE = max(1, int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", self.EMBEDDING_BATCH_MAX_SIZE)))
+        self.EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", self.EMBEDDING_BATCH_MAX_WAIT_MS))
+        self.EMBEDDING_BUCKET_TOKEN_BUDGET = int(os.getenv("EMBEDDING_BUCKET_TOKEN_BUDGET", self.EMBEDDING_BUCKET_TOKEN_BUDGET))
+        self.EMBEDDING_BUCKET_MAX_BATCH = max(1, int(os.getenv("EMBEDDING_BUCKET_MAX_BATCH", self.EMBEDDING_BUCKET_MAX_BATCH)))
+
+        self.VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", self.VECTOR_BACKEND).lower()
+        self.PGVECTOR_EF_SEARCH = max(1, int(os.getenv("PGVECTOR_EF_SEARCH", self.PGVECTOR_EF_SEARCH)))
+        self.PGVECTOR_ITERATIVE_SCAN = os.getenv("PGVECTOR_ITERATIVE_SCAN", self.PGVECTOR_ITERATIVE_SCAN).lower()
+        self.WEAVIATE_MULTI_TENANCY = os.getenv("WEAVIATE_MULTI_TENANCY", str(self.WEAVIATE_MULTI_TENANCY)).lower() in ("1", "true", "yes")
+        self.WEAVIATE_TENANT_COLLECTION = os.getenv("WEAVIATE_TENANT_COLLECTION", self.WEAVIATE_TENANT_COLLECTION)
+
+        # Load ingestion worker settings
+        self.INGESTION_WORKER_PROCESSES = max(1, int(os.getenv("INGESTION_WORKER_PROCESSES", self.INGESTION_WORKER_PROCESSES)))
+        self.INGESTION_WORKER_THREADS = max(1, int(os.getenv("INGESTION_WORKER_THREADS", self.INGESTION_WORKER_THREADS)))
+        self.INGESTION_POLL_SECONDS = float(os.getenv("INGESTION_POLL_SECONDS", self.INGESTION_POLL_SECONDS))
+        self.INGESTION_MAX_ATTEMPTS = max(1, int(os.getenv("INGESTION_MAX_ATTEMPTS", self.INGESTION_MAX_ATTEMPTS)))
+        self.INGESTION_RETRY_DELAY_SECONDS = float(os.getenv("INGESTION_RETRY_DELAY_SECONDS", self.INGESTION_RETRY_DELAY_SECONDS))
+        self.DRIVE_DOWNLOAD_CONCURRENCY = max(1, int(os.getenv("DRIVE_DOWNLOAD_CONCURRENCY", self.DRIVE_DOWNLOAD_CONCURRENCY)))
+        self.DRIVE_SCAN_CONCURRENCY = max(1, int(os.getenv("DRIVE_SCAN_CONCURRENCY", self.DRIVE_SCAN_CONCURRENCY)))
+        self.INGESTION_JOB_LEASE_SECONDS = float(os.getenv("INGESTION_JOB_LEASE_SECONDS", self.INGESTION_JOB_LEASE_SECONDS))
+
 # Singleton instance
 settings = Settings()
@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.embeddings import EmbeddingModel
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching front end for an embedding model.
+
+    Requests from concurrent threads (e.g. one per chat message being
+    answered) are queued; a single background thread takes the first waiting
+    request, collects whatever else arrives within `max_wait_ms` (up to
+    `max_batch_size` texts) and encodes them in one call. Each caller blocks
+    on its own future. One batched encode keeps the model's intra-op threads
+    busy instead of several small encodes fighting over them.
+    """
+
+    def __init__(self, model: EmbeddingModel, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.texts = 0
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def submit(self, text: str) -> Future:
+        """Queue a text; raises RuntimeError once the batcher is closed."""
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("EmbeddingBatcher is closed")
+            # Started on first use, so processes that never embed queries (the ingestion worker) have no idle thread
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+            self._queue.put((text, future))
+        return future
+
+    def encode_one(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Embed one text as part of whatever batch is being collected; blocks until it is done."""
+        return self.submit(text).result(timeout)
+
+    def _collect(self, first: Tuple[str, Future]) -> Tuple[List[Tuple[str, Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = self._collect(first)
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            # Identical texts in one batch (the same question from several chats) are encoded once
+            unique = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = self.model.encode(unique, batch_size=len(unique), show_progress_bar=False)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            by_text = dict(zip(unique, vectors))
+            for text, future in batch:
+                future.set_result(by_text[text])
+            self.batches += 1
+            self.texts += len(batch)
+
+    def close(self) -> None:
+        """Stop accepting texts; requests already queued are still encoded before the thread exits."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._thread is None:
+                return
+            self._queue.put(None)
+        self._thread.join(timeout=5)
@@ -0,0 +1,190 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.utils import ensure_directory_exists
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of chunk embeddings keyed by a hash of the chunk text.
+
+    Each model tag (model name and dimension) and capacity gets its own
+    directory holding a memory-mapped float32 matrix (`vectors.f32`, one row
+    per slot, created sparse at its full size) and a SQLite index (`index.db`)
+    mapping content hashes to slots. Changing the model or the size starts a
+    new cache, since the index of a larger cache holds slots past the end of
+    a smaller matrix.
+
+    The index is shared by every API and worker process. Slots are reserved
+    inside a write transaction (as rows that are not yet ready), filled in,
+    and then marked ready; readers only see ready rows. Once the matrix is
+    full, the least recently used entries give up their slots. Readers check
+    that their rows are still there after copying the vectors, so a slot that
+    was reclaimed and rewritten meanwhile is never served.
+
+    A process that dies between reserving and filling its slots leaves rows
+    that never become ready. Reservations older than RESERVATION_TIMEOUT_MS
+    are treated as abandoned: a later put of the same text takes the row
+    over, and otherwise the slot can be evicted like any ready entry.
+    """
+
+    # Bump when the on-disk layout changes
+    FORMAT_VERSION = 1
+    # Filling reserved slots takes milliseconds; a reservation this old belongs to a dead process
+    RESERVATION_TIMEOUT_MS = 10 * 60 * 1000
+
+    def __init__(self, cache_dir: Path, model_tag: str, dimensions: int, max_size_mb: int):
+        self.dimensions = dimensions
+        self.capacity = max(1, max_size_mb * 1024 * 1024 // (dimensions * 4))
+        safe_tag = re.sub(r'[^\w\-\.]', '_', f"{model_tag}-d{dimensions}-c{self.capacity}-f{self.FORMAT_VERSION}")
+        self.directory = Path(cache_dir) / safe_tag
+        self._lock = threading.Lock()
+        ensure_directory_exists(self.directory)
+
+        vectors_path = self.directory / "vectors.f32"
+        size = self.capacity * dimensions * 4
+        with open(vectors_path, "ab") as f:
+            if f.tell() != size:
+                f.truncate(size)  # sparse: disk is only used as slots are written
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, dimensions))
+
+        self._db = sqlite3.connect(self.directory / "index.db", timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, last_used INTEGER NOT NULL, ready INTEGER NOT NULL DEFAULT 0)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_entries_last_used ON entries (last_used)")
+        print(f"✅ Embedding cache at {self.directory} ({self.capacity} vectors max, {max_size_mb}MB)")
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _now() -> int:
+        # Milliseconds, so recency compares across processes
+        return time.time_ns() // 1_000_000
+
+    def _lookup(self, keys: List[str], condition: Optional[str] = "ready = 1", params: tuple = ()) -> Dict[str, int]:
+        slots = {}
+        # SQLite caps the number of bound parameters per statement
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            query = f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(part))})"
+            rows = self._db.execute(query + (f" AND {condition}" if condition else ""), [*part, *params])
+            slots.update(rows.fetchall())
+        return slots
+
+    def get_many(self, texts: List[str]) -> Dict[int, np.ndarray]:
+        """Cached vectors for the given texts, as {position in `texts`: vector}."""
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            slots = self._lookup(list(set(keys)))
+            if not slots:
+                return {}
+            found = list(slots)
+            rows = np.array(self._vectors[[slots[key] for key in found]])
+            # Drop anything whose slot was reclaimed while it was being copied
+            still_there = self._lookup(found)
+            vectors = {key: rows[i] for i, key in enumerate(found) if still_there.get(key) == slots[key]}
+            tick = self._now()
+            self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(tick, key) for key in vectors])
+        return {position: vectors[key] for position, key in enumerate(keys) if key in vectors}
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """Store vectors for texts not already cached, evicting least recently used entries when full."""
+        entries = {}
+        for text, vector in zip(texts, vectors):
+            entries.setdefault(self.key(text), vector)
+        if not entries:
+            return
+
+        with self._lock:
+            # Reserve slots (releasing evicted ones) under the database's write lock
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                tick = self._now()
+                abandoned_before = tick - self.RESERVATION_TIMEOUT_MS
+                existing = self._lookup(list(entries), condition=None)
+                # Our texts whose reservation was abandoned: take the row over, keeping its slot
+                reclaimed = self._lookup(list(existing), "ready = 0 AND last_used < ?", (abandoned_before,))
+                self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(tick, key) for key in reclaimed])
+                new_keys = [key for key in entries if key not in existing][:self.capacity]
+                if not new_keys and not reclaimed:
+                    self._db.execute("COMMIT")
+                    return
+                # The matrix fills up from the front; after that, slots come from evictions
+                next_slot = self._db.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM entries").fetchone()[0]
+                slots = list(range(next_slot, min(self.capacity, next_slot + len(new_keys))))
+                if len(slots) < len(new_keys):
+                    evicted = self._db.execute(
+                        "SELECT key, slot FROM entries WHERE ready = 1 OR last_used < ? ORDER BY last_used LIMIT ?",
+                        (abandoned_before, len(new_keys) - len(slots)),
+                    ).fetchall()
+                    self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+                    slots.extend(slot for _, slot in evicted)
+                new_keys = new_keys[:len(slots)]
+                self._db.executemany("INSERT INTO entries (key, slot, last_used, ready) VALUES (?, ?, ?, 0)",
+                                     [(key, slot, tick) for key, slot in zip(new_keys, slots)])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+            reserved = dict(zip(new_keys, slots), **reclaimed)
+            if not reserved:
+                return
+            self._vectors[list(reserved.values())] = np.stack([entries[key] for key in reserved])
+            self._vectors.flush()
+            self._db.executemany("UPDATE entries SET ready = 1 WHERE key = ? AND slot = ?", list(reserved.items()))
+
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU of query embeddings, keyed by whitespace-normalised query text.
+
+    Repeated questions (across chats, or re-sent after an error) skip the
+    encoder. Hit and miss counters are kept for the health endpoint.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        # The tokenizer ignores runs of whitespace, so this never changes the vector
+        return " ".join(query.split())
+
+    def get(self, query: str) -> Optional[List[float]]:
+        key = self.normalize(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, query: str, vector: List[float]) -> None:
+        key = self.normalize(query)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "max_size": self.max_entries}
@@ -0,0 +1,125 @@
+"""
+Embedding model backends.
+
+Everything that embeds text (VectorStoreManager, EmbeddingBatcher, the
+benchmarks) only relies on the `EmbeddingModel` protocol, i.e. the
+SentenceTransformer `encode` / `get_sentence_embedding_dimension` pair, so
+backends are interchangeable:
+
+- "torch": SentenceTransformer on PyTorch, as before.
+- "onnx": the same model exported to ONNX and run by ONNX Runtime.
+- "onnx-int8": the ONNX export with dynamic int8 quantization, for CPU nodes.
+
+ONNX exports are written once to EMBEDDING_EXPORT_DIR and reused by every
+process; export and quantization need the `optimum-onnx` package.
+"""
+import fcntl
+import re
+from pathlib import Path
+from typing import List, Protocol
+
+import numpy as np
+
+from app.utils import ensure_directory_exists
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+QUANTIZATION_TARGETS = ("arm64", "avx2", "avx512", "avx512_vnni")
+# Minimum per-text cosine similarity of a backend's vectors to the torch ones (parity test and benchmark)
+MIN_COSINE = {"torch": 1.0 - 1e-6, "onnx": 0.999, "onnx-int8": 0.98}
+
+
+class EmbeddingModel(Protocol):
+    def encode(self, sentences: List[str], batch_size: int = 32, show_progress_bar: bool = None, **kwargs) -> np.ndarray: ...
+
+    def get_sentence_embedding_dimension(self) -> int: ...
+
+
+def embedding_model_tag(model_name: str, backend: str, quantization: str) -> str:
+    """Identifies the vectors a backend produces, e.g. for the embedding cache (int8 vectors differ slightly)."""
+    if backend == "torch":
+        return model_name
+    if backend == "onnx-int8":
+        return f"{model_name}-onnx-int8-{quantization}"
+    return f"{model_name}-{backend}"
+
+
+def _export_onnx(model_name: str, export_dir: Path, quantization: str, quantize: bool) -> str:
+    """Export (and optionally quantize) the model under `export_dir` if not done yet; returns the file to load."""
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.backend import export_dynamic_quantized_onnx_model
+
+    ensure_directory_exists(export_dir)
+    quantized_file = f"onnx/model_int8_{quantization}.onnx"
+    # API and worker processes may start together; only one of them exports
+    with open(export_dir / ".export.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not (export_dir / "onnx" / "model.onnx").exists():
+            print(f"📦 Exporting {model_name} to ONNX at {export_dir}")
+            SentenceTransformer(model_name, backend="onnx", model_kwargs={"export": True}).save_pretrained(str(export_dir))
+        if quantize and not (export_dir / quantized_file).exists():
+            print(f"📦 Quantizing {model_name} to int8 ({quantization})")
+            model = SentenceTransformer(str(export_dir), backend="onnx", model_kwargs={"file_name": "onnx/model.onnx"})
+            export_dynamic_quantized_onnx_model(model, quantization, str(export_dir), file_suffix=f"int8_{quantization}")
+    return quantized_file if quantize else "onnx/model.onnx"
+
+
+def load_embedding_model(model_name: str, backend: str = "torch", export_dir: Path = None, quantization: str = "avx2") -> EmbeddingModel:
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}' (expected one of {', '.join(EMBEDDING_BACKENDS)})")
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if quantization not in QUANTIZATION_TARGETS:
+        raise ValueError(f"Unknown quantization target '{quantization}' (expected one of {', '.join(QUANTIZATION_TARGETS)})")
+
+    model_dir = Path(export_dir) / re.sub(r'[^\w\-\.]', '_', model_name)
+    file_name = _export_onnx(model_name, model_dir, quantization, quantize=backend == "onnx-int8")
+    return SentenceTransformer(str(model_dir), backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def token_lengths(model: EmbeddingModel, texts: List[str]) -> List[int]:
+    """Word-piece lengths as the model will see them (capped at its max_seq_length)."""
+    max_length = getattr(model, "max_seq_length", None) or 512
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        # Models without a tokenizer attribute: ~4 word pieces per 3 words, plus [CLS]/[SEP]
+        return [min(max_length, len(text.split()) * 4 // 3 + 2) for text in texts]
+    ids = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)["input_ids"]
+    return [len(piece) for piece in ids]
+
+
+def length_buckets(lengths: List[int], token_budget: int, max_batch_size: int, spread: float = 1.25) -> List[List[int]]:
+    """
+    Indices sorted by length and cut into batches whose padded size (texts x longest)
+    fits `token_budget`, and whose longest text is at most `spread` times the shortest.
+    """
+    batches = []
+    batch: List[int] = []
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # Sorted ascending, so the text being added is the longest in the batch
+        length = lengths[index]
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * length > token_budget
+                      or length > lengths[batch[0]] * spread + 8):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    return batches + [batch] if batch else batches
+
+
+def encode_bucketed(model: EmbeddingModel, texts: List[str], token_budget: int, max_batch_size: int) -> np.ndarray:
+    """
+    Encode texts in batches of similar token length, returning vectors in the original order.
+
+    Short table rows go through in large batches and long text chunks in small
+    ones, and no batch pads a one-line row out to the length of a full chunk.
+    """
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    vectors = None
+    for batch in length_buckets(token_lengths(model, texts), token_budget, max_batch_size):
+        encoded = model.encode([texts[i] for i in batch], batch_size=len(batch), show_progress_bar=False)
+        if vectors is None:
+            vectors = np.empty((len(texts), encoded.shape[1]), dtype=encoded.dtype)
+        vectors[batch] = encoded
+    return vectors
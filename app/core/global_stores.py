@@ -1,8 +1,48 @@
+from datetime import datetime
+from typing import Dict, Tuple
+from uuid import UUID
 
-from app.modules.askai.models.document import UploadJob
+from app.config import settings
+from app.core.progress import PROGRESS_CHANNEL, ProgressBus, ProgressReporter
+from app.db.database import SessionLocal
+from app.modules.askai.db.repository import IngestionJobRepository
+from app.modules.askai.models.document import ProgressEvent
 
 
-try:
-    upload_jobs: dict[str, UploadJob] = {}
-except Exception as e:
-    print(f"Failed to initialize upload_jobs: {e}")
+progress_bus = ProgressBus()
+
+# Jobs this worker process is running: job id -> (worker id, attempt) of its lease.
+# Their progress is written only while the lease holds, so a worker that lost a job
+# cannot overwrite the progress of the worker that took it over.
+job_leases: Dict[str, Tuple[str, int]] = {}
+
+def notify_job_changed(repo: IngestionJobRepository, job_id: str, chat_id: str) -> None:
+    """Tell API processes (see ProgressListener) that a job row changed."""
+    event = ProgressEvent(job_id=job_id, chat_id=chat_id, timestamp=datetime.now().timestamp())
+    repo.notify(PROGRESS_CHANNEL, event.model_dump_json(include={"job_id", "chat_id", "timestamp"}))
+
+def persist_progress_event(event: ProgressEvent) -> None:
+    """
+    Job store subscriber for worker processes: write a progress event to its
+    ingestion_jobs row and notify API processes. Not subscribed in the API,
+    which receives these events back through the listener.
+    """
+    fields = event.model_dump(mode="json", include={"status", "stage", "progress", "chunks_added", "error"}, exclude_none=True)
+    if event.finished_at:
+        fields["finished_at"] = datetime.fromisoformat(event.finished_at)
+    db = SessionLocal()
+    try:
+        repo = IngestionJobRepository(db)
+        lease = job_leases.get(event.job_id)
+        if fields and lease:
+            if not repo.update_leased(UUID(event.job_id), *lease, **fields):
+                return
+        elif fields:
+            # Download jobs are written by the Drive import that created them and hold no lease
+            repo.update(UUID(event.job_id), **fields)
+        notify_job_changed(repo, event.job_id, event.chat_id)
+    finally:
+        db.close()
+
+def get_progress_reporter(job_id: str, chat_id: str) -> ProgressReporter:
+    return ProgressReporter(progress_bus, job_id, chat_id, settings.PROGRESS_MAX_UPDATES_PER_SECOND)
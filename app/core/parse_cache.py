@@ -0,0 +1,81 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.utils import ensure_directory_exists
+
+
+class ParseCache:
+    """
+    On-disk cache of per-page extracted text.
+
+    Entries are keyed by file hash, extractor name and extractor version, so
+    bumping an extractor's version invalidates its old results. The directory
+    is kept under a size budget by evicting the least recently used entries
+    (reads refresh an entry's mtime).
+    """
+
+    def __init__(self, cache_dir: Path, max_size_mb: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        ensure_directory_exists(self.cache_dir)
+        print(f"✅ Parse cache at {self.cache_dir} (max {max_size_mb}MB)")
+
+    def _entry_path(self, file_hash: str, extractor: str, version: str) -> Path:
+        safe = lambda value: re.sub(r'[^\w\-\.]', '_', value)
+        return self.cache_dir / f"{safe(file_hash)}.{safe(extractor)}.{safe(version)}.json"
+
+    def _read(self, path: Path) -> Optional[Dict[int, str]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                pages = json.load(f)
+            now = time.time_ns()
+            os.utime(path, ns=(now, now))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return {int(page): text for page, text in pages.items()}
+
+    def get(self, file_hash: str, extractor: str, version: str) -> Optional[Dict[int, str]]:
+        """Return cached page texts, or None on a miss."""
+        pages = self._read(self._entry_path(file_hash, extractor, version))
+        if pages is not None:
+            print(f"📦 Parse cache hit: {extractor} ({len(pages)} pages)")
+        return pages
+
+    def put(self, file_hash: str, extractor: str, version: str, page_texts: Dict[int, str]) -> None:
+        """Store page texts, merging with any pages already cached for the same key."""
+        if not page_texts:
+            return
+        path = self._entry_path(file_hash, extractor, version)
+        with self._lock:
+            pages = self._read(path) or {}
+            pages.update(page_texts)
+            # Write to a temp file and rename so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({str(page): text for page, text in pages.items()}, f)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+            print(f"🗑️  Evicted parse cache entry {path.name}")
@@ -0,0 +1,154 @@
+import select
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from app.modules.askai.models.document import ProcessingStage, ProcessingStatus, ProgressEvent
+
+Subscriber = Callable[[ProgressEvent], None]
+
+# Postgres NOTIFY channel that ingestion workers publish job changes on
+PROGRESS_CHANNEL = "ingestion_progress"
+
+
+class ProgressBus:
+    """In-process publish/subscribe channel for upload job progress events."""
+
+    def __init__(self):
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """Register a callback; returns a function that unsubscribes it.
+
+        Callbacks run synchronously on the publishing thread and must be quick.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def publish(self, event: ProgressEvent) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"⚠️  Progress subscriber error for job {event.job_id}: {e}")
+
+
+class ProgressReporter:
+    """
+    Reports progress for a single job.
+
+    Progress updates within a stage are coalesced to at most
+    `max_updates_per_second`; stage changes and status changes are always
+    published, and a coalesced update is flushed before them so subscribers
+    never miss the last value of a stage.
+    """
+
+    def __init__(self, bus: ProgressBus, job_id: str, chat_id: str, max_updates_per_second: float):
+        self.bus = bus
+        self.job_id = job_id
+        self.chat_id = chat_id
+        self.min_interval = 1.0 / max_updates_per_second if max_updates_per_second > 0 else 0.0
+        self._stage: Optional[ProcessingStage] = None
+        self._last_published = 0.0
+        self._pending: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _publish(self, **fields) -> None:
+        self.bus.publish(ProgressEvent(job_id=self.job_id, chat_id=self.chat_id, timestamp=time.time(), **fields))
+
+    def update(self, stage: ProcessingStage, progress: float) -> None:
+        progress = round(min(max(progress, 0.0), 100.0), 1)
+        with self._lock:
+            now = time.monotonic()
+            if stage != self._stage:
+                self._flush_locked()
+                print(f"📄 Job {self.job_id}: {stage.value}")
+            elif now - self._last_published < self.min_interval:
+                self._pending = progress
+                return
+            self._stage = stage
+            self._last_published = now
+            self._pending = None
+        self._publish(stage=stage, progress=progress)
+
+    def _flush_locked(self) -> None:
+        if self._pending is not None and self._stage is not None:
+            self._publish(stage=self._stage, progress=self._pending)
+            self._pending = None
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def set_status(self, status: ProcessingStatus, **fields) -> None:
+        """Publish a status change (e.g. processing, finished, failed) along with any other job fields."""
+        self.flush()
+        if status in (ProcessingStatus.FINISHED, ProcessingStatus.FAILED):
+            fields.setdefault("finished_at", datetime.now().isoformat())
+        print(f"📄 Job {self.job_id}: {status.value}")
+        self._publish(status=status, **fields)
+
+
+class ProgressListener:
+    """
+    Relays job change notifications from ingestion worker processes onto a
+    local ProgressBus, using Postgres LISTEN/NOTIFY.
+
+    Runs on a daemon thread with its own connection and reconnects if the
+    connection drops.
+    """
+
+    def __init__(self, dsn: str, bus: ProgressBus, channel: str = PROGRESS_CHANNEL):
+        self.dsn = dsn
+        self.bus = bus
+        self.channel = channel
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="progress-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+                print(f"✅ Listening for job progress on '{self.channel}'")
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            self.bus.publish(ProgressEvent.model_validate_json(notify.payload))
+                        except ValueError as e:
+                            print(f"⚠️  Ignoring malformed progress notification: {e}")
+            except psycopg2.Error as e:
+                print(f"⚠️  Progress listener connection error: {e}; reconnecting")
+                self._stop.wait(5)
+            finally:
+                if conn is not None:
+                    conn.close()
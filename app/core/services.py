@@ -4,14 +4,19 @@ from google.generativeai.generative_models import GenerativeModel
 import tiktoken
 import weaviate
 import google.generativeai as genai
-from sentence_transformers import SentenceTransformer
 from llama_parse import LlamaParse
 from weaviate.client import WeaviateClient
 
 from app.config import settings
 from app.modules.askai.models.document import UploadJob
 from app.modules.askai.services.document_service import PDFProcessor, ExcelProcessor
-from app.db.vector_store import VectorStoreManager
+from app.db.database import SessionLocal
+from app.db.pgvector_store import PgVectorStore
+from app.db.vector_store import BaseVectorStore, VectorStoreManager
+from app.core.embedding_batcher import EmbeddingBatcher
+from app.core.embedding_cache import EmbeddingCache
+from app.core.embeddings import embedding_model_tag, load_embedding_model
+from app.core.parse_cache import ParseCache
 
 print("--- Initializing Core Services ---")
 
@@ -20,26 +25,43 @@ try:
     llm_model = GenerativeModel("gemini-2.0-flash-exp")
     print("✅ Gemini 2.0 Flash configured")
 
-    embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-    print("✅ SentenceTransformer loaded")
+    embedding_model = load_embedding_model(settings.EMBEDDING_MODEL, settings.EMBEDDING_BACKEND,
+                                           settings.EMBEDDING_EXPORT_DIR, settings.EMBEDDING_QUANTIZATION)
+    print(f"✅ SentenceTransformer loaded ({settings.EMBEDDING_BACKEND} backend)")
+
+    embedding_cache: Optional[EmbeddingCache] = None
+    if settings.EMBEDDING_CACHE_MAX_MB > 0:
+        model_tag = embedding_model_tag(settings.EMBEDDING_MODEL, settings.EMBEDDING_BACKEND, settings.EMBEDDING_QUANTIZATION)
+        embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_DIR, model_tag,
+                                         embedding_model.get_sentence_embedding_dimension(), settings.EMBEDDING_CACHE_MAX_MB)
+
+    # Query embeddings from concurrent chat requests are encoded in shared micro-batches
+    embedding_batcher: Optional[EmbeddingBatcher] = None
+    if settings.EMBEDDING_BATCH_MAX_SIZE > 1:
+        embedding_batcher = EmbeddingBatcher(embedding_model, settings.EMBEDDING_BATCH_MAX_SIZE, settings.EMBEDDING_BATCH_MAX_WAIT_MS)
 
     # This will be initialized in the startup event.
     weaviate_client: Optional[WeaviateClient] = None
-    vector_store: Optional[VectorStoreManager] = None
-
-    try:
-        weaviate_client = weaviate.connect_to_local()
-        if not weaviate_client.is_ready():
-            raise Exception("Weaviate is not ready")
-        print("✅ Weaviate client connected")
-        vector_store = VectorStoreManager(weaviate_client, embedding_model)
-    except Exception as e:
-        print(f"❌ Could not connect to Weaviate: {e}")
-        weaviate_client = None
+    vector_store: Optional[BaseVectorStore] = None
+
+    if settings.VECTOR_BACKEND == "pgvector":
+        vector_store = PgVectorStore(SessionLocal, embedding_model, embedding_cache, embedding_batcher)
+    else:
+        try:
+            weaviate_client = weaviate.connect_to_local()
+            if not weaviate_client.is_ready():
+                raise Exception("Weaviate is not ready")
+            print("✅ Weaviate client connected")
+            vector_store = VectorStoreManager(weaviate_client, embedding_model, embedding_cache, embedding_batcher)
+        except Exception as e:
+            print(f"❌ Could not connect to Weaviate: {e}")
+            weaviate_client = None
     
     tokenizer = tiktoken.get_encoding("cl100k_base")
 
-    pdf_processor = PDFProcessor(embedding_model, tokenizer)
+    parse_cache = ParseCache(settings.PARSE_CACHE_DIR, settings.PARSE_CACHE_MAX_MB)
+
+    pdf_processor = PDFProcessor(embedding_model, tokenizer, parse_cache)
     excel_processor = ExcelProcessor(embedding_model, tokenizer) 
     
     # This mimics the legacy global state for now. Will be replaced in Phase 3 with Redis.
@@ -0,0 +1,65 @@
+"""
+Embed document_chunks rows that have no embedding yet, for switching an
+existing deployment to VECTOR_BACKEND=pgvector.
+
+    python -m app.db.backfill_pgvector --dry-run
+    python -m app.db.backfill_pgvector --batch-size 512
+
+Chunks are re-embedded from their stored content (nothing is re-parsed) with
+the configured EMBEDDING_* model and cache, and committed batch by batch, so
+an interrupted run picks up where it stopped. Rollout:
+
+1. Run `alembic upgrade head` (embedding column and HNSW index).
+2. Run the backfill while the app still uses Weaviate.
+3. Set VECTOR_BACKEND=pgvector and restart the API and workers.
+4. Run the backfill again to pick up chunks written in between.
+"""
+import argparse
+import time
+
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.core.embedding_cache import EmbeddingCache
+from app.core.embeddings import embedding_model_tag, load_embedding_model
+from app.db.database import SessionLocal
+from app.db.pgvector_store import PgVectorStore
+from app.modules.askai.db.models import DocumentChunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=settings.INGEST_BATCH_SIZE, help="chunks embedded and committed together")
+    parser.add_argument("--dry-run", action="store_true", help="count the chunks that would be embedded")
+    args = parser.parse_args()
+
+    missing = select(DocumentChunk.id, DocumentChunk.content).where(DocumentChunk.embedding.is_(None))
+    with SessionLocal() as db:
+        total = db.execute(select(func.count()).select_from(missing.subquery())).scalar_one()
+    print(f"📂 {total} chunks without an embedding")
+    if args.dry_run or not total:
+        return
+
+    embedding_model = load_embedding_model(settings.EMBEDDING_MODEL, settings.EMBEDDING_BACKEND,
+                                           settings.EMBEDDING_EXPORT_DIR, settings.EMBEDDING_QUANTIZATION)
+    embedding_cache = None
+    if settings.EMBEDDING_CACHE_MAX_MB > 0:
+        model_tag = embedding_model_tag(settings.EMBEDDING_MODEL, settings.EMBEDDING_BACKEND, settings.EMBEDDING_QUANTIZATION)
+        embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_DIR, model_tag,
+                                         embedding_model.get_sentence_embedding_dimension(), settings.EMBEDDING_CACHE_MAX_MB)
+    vector_store = PgVectorStore(SessionLocal, embedding_model, embedding_cache)
+
+    done, start = 0, time.perf_counter()
+    while True:
+        # Each batch commits, so the next query only sees chunks still missing a vector
+        with SessionLocal() as db:
+            rows = db.execute(missing.order_by(DocumentChunk.id).limit(args.batch_size)).all()
+        if not rows:
+            break
+        done += vector_store.add_chunks(None, [{"id": chunk_id, "content": content} for chunk_id, content in rows])
+        print(f"  {done}/{total} chunks embedded ({done / (time.perf_counter() - start):.0f}/s)")
+    print(f"✅ Backfill complete: {done} chunks embedded")
+
+
+if __name__ == "__main__":
+    main()
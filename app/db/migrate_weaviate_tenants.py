@@ -0,0 +1,111 @@
+"""
+Move per-chat Weaviate collections (Chat_<uuid>) into the multi-tenant
+collection (WEAVIATE_TENANT_COLLECTION), one tenant per chat.
+
+    python -m app.db.migrate_weaviate_tenants --dry-run
+    python -m app.db.migrate_weaviate_tenants
+    python -m app.db.migrate_weaviate_tenants --delete-source
+
+Objects are copied with their stored vectors and UUIDs, so nothing is
+re-embedded and re-running the copy is idempotent. Rollout:
+
+1. Run the copy while the app still uses per-chat collections.
+2. Set WEAVIATE_MULTI_TENANCY=true and restart the API and workers.
+3. Run the copy again to pick up chunks written in between.
+4. Run with --delete-source; a source collection is only deleted once its
+   tenant holds the same number of objects.
+
+Collections whose chat no longer exists in Postgres are skipped (and
+deleted with --delete-source).
+"""
+import argparse
+import uuid
+from typing import Dict, Optional
+
+import weaviate
+
+from app.config import settings
+from app.db.database import SessionLocal
+from app.db.vector_store import VectorStoreManager
+from app.modules.askai.db.models import Chat
+
+
+def chat_id_for(collection_name: str) -> Optional[str]:
+    if not collection_name.startswith("Chat_"):
+        return None
+    try:
+        return str(uuid.UUID(hex=collection_name[len("Chat_"):]))
+    except ValueError:
+        return None
+
+
+def object_count(collection) -> int:
+    return collection.aggregate.over_all(total_count=True).total_count or 0
+
+
+def migrate_collection(vector_store: VectorStoreManager, name: str, chat_id: str, dry_run: bool, delete_source: bool) -> Dict:
+    source = vector_store.client.collections.get(name)
+    expected = object_count(source)
+    if dry_run:
+        print(f"  {name} -> tenant {chat_id}: {expected} objects")
+        return {"collection": name, "objects": expected, "status": "dry_run"}
+
+    target = vector_store._load_tenant(chat_id)
+    copied = 0
+    with target.batch.dynamic() as batch:
+        for obj in source.iterator(include_vector=True):
+            vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+            batch.add_object(properties=obj.properties, vector=vector, uuid=obj.uuid)
+            copied += 1
+    failed = len(target.batch.failed_objects)
+    actual = object_count(target)
+
+    status = "copied" if actual == expected and not failed else "incomplete"
+    if status == "copied" and delete_source:
+        vector_store.client.collections.delete(name)
+        status = "moved"
+    print(f"{'✅' if status != 'incomplete' else '❌'} {name} -> tenant {chat_id}: {copied} copied, {failed} failed, "
+          f"{actual}/{expected} in tenant ({status})")
+    return {"collection": name, "objects": expected, "copied": copied, "failed": failed, "status": status}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="list what would be copied")
+    parser.add_argument("--delete-source", action="store_true", help="delete each per-chat collection once its tenant is complete")
+    args = parser.parse_args()
+
+    client = weaviate.connect_to_local()
+    db = SessionLocal()
+    try:
+        vector_store = VectorStoreManager(client, None)
+        chat_ids = {str(chat_id) for (chat_id,) in db.query(Chat.id)}
+        names = sorted(name for name in client.collections.list_all(simple=True) if chat_id_for(name))
+        print(f"📂 {len(names)} per-chat collections, {len(chat_ids)} chats in Postgres")
+
+        results = []
+        for name in names:
+            chat_id = chat_id_for(name)
+            if chat_id not in chat_ids:
+                if args.delete_source and not args.dry_run:
+                    client.collections.delete(name)
+                print(f"🗑️  {name}: chat no longer exists, {'deleted' if args.delete_source and not args.dry_run else 'skipped'}")
+                continue
+            try:
+                results.append(migrate_collection(vector_store, name, chat_id, args.dry_run, args.delete_source))
+            except Exception as e:
+                print(f"❌ {name}: {e}")
+                results.append({"collection": name, "status": "error", "error": str(e)})
+
+        incomplete = [r["collection"] for r in results if r["status"] in ("incomplete", "error")]
+        print(f"--- {len(results) - len(incomplete)}/{len(results)} collections migrated to {settings.WEAVIATE_TENANT_COLLECTION} ---")
+        if incomplete:
+            print(f"❌ Re-run for: {', '.join(incomplete)}")
+            raise SystemExit(1)
+    finally:
+        db.close()
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
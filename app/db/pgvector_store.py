@@ -0,0 +1,111 @@
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, text, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.core.embedding_batcher import EmbeddingBatcher
+from app.core.embedding_cache import EmbeddingCache
+from app.core.embeddings import EmbeddingModel
+from app.db.vector_store import BaseVectorStore
+from app.modules.askai.db.models import DocumentChunk, chat_document_association
+
+
+class ChatScope:
+    """pgvector "collection": chunks belong to documents, so a chat is just the documents linked to it."""
+
+    def __init__(self, chat_id: str):
+        self.chat_id = chat_id
+        self.name = f"chat {chat_id}"
+
+
+class PgVectorStore(BaseVectorStore):
+    """
+    Vectors in Postgres (VECTOR_BACKEND=pgvector): each document_chunks row carries its
+    embedding, indexed with HNSW, and a chat is searched with one query joined through
+    chat_document_association. Vectors belong to documents, so a document shared by
+    several chats is stored and embedded once, and linking it to a chat copies nothing.
+    """
+
+    def __init__(self, session_factory: sessionmaker, embedding_model: EmbeddingModel, embedding_cache: Optional[EmbeddingCache] = None,
+                 embedding_batcher: Optional[EmbeddingBatcher] = None):
+        super().__init__(embedding_model, embedding_cache, embedding_batcher)
+        dimensions = embedding_model.get_sentence_embedding_dimension() if embedding_model else settings.EMBEDDING_DIMENSIONS
+        if dimensions != settings.EMBEDDING_DIMENSIONS:
+            raise ValueError(f"{settings.EMBEDDING_MODEL} produces {dimensions}-d vectors but document_chunks.embedding "
+                             f"holds {settings.EMBEDDING_DIMENSIONS} (EMBEDDING_DIMENSIONS)")
+        self.session_factory = session_factory
+        print("✅ PgVectorStore initialized")
+
+    def get_or_create_collection(self, chat_id: str, refresh: bool = False) -> ChatScope:
+        return ChatScope(chat_id)
+
+    def add_chunks(self, collection: ChatScope, chunks: List[Dict], stats: Optional[Dict] = None) -> int:
+        """
+        Embed chunks. New chunks get their vector in chunk["embedding"], which
+        DocumentRepository.add_chunks writes with the row; chunks that already
+        exist (carrying their row "id") are updated in place.
+        """
+        if not chunks:
+            return 0
+        vectors = self.embed([chunk["content"] for chunk in chunks], stats)
+        existing = []
+        for chunk, vector in zip(chunks, vectors):
+            if "id" in chunk:
+                existing.append({"chunk_id": chunk["id"], "embedding": vector})
+            else:
+                chunk["embedding"] = vector
+        if existing:
+            with self.session_factory() as db:
+                db.connection().execute(
+                    update(DocumentChunk.__table__).where(DocumentChunk.__table__.c.id == bindparam("chunk_id")), existing)
+                db.commit()
+        return len(chunks)
+
+    def _set_search_options(self, db: Session) -> None:
+        # SET LOCAL: only for this transaction, so pooled connections are not affected
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.PGVECTOR_EF_SEARCH)}"))
+        if settings.PGVECTOR_ITERATIVE_SCAN in ("relaxed_order", "strict_order"):
+            # Without it HNSW returns ef_search candidates from all chats and the chat filter can leave fewer than n_results
+            db.execute(text(f"SET LOCAL hnsw.iterative_scan = {settings.PGVECTOR_ITERATIVE_SCAN}"))
+
+    def query(self, collection: ChatScope, query: str, n_results: int = settings.RAG_TOP_K) -> List[Tuple]:
+        """Query the chat's chunks by cosine distance"""
+        try:
+            query_embedding = self.embed_query(query)
+            distance = DocumentChunk.embedding.cosine_distance(query_embedding)
+            statement = (
+                select(DocumentChunk.content, DocumentChunk.chunk_metadata, distance.label("distance"))
+                .join(chat_document_association, chat_document_association.c.document_id == DocumentChunk.document_id)
+                .where(chat_document_association.c.chat_id == collection.chat_id, DocumentChunk.embedding.is_not(None))
+                .order_by(distance)
+                .limit(n_results)
+            )
+            with self.session_factory() as db:
+                self._set_search_options(db)
+                rows = db.execute(statement).all()
+
+            results = []
+            for content, metadata, chunk_distance in rows:
+                properties = {key: metadata.get(key, "unknown") for key in ("source", "doc_id", "doc_type", "type")} if metadata else {}
+                properties["page"] = str((metadata or {}).get("page", "0"))
+                properties["content"] = content
+                results.append((content, properties, 1 - chunk_distance))
+            return self._dedupe(results)
+
+        except Exception as e:
+            print(f"❌ pgvector query error: {e}")
+            return []
+
+    def copy_document(self, source: ChatScope, target: ChatScope, doc_id: str) -> int:
+        """Nothing to copy: the vectors belong to the document. Returns how many of its chunks have one."""
+        with self.session_factory() as db:
+            return db.query(DocumentChunk).filter(DocumentChunk.document_id == doc_id, DocumentChunk.embedding.is_not(None)).count()
+
+    def delete_document(self, collection: ChatScope, doc_id: str) -> None:
+        # Vectors live on the document's chunk rows and go when the document (or its chat link) is removed
+        pass
+
+    def delete_collection(self, chat_id: str) -> None:
+        # A chat's scope is its chat_document_association rows, removed with the chat
+        pass
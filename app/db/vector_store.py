@@ -1,83 +1,257 @@
 import re
+import threading
 import uuid
 import traceback
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 
+import numpy as np
 import weaviate
 import weaviate.classes.config as wvc
+from weaviate.classes.query import Filter
+from weaviate.classes.tenants import Tenant
 from weaviate.client import WeaviateClient
 from weaviate.collections.collection import Collection
 from app.config import settings
+from app.core.embedding_batcher import EmbeddingBatcher
+from app.core.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from app.core.embeddings import EmbeddingModel, encode_bucketed
 
-class VectorStoreManager:
-    """Manages Weaviate collections"""
+class BaseVectorStore:
+    """
+    Vector backend interface (VECTOR_BACKEND): chunk and query embedding, shared by
+    every backend, plus the storage operations each backend implements.
+
+    A "collection" is whatever handle the backend uses to scope a chat's chunks
+    (a Weaviate collection or tenant, or a chat id for pgvector); callers only
+    pass it back to the same store.
+    """
+
+    def __init__(self, embedding_model: EmbeddingModel, embedding_cache: Optional[EmbeddingCache] = None,
+                 embedding_batcher: Optional[EmbeddingBatcher] = None):
+        self.embedding_model = embedding_model
+        self.embedding_cache = embedding_cache
+        self.embedding_batcher = embedding_batcher
+        self.query_cache = QueryEmbeddingCache(settings.QUERY_CACHE_SIZE) if settings.QUERY_CACHE_SIZE > 0 else None
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if settings.EMBEDDING_BUCKET_TOKEN_BUDGET > 0:
+            return encode_bucketed(self.embedding_model, texts, settings.EMBEDDING_BUCKET_TOKEN_BUDGET, settings.EMBEDDING_BUCKET_MAX_BATCH)
+        return self.embedding_model.encode(texts, show_progress_bar=True, batch_size=32)
+
+    def embed(self, texts: List[str], stats: Optional[Dict] = None) -> np.ndarray:
+        """
+        Embed chunk texts. Texts already in the embedding cache skip the encoder;
+        hits and misses are added to `stats` (embedding_cache_hits/_misses) when given.
+        """
+        if not self.embedding_cache:
+            return self._encode(texts)
+
+        try:
+            cached = self.embedding_cache.get_many(texts)
+        except Exception as e:
+            print(f"⚠️  Embedding cache read failed: {e}")
+            cached = {}
+        missing = [i for i in range(len(texts)) if i not in cached]
+        vectors = np.empty((len(texts), self.embedding_cache.dimensions), dtype=np.float32)
+        for i, vector in cached.items():
+            vectors[i] = vector
+        if missing:
+            encoded = self._encode([texts[i] for i in missing])
+            vectors[missing] = encoded
+            try:
+                self.embedding_cache.put_many([texts[i] for i in missing], encoded)
+            except Exception as e:
+                print(f"⚠️  Embedding cache write failed: {e}")
+
+        if stats is not None:
+            stats["embedding_cache_hits"] = stats.get("embedding_cache_hits", 0) + len(cached)
+            stats["embedding_cache_misses"] = stats.get("embedding_cache_misses", 0) + len(missing)
+        return vectors
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a search query, served from the in-process LRU when the same query was seen recently.
+        Misses go through the embedding batcher, if any, so concurrent requests share one encode.
+        """
+        if self.query_cache:
+            vector = self.query_cache.get(query)
+            if vector is not None:
+                return vector
+        if self.embedding_batcher:
+            vector = self.embedding_batcher.encode_one(query).tolist()
+        else:
+            vector = self.embedding_model.encode([query])[0].tolist()
+        if self.query_cache:
+            self.query_cache.put(query, vector)
+        return vector
+
+    def get_or_create_collection(self, chat_id: str, refresh: bool = False):
+        raise NotImplementedError
+
+    def add_chunks(self, collection, chunks: List[Dict], stats: Optional[Dict] = None) -> int:
+        raise NotImplementedError
+
+    def query(self, collection, query: str, n_results: int = settings.RAG_TOP_K) -> List[Tuple]:
+        """Returns (content, properties, similarity) tuples, best first"""
+        raise NotImplementedError
+
+    def copy_document(self, source, target, doc_id: str) -> int:
+        raise NotImplementedError
+
+    def delete_document(self, collection, doc_id: str) -> None:
+        raise NotImplementedError
+
+    def delete_collection(self, chat_id: str) -> None:
+        raise NotImplementedError
+
+    @staticmethod
+    def _dedupe(results: List[Tuple]) -> List[Tuple]:
+        """Drop repeated chunks (overlapping or re-uploaded content) and sort by similarity"""
+        results_list = []
+        seen_content = set()
+        for doc, properties, similarity in results:
+            content_hash = doc[:100]
+            if content_hash in seen_content: continue
+            seen_content.add(content_hash)
+            results_list.append((doc, properties, similarity))
+        results_list.sort(key=lambda x: x[2], reverse=True)
+        return results_list
+
+
+class VectorStoreManager(BaseVectorStore):
+    """Manages Weaviate collections (one per chat, or one tenant per chat with WEAVIATE_MULTI_TENANCY)"""
     
-    def __init__(self, weaviate_client: WeaviateClient, embedding_model):
+    def __init__(self, weaviate_client: WeaviateClient, embedding_model: EmbeddingModel, embedding_cache: Optional[EmbeddingCache] = None,
+                 embedding_batcher: Optional[EmbeddingBatcher] = None):
+        super().__init__(embedding_model, embedding_cache, embedding_batcher)
         self.client = weaviate_client
-        self.embedding_model = embedding_model
+        self._collections: Dict[str, Collection] = {}
+        self._collections_lock = threading.Lock()
         print("✅ VectorStoreManager initialized")
     
-    def get_or_create_collection(self, chat_id: str) -> Collection:
-        """Get or create collection for chat in Weaviate."""
+    @staticmethod
+    def collection_name(chat_id: str) -> str:
+        # Weaviate collection names must start with an uppercase letter and cannot contain hyphens.
+        return f"Chat_{chat_id.replace('-', '')}"
+
+    @staticmethod
+    def _is_missing_collection(error: Exception, collection_name: str) -> bool:
+        message = str(error).lower()
+        return collection_name.lower() in message and ("not found" in message or "could not find" in message)
+
+    def get_or_create_collection(self, chat_id: str, refresh: bool = False) -> Collection:
+        """
+        Get or create collection for chat in Weaviate.
+
+        With WEAVIATE_MULTI_TENANCY the chat is a tenant of one shared collection
+        and the returned handle is scoped to it; otherwise each chat has its own
+        Chat_<uuid> collection.
+
+        Handles are cached per process, so the query path makes no existence check.
+        Writers pass `refresh=True` to re-check, since another process (the API
+        removing a chat's last document) may have deleted the collection since.
+        """
         if not self.client:
             raise Exception("Weaviate client not initialized")
-        # Weaviate collection names must start with an uppercase letter and cannot contain hyphens.
-        collection_name = f"Chat_{chat_id.replace('-', '')}"
-        
-        if self.client.collections.exists(collection_name):
-            print(f"📂 Retrieved Weaviate collection: {collection_name}")
-            return self.client.collections.get(collection_name)
-        
-        print(f"📂 Creating Weaviate collection: {collection_name}")
+        key = chat_id if settings.WEAVIATE_MULTI_TENANCY else self.collection_name(chat_id)
+        if not refresh:
+            collection = self._collections.get(key)
+            if collection is not None:
+                return collection
+        return self._load_tenant(chat_id) if settings.WEAVIATE_MULTI_TENANCY else self._load_collection(key)
+
+    @staticmethod
+    def _chunk_properties() -> List[wvc.Property]:
         # Note: 'page' is stored as TEXT because it can be 'unknown'.
-        return self.client.collections.create(
-            name=collection_name,
-            properties=[
-                wvc.Property(name="content", data_type=wvc.DataType.TEXT),
-                wvc.Property(name="source", data_type=wvc.DataType.TEXT),
-                wvc.Property(name="page", data_type=wvc.DataType.TEXT),
-                wvc.Property(name="doc_id", data_type=wvc.DataType.TEXT),
-                wvc.Property(name="doc_type", data_type=wvc.DataType.TEXT),
-                wvc.Property(name="type", data_type=wvc.DataType.TEXT),
-            ],
-            vectorizer_config=wvc.Configure.Vectorizer.none(),
-        )
-    
-    def add_chunks(self, collection: Collection, chunks: List[Dict]) -> int:
-        """Add chunks to Weaviate collection"""
+        return [
+            wvc.Property(name="content", data_type=wvc.DataType.TEXT),
+            wvc.Property(name="source", data_type=wvc.DataType.TEXT),
+            wvc.Property(name="page", data_type=wvc.DataType.TEXT),
+            wvc.Property(name="doc_id", data_type=wvc.DataType.TEXT),
+            wvc.Property(name="doc_type", data_type=wvc.DataType.TEXT),
+            wvc.Property(name="type", data_type=wvc.DataType.TEXT),
+        ]
+
+    def _load_collection(self, collection_name: str, multi_tenant: bool = False) -> Collection:
+        with self._collections_lock:
+            if self.client.collections.exists(collection_name):
+                print(f"📂 Retrieved Weaviate collection: {collection_name}")
+                collection = self.client.collections.get(collection_name)
+            else:
+                print(f"📂 Creating Weaviate collection: {collection_name}")
+                try:
+                    collection = self.client.collections.create(
+                        name=collection_name,
+                        properties=self._chunk_properties(),
+                        vectorizer_config=wvc.Configure.Vectorizer.none(),
+                        # Writes to a missing tenant create it, so a stale handle cannot lose chunks
+                        multi_tenancy_config=wvc.Configure.multi_tenancy(
+                            enabled=True, auto_tenant_creation=True, auto_tenant_activation=True) if multi_tenant else None,
+                    )
+                except Exception:
+                    # Another process (API or worker) created it first
+                    if not self.client.collections.exists(collection_name):
+                        raise
+                    collection = self.client.collections.get(collection_name)
+            self._collections[collection_name] = collection
+        return collection
+
+    def _shared_collection(self) -> Collection:
+        collection = self._collections.get(settings.WEAVIATE_TENANT_COLLECTION)
+        if collection is None:
+            collection = self._load_collection(settings.WEAVIATE_TENANT_COLLECTION, multi_tenant=True)
+        return collection
+
+    def _load_tenant(self, chat_id: str) -> Collection:
+        shared = self._shared_collection()
+        if not shared.tenants.exists(chat_id):
+            print(f"📂 Creating Weaviate tenant {chat_id} in {shared.name}")
+            try:
+                shared.tenants.create([Tenant(name=chat_id)])
+            except Exception:
+                if not shared.tenants.exists(chat_id):
+                    raise
+        collection = shared.with_tenant(chat_id)
+        self._collections[chat_id] = collection
+        return collection
+
+    def add_chunks(self, collection: Collection, chunks: List[Dict], stats: Optional[Dict] = None) -> int:
+        """Add chunks to Weaviate collection; `stats` collects embedding cache hits and misses.
+
+        Raises if embedding fails or any object fails to import, so the caller can
+        remove the partly indexed document instead of recording chunks without vectors.
+        """
         if not self.client or not chunks:
             return 0
         
-        try:
-            data_objects = []
-            for chunk in chunks:
-                properties = {
-                    "content": chunk["content"],
-                    "source": chunk["metadata"].get("source", "unknown"),
-                    "page": str(chunk["metadata"].get("page", "0")),
-                    "doc_id": chunk["metadata"].get("doc_id", "unknown"),
-                    "doc_type": chunk["metadata"].get("doc_type", "unknown"),
-                    "type": chunk["metadata"].get("type", "unknown"),
-                }
-                data_objects.append(properties)
-            
-            content_for_embedding = [obj["content"] for obj in data_objects]
-            vectors = self.embedding_model.encode(content_for_embedding, show_progress_bar=True, batch_size=32)
-
-            with collection.batch.dynamic() as batch:
-                for i, data_obj in enumerate(data_objects):
-                    batch.add_object(
-                        properties=data_obj,
-                        vector=vectors[i]
-                    )
-            
-            print(f"✅ Added {len(data_objects)} chunks to Weaviate collection {collection.name}")
-            return len(data_objects)
+        data_objects = []
+        for chunk in chunks:
+            properties = {
+                "content": chunk["content"],
+                "source": chunk["metadata"].get("source", "unknown"),
+                "page": str(chunk["metadata"].get("page", "0")),
+                "doc_id": chunk["metadata"].get("doc_id", "unknown"),
+                "doc_type": chunk["metadata"].get("doc_type", "unknown"),
+                "type": chunk["metadata"].get("type", "unknown"),
+            }
+            data_objects.append(properties)
+        
+        content_for_embedding = [obj["content"] for obj in data_objects]
+        vectors = self.embed(content_for_embedding, stats)
 
-        except Exception as e:
-            print(f"❌ Error adding chunks to Weaviate: {e}")
-            traceback.print_exc()
-            return 0
+        with collection.batch.dynamic() as batch:
+            for i, data_obj in enumerate(data_objects):
+                batch.add_object(
+                    properties=data_obj,
+                    vector=vectors[i]
+                )
+        
+        failed = len(collection.batch.failed_objects)
+        if failed:
+            raise Exception(f"Adding chunks to {collection.name} failed for {failed}/{len(data_objects)} chunks: "
+                            f"{collection.batch.failed_objects[0].message}")
+        print(f"✅ Added {len(data_objects)} chunks to Weaviate collection {collection.name}")
+        return len(data_objects)
     
     def query(self, collection: Collection, query: str, n_results: int = settings.RAG_TOP_K) -> List[Tuple]:
         """Query Weaviate collection"""
@@ -85,43 +259,102 @@ class VectorStoreManager:
             return []
             
         try:
-            query_embedding = self.embedding_model.encode([query]).tolist()
+            query_embedding = self.embed_query(query)
             
             response = collection.query.near_vector(
-                near_vector=query_embedding[0],
+                near_vector=query_embedding,
                 limit=n_results,
                 include_vector=False
             )
             
-            results_list = []
-            seen_content = set()
-            
+            results = []
             for obj in response.objects:
-                doc = obj.properties.get("content", "")
-                content_hash = doc[:100]
-                if content_hash in seen_content: continue
-                seen_content.add(content_hash)
-                
                 # Weaviate `distance` is cosine distance. Similarity = 1 - distance.
                 similarity = 0
                 if obj.metadata and obj.metadata.distance is not None:
                     similarity = 1 - obj.metadata.distance
-                
-                results_list.append((doc, obj.properties, similarity))
-
-            results_list.sort(key=lambda x: x[2], reverse=True)
-            return results_list
+                results.append((obj.properties.get("content", ""), obj.properties, similarity))
+            return self._dedupe(results)
             
         except Exception as e:
+            key = collection.tenant or collection.name
+            if self._is_missing_collection(e, key):
+                # Deleted by another process since it was cached; recreate it (it is empty, so no results)
+                print(f"⚠️  Weaviate collection {key} no longer exists, recreating it")
+                self._collections.pop(key, None)
+                try:
+                    if collection.tenant:
+                        self._load_tenant(collection.tenant)
+                    else:
+                        self._load_collection(collection.name)
+                except Exception as create_error:
+                    print(f"❌ Could not recreate Weaviate collection {collection.name}: {create_error}")
+                return []
             print(f"❌ Weaviate query error: {e}")
             traceback.print_exc()
             return []
     
+    def copy_document(self, source: Collection, target: Collection, doc_id: str, page_size: int = 500) -> int:
+        """Copy a document's chunks and their stored vectors between collections without re-embedding.
+
+        Raises if any object fails to import; the partial copy is removed from `target` first.
+        """
+        if not self.client:
+            return 0
+        
+        copied = 0
+        offset = 0
+        with target.batch.dynamic() as batch:
+            while True:
+                response = source.query.fetch_objects(
+                    filters=Filter.by_property("doc_id").equal(doc_id),
+                    include_vector=True,
+                    limit=page_size,
+                    offset=offset,
+                )
+                for obj in response.objects:
+                    vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+                    batch.add_object(properties=obj.properties, vector=vector)
+                copied += len(response.objects)
+                if len(response.objects) < page_size:
+                    break
+                offset += page_size
+        
+        failed = len(target.batch.failed_objects)
+        if failed:
+            # Don't leave a partial copy that would be reported as linked
+            self.delete_document(target, doc_id)
+            raise Exception(f"Copying document {doc_id} to {target.name} failed for {failed}/{copied} chunks: "
+                            f"{target.batch.failed_objects[0].message}")
+        print(f"✅ Copied {copied} chunks of document {doc_id} from {source.name} to {target.name}")
+        return copied
+
+    def delete_document(self, collection: Collection, doc_id: str) -> None:
+        """Delete all chunks of a document from a Weaviate collection"""
+        if not self.client:
+            return
+        try:
+            result = collection.data.delete_many(where=Filter.by_property("doc_id").equal(doc_id))
+            print(f"🗑️  Deleted {result.successful} chunks of document {doc_id} from {collection.name}")
+        except Exception as e:
+            print(f"⚠️  Error deleting document {doc_id} from Weaviate: {e}")
+
     def delete_collection(self, chat_id: str):
         """Delete Weaviate collection"""
         if not self.client:
             return
-        collection_name = f"Chat_{chat_id.replace('-', '')}"
+        if settings.WEAVIATE_MULTI_TENANCY:
+            self._collections.pop(chat_id, None)
+            try:
+                shared = self._shared_collection()
+                if shared.tenants.exists(chat_id):
+                    shared.tenants.remove([chat_id])
+                    print(f"🗑️  Deleted Weaviate tenant {chat_id} from {shared.name}")
+            except Exception as e:
+                print(f"⚠️  Error deleting Weaviate tenant: {e}")
+            return
+        collection_name = self.collection_name(chat_id)
+        self._collections.pop(collection_name, None)
         try:
             if self.client.collections.exists(collection_name):
                 self.client.collections.delete(collection_name)
@@ -41,6 +41,12 @@ def create_app() -> FastAPI:
         # Initialize database clients within the startup event
         from app.core import services
         
+        # Relay job progress from the ingestion worker (app/worker.py) to SSE streams
+        from app.core.global_stores import progress_bus
+        from app.core.progress import ProgressListener
+        app.state.progress_listener = ProgressListener(settings.DATABASE_URL, progress_bus)
+        app.state.progress_listener.start()
+        
         # Table creation is now managed by Alembic migrations.
         # The create_db_and_tables() function is no longer called on startup.
         
@@ -49,10 +55,15 @@ def create_app() -> FastAPI:
     @app.on_event("shutdown")
     async def shutdown_event():
         print("--- Application Shutdown ---")
-        from app.core.services import weaviate_client
+        app.state.progress_listener.stop()
+        from app.core.services import weaviate_client, pdf_processor, embedding_batcher
+        if embedding_batcher:
+            embedding_batcher.close()
         if weaviate_client:
             weaviate_client.close()
             print("Weaviate client closed.")
+        pdf_processor.close()
+        print("PDF extraction pool closed.")
         print("--- Shutdown Complete ---")
 
     app.include_router(api_v1_router, prefix="/api/v1")
@@ -1,7 +1,8 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, JSON, Table, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, JSON, Table, Integer, Float, Index
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
+from pgvector.sqlalchemy import Vector
 
 from app.db.database import Base
 from app.config import settings
@@ -9,7 +10,13 @@ from app.config import settings
 # Association table for the many-to-many relationship between Chat and Document
 chat_document_association = Table('chat_document_association', Base.metadata,
     Column('chat_id', UUID(as_uuid=True), ForeignKey('chats.id')),
-    Column('document_id', UUID(as_uuid=True), ForeignKey('documents.id'))
+    Column('document_id', UUID(as_uuid=True), ForeignKey('documents.id')),
+    # Source file for documents imported from Google Drive, used by incremental sync. Kept per
+    # chat: chats share a document by content hash but may sync it from different Drive files.
+    Column('drive_file_id', String),
+    Column('drive_md5', String),
+    Column('drive_modified_time', String),
+    Index('ix_chat_document_association_chat_id', 'chat_id'),
 )
 
 class Chat(Base):
@@ -53,5 +60,40 @@ class DocumentChunk(Base):
     document_id = Column(UUID(as_uuid=True), ForeignKey('documents.id'), nullable=False)
     content = Column(Text, nullable=False)
     chunk_metadata = Column(JSON)
+    # Only filled with VECTOR_BACKEND=pgvector; deferred so loading chunks does not pull the vectors
+    embedding = deferred(Column(Vector(settings.EMBEDDING_DIMENSIONS)))
     
     document = relationship("Document", back_populates="chunks")
+
+    __table_args__ = (
+        Index('ix_document_chunks_document_id', 'document_id'),
+        Index('ix_document_chunks_embedding_hnsw', 'embedding', postgresql_using='hnsw',
+              postgresql_with={'m': 16, 'ef_construction': 64}, postgresql_ops={'embedding': 'vector_cosine_ops'}),
+    )
+
+class IngestionJob(Base):
+    """A unit of background ingestion work (a PDF to process, a Drive folder to import), claimed by app.worker."""
+    __tablename__ = 'ingestion_jobs'
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    job_type = Column(String, nullable=False)  # 'pdf' or 'drive_folder'
+    chat_id = Column(UUID(as_uuid=True), ForeignKey('chats.id', ondelete='CASCADE'), nullable=False)
+    filename = Column(String, nullable=False)
+    payload = Column(JSON, default={})
+    priority = Column(Integer, nullable=False, default=0)  # higher runs first
+    status = Column(String, nullable=False, default="queued")
+    stage = Column(String, nullable=False, default="not_processing")
+    progress = Column(Float, nullable=False, default=0)
+    chunks_added = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False)
+    locked_by = Column(String)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_ingestion_jobs_claim', 'status', 'priority', 'run_after'),
+        Index('ix_ingestion_jobs_chat_id', 'chat_id'),
+    )
@@ -1,10 +1,16 @@
 from uuid import UUID
-from typing import List, Optional
+from typing import Dict, List, NamedTuple, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from datetime import datetime
+from sqlalchemy import desc, insert, or_, select, text, update
+from datetime import datetime, timedelta
 
-from .models import Chat, Message, Document
+from .models import Chat, Message, Document, DocumentChunk, IngestionJob, chat_document_association
+
+class DriveSource(NamedTuple):
+    """The Drive file a chat's document was imported from."""
+    file_id: str
+    md5: Optional[str]
+    modified_time: Optional[str]
 
 class ChatRepository:
     def __init__(self, db: Session):
@@ -56,6 +62,15 @@ class ChatRepository:
         self.db.refresh(chat)
         return chat
 
+    def set_drive_folder(self, chat: Chat, folder_data: dict) -> Chat:
+        """Replace the stored structure of a linked folder (or add it if it is new)."""
+        # Assign a new list; in-place edits of a JSON column are not tracked
+        others = [folder for folder in (chat.drive_folders or []) if folder['id'] != folder_data['id']]
+        chat.drive_folders = others + [folder_data]
+        self.db.commit()
+        self.db.refresh(chat)
+        return chat
+
 class DocumentRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -65,6 +80,47 @@ class DocumentRepository:
         chat.updated_at = datetime.now()
         self.db.commit()
 
+    def add_chunks(self, document: Document, chunks: List[dict]) -> None:
+        # Core insert keeps the rows out of the session's identity map, so memory
+        # stays flat while a large document streams in batch by batch.
+        rows = [{"document_id": document.id, "content": chunk["content"], "chunk_metadata": chunk["metadata"]} for chunk in chunks]
+        if any("embedding" in chunk for chunk in chunks):
+            # Set by the pgvector store when it embedded the batch
+            for row, chunk in zip(rows, chunks):
+                row["embedding"] = chunk.get("embedding")
+        self.db.execute(insert(DocumentChunk), rows)
+        self.db.commit()
+
+    def finalize(self, document: Document, status: str, processing_stats: dict) -> None:
+        document.status = status
+        document.processing_stats = processing_stats
+        self.db.commit()
+
+    def delete(self, document: Document) -> None:
+        self.db.delete(document)
+        self.db.commit()
+
+    def set_drive_metadata(self, chat: Chat, document: Document, file_id: str, md5: Optional[str], modified_time: Optional[str]) -> None:
+        """Record the Drive file the chat's copy of `document` came from (other chats sharing it are unaffected)."""
+        self.db.execute(
+            update(chat_document_association)
+            .where(chat_document_association.c.chat_id == chat.id, chat_document_association.c.document_id == document.id)
+            .values(drive_file_id=file_id, drive_md5=md5, drive_modified_time=modified_time)
+        )
+        self.db.commit()
+
+    def get_drive_sources(self, chat_id: UUID) -> Dict[UUID, DriveSource]:
+        """Drive metadata of the chat's documents imported from Drive, by document id."""
+        rows = self.db.execute(
+            select(chat_document_association.c.document_id, chat_document_association.c.drive_file_id,
+                   chat_document_association.c.drive_md5, chat_document_association.c.drive_modified_time)
+            .where(chat_document_association.c.chat_id == chat_id, chat_document_association.c.drive_file_id.is_not(None))
+        )
+        return {row.document_id: DriveSource(row.drive_file_id, row.drive_md5, row.drive_modified_time) for row in rows}
+
+    def get_by_hash(self, file_hash: str) -> Optional[Document]:
+        return self.db.query(Document).filter(Document.file_hash == file_hash).first()
+
     def find_by_filename_for_chat(self, chat_id: UUID, filename: str) -> Optional[Document]:
         return self.db.query(Document).filter(Document.filename == filename, Document.chats.any(id=chat_id)).first()
 
@@ -77,3 +133,152 @@ class DocumentRepository:
             self.db.delete(document)
         
         self.db.commit()
+
+class IngestionJobRepository:
+    """Postgres-backed job queue. Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create(self, job_type: str, chat_id: UUID, filename: str, payload: dict, priority: int = 0,
+               max_attempts: int = 3, status: str = "queued", **fields) -> IngestionJob:
+        now = datetime.now()
+        job = IngestionJob(
+            job_type=job_type,
+            chat_id=chat_id,
+            filename=filename,
+            payload=payload,
+            priority=priority,
+            max_attempts=max_attempts,
+            status=status,
+            run_after=now,
+            created_at=now,
+            updated_at=now,
+            **fields,
+        )
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+
+    def get_by_id(self, job_id: UUID) -> Optional[IngestionJob]:
+        return self.db.get(IngestionJob, job_id)
+
+    def get_for_chat(self, chat_id: UUID, job_types: List[str], finished_since: datetime) -> List[IngestionJob]:
+        """Jobs that are still pending, plus those that finished or failed after `finished_since`."""
+        return (
+            self.db.query(IngestionJob)
+            .filter(
+                IngestionJob.chat_id == chat_id,
+                IngestionJob.job_type.in_(job_types),
+                or_(IngestionJob.finished_at.is_(None), IngestionJob.finished_at >= finished_since),
+            )
+            .order_by(IngestionJob.created_at)
+            .all()
+        )
+
+    def claim_next(self, worker_id: str) -> Optional[IngestionJob]:
+        """Atomically take the highest-priority runnable job, or return None if there is none."""
+        job = self.db.execute(
+            select(IngestionJob)
+            .where(IngestionJob.status == "queued", IngestionJob.run_after <= datetime.now())
+            .order_by(desc(IngestionJob.priority), IngestionJob.run_after)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if not job:
+            self.db.rollback()
+            return None
+        job.status = "processing"
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.error = None
+        job.updated_at = datetime.now()
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+
+    def update(self, job_id: UUID, **fields) -> None:
+        """Write job fields without loading the row. Running jobs are written through update_leased instead."""
+        self.db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(**{"updated_at": datetime.now(), **fields}))
+        self.db.commit()
+
+    def _leased(self, job_id: UUID, worker_id: str, attempt: int):
+        """Row filter matching the job only while it is still running under this worker's claim."""
+        return (IngestionJob.id == job_id, IngestionJob.status == "processing",
+                IngestionJob.locked_by == worker_id, IngestionJob.attempts == attempt)
+
+    def update_leased(self, job_id: UUID, worker_id: str, attempt: int, **fields) -> bool:
+        """Like update, but only while this worker still holds the job. Returns False if it lost the lease."""
+        result = self.db.execute(
+            update(IngestionJob).where(*self._leased(job_id, worker_id, attempt)).values(**{"updated_at": datetime.now(), **fields})
+        )
+        self.db.commit()
+        return result.rowcount == 1
+
+    def heartbeat(self, job_id: UUID, worker_id: str, attempt: int) -> bool:
+        """Extend a running job's lease. Returns False if the job was requeued or claimed by another worker."""
+        return self.update_leased(job_id, worker_id, attempt)
+
+    def finish(self, job_id: UUID, worker_id: str, attempt: int, chunks_added: int) -> bool:
+        """Mark the job finished. Returns False (and changes nothing) if this worker no longer holds it."""
+        now = datetime.now()
+        result = self.db.execute(
+            update(IngestionJob)
+            .where(*self._leased(job_id, worker_id, attempt))
+            .values(status="finished", progress=100, chunks_added=chunks_added, locked_by=None, updated_at=now, finished_at=now)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+
+    def fail(self, job_id: UUID, worker_id: str, attempt: int, error: str, retry_delay_seconds: float,
+             retry: bool = True) -> Optional[str]:
+        """
+        Requeue the job with a delay if `retry` is set and it has attempts left, otherwise mark it failed.
+        Returns the new status ("queued" or "failed"), or None if this worker no longer holds the job.
+        """
+        now = datetime.now()
+        leased = self._leased(job_id, worker_id, attempt)
+        if retry:
+            result = self.db.execute(
+                update(IngestionJob)
+                .where(*leased, IngestionJob.attempts < IngestionJob.max_attempts)
+                .values(status="queued", stage="not_processing", progress=0, error=error, locked_by=None,
+                        updated_at=now, run_after=now + timedelta(seconds=retry_delay_seconds))
+            )
+            if result.rowcount == 1:
+                self.db.commit()
+                return "queued"
+        result = self.db.execute(
+            update(IngestionJob).where(*leased).values(status="failed", error=error, locked_by=None, updated_at=now, finished_at=now)
+        )
+        self.db.commit()
+        return "failed" if result.rowcount == 1 else None
+
+    def requeue_stale(self, lease_seconds: float) -> int:
+        """Recover jobs whose worker stopped heartbeating (crashed or was killed mid-job).
+
+        Running jobs are kept alive by the worker's heartbeat (see heartbeat),
+        so a job only goes stale when its worker is gone. They are requeued while they have attempts left and failed otherwise.
+        Files left mid-download are failed outright; re-running the Drive
+        import fetches them again.
+        """
+        now = datetime.now()
+        stale = IngestionJob.updated_at < now - timedelta(seconds=lease_seconds)
+        self.db.execute(
+            update(IngestionJob)
+            .where(stale, or_(IngestionJob.status == "downloading",
+                              (IngestionJob.status == "processing") & (IngestionJob.attempts >= IngestionJob.max_attempts)))
+            .values(status="failed", error="Worker stopped responding", locked_by=None, updated_at=now, finished_at=now)
+        )
+        result = self.db.execute(
+            update(IngestionJob)
+            .where(stale, IngestionJob.status == "processing")
+            .values(status="queued", stage="not_processing", progress=0, locked_by=None, updated_at=now)
+        )
+        self.db.commit()
+        return result.rowcount
+
+    def notify(self, channel: str, payload: str) -> None:
+        self.db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+        self.db.commit()
@@ -1,6 +1,6 @@
 from uuid import UUID
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Body, status, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Body, status, Depends
 from sqlalchemy.orm import Session
 from app.modules.askai.models.chat import ChatMetadata, Message, NewMessageRequest, NewMessageResponse, RenameChatRequest, CreateNewChatRequest
 from app.modules.askai.services import chat_service, rag_service
@@ -15,12 +15,14 @@ def get_chats(db: Session = Depends(get_db_session)):
 
 @router.post("/chats", response_model=ChatMetadata, status_code=status.HTTP_201_CREATED, tags=["AskAI - Chats"])
 def create_chat(
-        background_tasks: BackgroundTasks,
         db: Session = Depends(get_db_session),
         payload: Optional[CreateNewChatRequest] = None,
     ):
     """Create a new chat session and start importing documents from Google Drive"""
-    return chat_service.create_new_chat(db, payload, background_tasks)
+    try:
+        return chat_service.create_new_chat(db, payload)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.get("/chats/{chat_id}", response_model=List[Message], tags=["AskAI - Chats"])
 def get_chat(chat_id: UUID, db: Session = Depends(get_db_session)):
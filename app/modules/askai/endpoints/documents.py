@@ -1,28 +1,59 @@
 from typing import List
-import uuid
-import tempfile
 import os
-import stat
+import uuid
 import asyncio
 import json
-from fastapi import APIRouter, HTTPException, Path, UploadFile, File, BackgroundTasks, status, Depends, Request
+from fastapi import APIRouter, HTTPException, Path, UploadFile, File, status, Depends, Request
 from sse_starlette.sse import EventSourceResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from app.modules.askai.models.document import AddDriveRequest, ChatDocumentsResponse, DriveFolder, ProcessingJob, ProcessingStage, ProcessingStatus, UploadAcceptedResponse, DocumentMetadata, UploadJob
+from app.modules.askai.models.document import AddDriveRequest, ChatDocumentsResponse, DriveFolder, ProcessingJob, UploadAcceptedResponse, DocumentMetadata, ProgressEvent, UploadJob
 from app.modules.askai.db.models import Chat as SQLChat, Document as SQLDocument
+from app.modules.askai.db.repository import DocumentRepository, IngestionJobRepository
 from app.core.services import vector_store
-from app.core.global_stores import upload_jobs
+from app.core.global_stores import progress_bus
 from app.db.database import get_db_session
 from app.config import settings
-from app.modules.askai.services import drive_service, chat_service
-from app.modules.askai.services.document_processing_service import process_uploaded_pdf
+from app.modules.askai.services import drive_service, chat_service, ingestion_service
+from app.modules.askai.services.document_processing_service import link_existing_document
 
 router = APIRouter()
 
+SSE_REFRESH_SECONDS = 5
+
+async def _accept_upload(db: Session, chat: SQLChat, upload: UploadFile, filename: str, suffix: str, max_bytes: int) -> dict:
+    """Stream an upload to disk, then link it to an identical existing document or queue it for the ingestion worker."""
+
+    # Stream to disk; only one chunk of the upload is in memory at a time
+    try:
+        upload_path, file_hash, _ = await ingestion_service.receive_upload(upload, suffix, max_bytes)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Could not save uploaded file: {e}")
+
+    # Same content already processed (possibly for another chat): link it, skip parsing and embedding
+    existing_document = DocumentRepository(db).get_by_hash(file_hash)
+    if existing_document:
+        ingestion_service.remove_upload(str(upload_path))
+        if any(doc.id == existing_document.id for doc in chat.documents):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"'{existing_document.filename}' already uploaded")
+        try:
+            # Copies every vector of the document; keep it off the event loop
+            chunks_added = await run_in_threadpool(link_existing_document, db, chat, existing_document)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        job = ingestion_service.record_finished_upload(db, chat.id, filename, chunks_added)
+        return {"message": "Upload accepted", "job_id": str(job.id), "processing": False}
+
+    # Hand off to the ingestion worker; the hash travels with the job so the file is not re-read to compute it
+    job = ingestion_service.enqueue_document(db, chat.id, filename, str(upload_path), file_hash)
+
+    return {"message": "Upload accepted", "job_id": str(job.id), "processing": True}
+
 @router.post("/chats/{chat_id}/upload-pdf", response_model=UploadAcceptedResponse, status_code=status.HTTP_202_ACCEPTED, tags=["AskAI - Documents"])
 async def upload_pdf(
     chat_id: uuid.UUID,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db_session),
     pdf: UploadFile = File(..., description="The PDF file to upload", alias="pdf")
 ):
@@ -34,42 +65,36 @@ async def upload_pdf(
     if not chat:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
 
-    if len(chat.documents) >= settings.MAX_PDFS_PER_CHAT:
+    if sum(1 for doc in chat.documents if doc.doc_type == 'pdf') >= settings.MAX_PDFS_PER_CHAT:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Maximum {settings.MAX_PDFS_PER_CHAT} PDFs per chat")
 
     if any(doc.filename == pdf.filename for doc in chat.documents):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"PDF '{pdf.filename}' already uploaded")
 
-    # Save to a temporary file
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            content = await pdf.read()
-            if len(content) > settings.MAX_PDF_SIZE_MB * 1024 * 1024:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"File too large. Max: {settings.MAX_PDF_SIZE_MB}MB")
-            
-            tmp.write(content)
-            temp_path = tmp.name
-        
-        os.chmod(temp_path, stat.S_IRUSR | stat.S_IWUSR)
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Could not save uploaded file: {e}")
+    return await _accept_upload(db, chat, pdf, pdf.filename or "unknown-file.pdf", ".pdf", settings.MAX_PDF_SIZE_MB * 1024 * 1024)
 
-    # Start background processing
-    job_id = str(uuid.uuid4())
-    upload_jobs[job_id] = UploadJob(
-        job_id = job_id,
-        status=ProcessingStatus.QUEUED,
-        chat_id=str(chat_id),
-        filename=pdf.filename or "unknown-file.pdf",
-        progress=0,
-        stage=ProcessingStage.NOT_PROCESSING,
-        finished_at="",
-        chunks_added=0,
-        error=None
-    )
-    background_tasks.add_task(process_uploaded_pdf, temp_path, str(chat_id), pdf.filename or "unknown-file.pdf", job_id)
+@router.post("/chats/{chat_id}/upload-excel", response_model=UploadAcceptedResponse, status_code=status.HTTP_202_ACCEPTED, tags=["AskAI - Documents"])
+async def upload_excel(
+    chat_id: uuid.UUID,
+    db: Session = Depends(get_db_session),
+    excel: UploadFile = File(..., description="The Excel workbook (.xlsx) to upload", alias="excel")
+):
+    """Upload an Excel workbook (e.g. a BOQ) for RAG processing. This is an asynchronous operation."""
+    filename = excel.filename or "unknown-file.xlsx"
+    if not filename.lower().endswith(ingestion_service.EXCEL_EXTENSIONS):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File must be an Excel workbook (.xlsx or .xlsm)")
 
-    return {"message": "Upload accepted", "job_id": job_id, "processing": True}
+    chat = db.get(SQLChat, chat_id)
+    if not chat:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
+
+    if sum(1 for doc in chat.documents if doc.doc_type == 'excel') >= settings.MAX_EXCEL_PER_CHAT:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Maximum {settings.MAX_EXCEL_PER_CHAT} Excel files per chat")
+
+    if any(doc.filename == filename for doc in chat.documents):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Excel file '{filename}' already uploaded")
+
+    return await _accept_upload(db, chat, excel, filename, os.path.splitext(filename)[1].lower(), settings.MAX_EXCEL_SIZE_MB * 1024 * 1024)
 
 @router.post("/chats/{chat_id}/add-drive", response_model=DriveFolder, tags=["AskAI - Documents"])
 def add_drive_folder(
@@ -92,13 +117,28 @@ def add_drive_folder(
         # Catches invalid URLs from service logic and other potential errors.
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-@router.get("/upload-status/{job_id}", tags=["AskAI - Documents"])
-def get_upload_status(job_id: str = Path(..., description="The ID of the upload job")):
+@router.post("/chats/{chat_id}/sync-drive", response_model=UploadAcceptedResponse, status_code=status.HTTP_202_ACCEPTED, tags=["AskAI - Documents"])
+def sync_drive_folders(chat_id: uuid.UUID, db: Session = Depends(get_db_session)):
+    """
+    Incrementally sync the chat with its linked Drive folders: only new or changed files are
+    downloaded and indexed, and documents whose files were removed from Drive are dropped.
+    """
+    chat = db.get(SQLChat, chat_id)
+    if not chat:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
+    if not chat.drive_folders:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No Google Drive folders are linked to this chat")
+
+    job = ingestion_service.enqueue_drive_sync(db, chat_id)
+    return {"message": "Sync accepted", "job_id": str(job.id), "processing": True}
+
+@router.get("/upload-status/{job_id}", response_model=UploadJob, tags=["AskAI - Documents"])
+def get_upload_status(job_id: uuid.UUID = Path(..., description="The ID of the upload job"), db: Session = Depends(get_db_session)):
     """Get the status of an asynchronous upload job"""
-    status = upload_jobs.get(job_id)
-    if not status:
+    job = IngestionJobRepository(db).get_by_id(job_id)
+    if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return status
+    return ingestion_service.to_upload_job(job)
 
 def _get_chat_docs_data(chat_id: uuid.UUID, db: Session) -> dict:
     """Helper function to fetch and structure document data for a chat."""
@@ -109,11 +149,7 @@ def _get_chat_docs_data(chat_id: uuid.UUID, db: Session) -> dict:
     pdfs = [DocumentMetadata(name=doc.filename, chunks=len(doc.chunks), status=doc.status) for doc in chat.documents if doc.doc_type == 'pdf']
     excel = [DocumentMetadata(name=doc.filename, chunks=len(doc.chunks), status=doc.status) for doc in chat.documents if doc.doc_type == 'excel']
 
-    processing_jobs: List[ProcessingJob] = []
-    for jid, job in upload_jobs.items():
-        if job.chat_id == str(chat_id):
-            processing_job = ProcessingJob(name=job.filename, job_id=jid, status=job.status, stage=job.stage, progress=job.progress)
-            processing_jobs.append(processing_job)
+    processing_jobs: List[ProcessingJob] = ingestion_service.get_chat_jobs(db, chat_id)
     
     response_data = ChatDocumentsResponse(
         pdfs=pdfs,
@@ -141,24 +177,47 @@ async def stream_chat_docs(
     Sends an update whenever the status of a document processing job changes.
     """
     async def event_generator():
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+
+        def on_progress(event: ProgressEvent):
+            # Called from the progress listener thread; hand the wake-up over to the event loop.
+            if event.chat_id == str(chat_id):
+                try:
+                    loop.call_soon_threadsafe(changed.set)
+                except RuntimeError:
+                    pass  # Event loop already closed
+
+        unsubscribe = progress_bus.subscribe(on_progress)
         last_data = None
-        while True:
-            if await request.is_disconnected():
-                break
-            
-            try:
-                current_data = _get_chat_docs_data(chat_id, db)
-                if current_data != last_data:
-                    yield json.dumps(current_data)
-                    last_data = current_data
-            except HTTPException:
-                # This can happen if the chat is deleted during an active stream.
-                break
-            except Exception as e:
-                print(f"Error in SSE stream for chat {chat_id}: {e}")
-                break
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+                
+                try:
+                    # End the previous read transaction so rows committed by the worker are visible
+                    db.rollback()
+                    current_data = _get_chat_docs_data(chat_id, db)
+                    if current_data != last_data:
+                        yield json.dumps(current_data)
+                        last_data = current_data
+                except HTTPException:
+                    # This can happen if the chat is deleted during an active stream.
+                    break
+                except Exception as e:
+                    print(f"Error in SSE stream for chat {chat_id}: {e}")
+                    break
                 
-            await asyncio.sleep(1)
+                # Wake up on progress events; the timeout still picks up other changes
+                # (e.g. deleted documents) and notices client disconnects.
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=SSE_REFRESH_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                changed.clear()
+        finally:
+            unsubscribe()
             
     return EventSourceResponse(event_generator())
 
@@ -39,6 +39,18 @@ class UploadJob(BaseModel):
     chunks_added: int
     error: Optional[str]
 
+class ProgressEvent(BaseModel):
+    """A change to an upload job, published on the progress bus. Unset fields are unchanged."""
+    job_id: str
+    chat_id: str
+    timestamp: float
+    status: Optional[ProcessingStatus] = None
+    stage: Optional[ProcessingStage] = None
+    progress: Optional[float] = None
+    chunks_added: Optional[int] = None
+    error: Optional[str] = None
+    finished_at: Optional[str] = None
+
 class ProcessingJob(BaseModel):
     name: str
     job_id: str
@@ -53,6 +65,8 @@ class DriveFile(BaseModel):
     name: str
     mime_type: str = Field(..., alias="mimeType")
     size: Optional[str] = None
+    md5_checksum: Optional[str] = Field(None, alias="md5Checksum")
+    modified_time: Optional[str] = Field(None, alias="modifiedTime")
 
 class DriveFolder(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
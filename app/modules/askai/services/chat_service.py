@@ -1,12 +1,11 @@
 from uuid import UUID
 from typing import List, Optional, Tuple
-from fastapi import BackgroundTasks
 from sqlalchemy.orm import Session
 
 from app.core.services import vector_store
 from app.modules.askai.models.chat import ChatMetadata, Message, CreateNewChatRequest, DocumentMetadata
 from app.modules.askai.db.repository import ChatRepository, DocumentRepository
-from app.modules.askai.services.drive_service import download_files_from_drive
+from app.modules.askai.services import drive_service, ingestion_service
 
 def get_all_chats(db: Session) -> List[ChatMetadata]:
     """Get all chats from PostgreSQL."""
@@ -34,14 +33,17 @@ def get_all_chats(db: Session) -> List[ChatMetadata]:
         )
     return response_chats
 
-def create_new_chat(db: Session, payload: Optional[CreateNewChatRequest], background_tasks: BackgroundTasks) -> ChatMetadata:
-    """Create a new chat session in PostgreSQL."""
+def create_new_chat(db: Session, payload: Optional[CreateNewChatRequest]) -> ChatMetadata:
+    """Create a new chat session in PostgreSQL and queue a sync of its Drive folder, if given."""
+    folder_id = drive_service.extract_folder_id(payload.driveUrl) if payload and payload.driveUrl else None
+
     chat_repo = ChatRepository(db)
     chat_count = chat_repo.count()
     new_chat = chat_repo.create(title=f"New Chat {chat_count + 1}")
 
-    if payload and payload.driveUrl:
-        background_tasks.add_task(download_files_from_drive, payload.driveUrl, str(new_chat.id))
+    if folder_id:
+        # A sync into an empty chat imports the whole tree and records each file's Drive metadata
+        ingestion_service.enqueue_drive_sync(db, new_chat.id, [folder_id])
 
     return ChatMetadata(
         id=new_chat.id,
@@ -0,0 +1,145 @@
+"""
+Text chunkers used by the document processors.
+
+Nothing here imports app settings, so the chunkers can be driven directly by
+benchmarks as well as by PDFProcessor and ExcelProcessor.
+"""
+from typing import Callable, List, Tuple
+
+
+def split_words(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """Split text into overlapping windows of `chunk_size` words."""
+    words = text.split()
+    if len(words) <= chunk_size:
+        return [text]
+
+    pieces = []
+    start = 0
+    while start < len(words):
+        end = min(start + chunk_size, len(words))
+        pieces.append(' '.join(words[start:end]))
+        start = end - overlap
+        if start >= len(words) - overlap:
+            break
+    return pieces
+
+
+class TokenChunker:
+    """
+    Token-budgeted chunker.
+
+    Each page is encoded once with the tokenizer and chunks are cut at token
+    offsets, so every chunk holds at most `chunk_tokens` tokens. With
+    `across_pages`, the tail of one page is carried into the first chunk of
+    the next instead of being emitted as a short fragment; call `flush()`
+    after the last page to emit whatever is left.
+
+    Chunks are returned as (content, page_label, token_count) tuples, where
+    page_label is "3" or, for a chunk spanning pages, "3-4".
+    """
+
+    def __init__(self, tokenizer, chunk_tokens: int, overlap_tokens: int, across_pages: bool = False):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.tokenizer = tokenizer
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.across_pages = across_pages
+
+        self._buffer: List[int] = []
+        self._page_starts: List[Tuple[str, int]] = []  # (page, offset of its first token in the buffer)
+        self._emitted = 0  # leading buffer tokens that already went out as overlap
+        self.chunk_count = 0
+
+    def _page_label(self, end: int) -> str:
+        pages = [page for page, start in self._page_starts if start < end] or [self._page_starts[0][0]]
+        return pages[0] if pages[0] == pages[-1] else f"{pages[0]}-{pages[-1]}"
+
+    def _emit(self, end: int) -> Tuple[str, str, int]:
+        window = self._buffer[:end]
+        self.chunk_count += 1
+        return self.tokenizer.decode(window), self._page_label(end), len(window)
+
+    def _advance(self) -> None:
+        step = self.chunk_tokens - self.overlap_tokens
+        self._buffer = self._buffer[step:]
+        shifted = [(page, start - step) for page, start in self._page_starts]
+        # Keep the page the new buffer starts in, drop pages that scrolled out entirely
+        self._page_starts = [(page, max(start, 0)) for i, (page, start) in enumerate(shifted)
+                             if i + 1 == len(shifted) or shifted[i + 1][1] > 0]
+        self._emitted = self.overlap_tokens
+
+    def add_page(self, text: str, page) -> List[Tuple[str, str, int]]:
+        tokens = self.tokenizer.encode(text)
+        if not tokens:
+            return []
+
+        self._page_starts.append((str(page), len(self._buffer)))
+        self._buffer.extend(tokens)
+
+        chunks = []
+        while len(self._buffer) > self.chunk_tokens:
+            chunks.append(self._emit(self.chunk_tokens))
+            self._advance()
+        if not self.across_pages:
+            chunks.extend(self.flush())
+        return chunks
+
+    def flush(self) -> List[Tuple[str, str, int]]:
+        chunks = []
+        if len(self._buffer) > self._emitted:
+            chunks.append(self._emit(len(self._buffer)))
+        self._buffer, self._page_starts, self._emitted = [], [], 0
+        return chunks
+
+
+class RowChunker:
+    """
+    Groups spreadsheet rows into chunks under a size budget.
+
+    Every chunk starts with `prefix` (e.g. the sheet name and header row),
+    which counts against the budget, so a chunk is readable on its own.
+    `measure` returns the size of a piece of text in the budget's unit
+    (tokens or words). Rows are never split: a row larger than the budget
+    becomes a chunk by itself. Only the rows of the open chunk are held.
+
+    Chunks are returned as (content, first_row, last_row, size) tuples.
+    """
+
+    def __init__(self, measure: Callable[[str], int], budget: int, prefix: str = ""):
+        self.measure = measure
+        self.budget = budget
+        self.chunk_count = 0
+        self._rows: List[str] = []
+        self._first_row = self._last_row = 0
+        self.set_prefix(prefix)
+
+    def set_prefix(self, prefix: str) -> List[Tuple[str, int, int, int]]:
+        """Start using a new prefix; returns the chunk closed under the old one, if any."""
+        chunks = self.flush()
+        self.prefix = prefix
+        self._prefix_size = self.measure(prefix) if prefix else 0
+        self._size = self._prefix_size
+        return chunks
+
+    def add_row(self, line: str, row_number: int) -> List[Tuple[str, int, int, int]]:
+        size = self.measure(line)
+        chunks = []
+        if self._rows and self._size + size > self.budget:
+            chunks.extend(self.flush())
+        if not self._rows:
+            self._first_row = row_number
+        self._rows.append(line)
+        self._last_row = row_number
+        self._size += size
+        return chunks
+
+    def flush(self) -> List[Tuple[str, int, int, int]]:
+        if not self._rows:
+            return []
+        content = "\n".join([self.prefix, *self._rows] if self.prefix else self._rows)
+        chunk = (content, self._first_row, self._last_row, self._size)
+        self.chunk_count += 1
+        self._rows = []
+        self._size = self._prefix_size
+        return [chunk]
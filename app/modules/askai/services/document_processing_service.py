@@ -1,28 +1,81 @@
 import os
 from uuid import UUID, uuid4
-import traceback
 from datetime import datetime
 
+from typing import Dict, Optional
+
 from sqlalchemy.orm import Session
 
-from app.core.services import pdf_processor, vector_store
-from app.core.global_stores import upload_jobs
+from app.core.services import excel_processor, pdf_processor, vector_store
+from app.core.global_stores import get_progress_reporter
 from app.db.database import SessionLocal
-from app.modules.askai.db.models import Document as SQLDocument, DocumentChunk
+from app.modules.askai.db.models import Chat as SQLChat, Document as SQLDocument
 from app.modules.askai.db.repository import ChatRepository, DocumentRepository
-from app.modules.askai.models.document import ProcessingStage, ProcessingStatus, UploadJob
-from app.utils import get_file_hash
+from app.modules.askai.models.document import ProcessingStage, ProcessingStatus
+from app.modules.askai.services.ingestion_service import PermanentJobError
+from app.utils import batched, get_file_hash
 from app.config import settings
 
-def process_uploaded_pdf(temp_path: str, chat_id_str: str, filename: str, job_id: str):
-    """Background task to process a PDF file using a new DB session."""
-    upload_job = upload_jobs.get(job_id)
-    if not isinstance(upload_job, UploadJob):
-        return
+def link_existing_document(db: Session, chat: SQLChat, document: SQLDocument) -> int:
+    """
+    Attach an already-processed document to another chat without re-parsing or re-embedding.
+    Vectors are copied from a chat that already has the document indexed; if none is left,
+    the stored chunks are re-indexed instead. Returns the number of chunks indexed for the chat.
+    """
+    if not vector_store:
+        raise Exception("Vector store is not initialized.")
+    if document.status != "active":
+        raise ValueError(f"'{document.filename}' is still being processed for another chat. Please retry once it finishes.")
 
-    upload_job.status = ProcessingStatus.PROCESSING
-    upload_job.stage = ProcessingStage.EXTRACTING_CONTENT
-    upload_job.progress = 0
+    target = vector_store.get_or_create_collection(str(chat.id), refresh=True)
+    linked_count = 0
+    for source_chat in document.chats:
+        if source_chat.id == chat.id:
+            continue
+        source = vector_store.get_or_create_collection(str(source_chat.id), refresh=True)
+        linked_count = vector_store.copy_document(source, target, str(document.id))
+        if linked_count:
+            break
+
+    if not linked_count:
+        # No chat holds the vectors anymore; index the stored chunks (still no re-parse).
+        # "id" lets the pgvector store update the existing rows instead of expecting new ones.
+        chunks = [{"id": chunk.id, "content": chunk.content, "metadata": chunk.chunk_metadata or {}} for chunk in document.chunks]
+        try:
+            for batch in batched(chunks, settings.INGEST_BATCH_SIZE):
+                linked_count += vector_store.add_chunks(target, batch)
+        except Exception:
+            # A retry re-indexes from scratch; don't leave earlier batches behind as duplicates
+            vector_store.delete_document(target, str(document.id))
+            raise
+
+    DocumentRepository(db).add_document_to_chat(chat, document)
+    print(f"🔗 Linked existing document '{document.filename}' ({document.file_hash}) to chat {chat.id}")
+    return linked_count
+
+def unlink_document(db: Session, chat: SQLChat, document: SQLDocument) -> None:
+    """Remove a document's vectors from the chat and detach it (deleting it if no other chat uses it)."""
+    if not vector_store:
+        raise Exception("Vector store is not initialized.")
+    collection = vector_store.get_or_create_collection(str(chat.id))
+    vector_store.delete_document(collection, str(document.id))
+    DocumentRepository(db).remove_document_from_chat(chat, document)
+    print(f"🗑️  Removed document '{document.filename}' from chat {chat.id}")
+
+def process_uploaded_document(file_path: str, chat_id_str: str, filename: str, job_id: str, file_hash: Optional[str] = None,
+                              drive_file: Optional[Dict] = None, replaces: Optional[str] = None, doc_type: str = "pdf") -> int:
+    """
+    Process a PDF or, with doc_type "excel", a workbook into a chat using a new DB session;
+    returns the number of chunks indexed. Both go through the same streaming embed/index path.
+    Runs inside the ingestion worker, which records the outcome, retries failures and
+    removes the uploaded file, so errors are raised rather than reported here.
+
+    Files imported from Drive pass their `drive_file` metadata (id, md5Checksum,
+    modifiedTime) for later syncs; `replaces` is the id of the chat's previous version
+    of the file, which is removed once the new one is indexed.
+    """
+    reporter = get_progress_reporter(job_id, chat_id_str)
+    reporter.set_status(ProcessingStatus.PROCESSING, stage=ProcessingStage.EXTRACTING_CONTENT, progress=0)
 
     if not vector_store:
         raise Exception("Vector store is not initialized.")
@@ -34,63 +87,87 @@ def process_uploaded_pdf(temp_path: str, chat_id_str: str, filename: str, job_id
         chat_id = UUID(chat_id_str)
         chat = chat_repo.get_by_id(chat_id)
         if not chat:
-            raise Exception(f"Chat {chat_id} not found in database.")
+            raise PermanentJobError(f"Chat {chat_id} not found in database.")
 
-        # 1. Process PDF to get chunks and stats
-        doc_id = uuid4()
-        chunks_as_dicts, stats = pdf_processor.process_pdf(job_id, temp_path, str(doc_id), filename)
-        
-        if not chunks_as_dicts:
-            raise Exception("No content extracted from PDF")
+        # 0. Identical content was already processed (e.g. for another chat): link it instead
+        file_hash = file_hash or get_file_hash(file_path)
+        existing_document = doc_repo.get_by_hash(file_hash)
+        if existing_document and _left_by_job(existing_document, job_id):
+            # An earlier attempt of this job died mid-document (worker crash) and the job was
+            # requeued: drop what that attempt indexed and process the file again
+            print(f"♻️  Discarding '{existing_document.filename}' left half-indexed by an earlier attempt of job {job_id}")
+            vector_store.delete_document(vector_store.get_or_create_collection(chat_id_str, refresh=True), str(existing_document.id))
+            doc_repo.delete(existing_document)
+            existing_document = None
+        if existing_document:
+            if any(doc.id == existing_document.id for doc in chat.documents):
+                raise PermanentJobError(f"'{existing_document.filename}' is already in this chat.")
+            chunks_added = link_existing_document(db, chat, existing_document)
+            _record_drive_source(db, chat, existing_document, drive_file, replaces)
+            return chunks_added
 
-        upload_job.stage = ProcessingStage.ADDING_TO_VECTOR_STORE
-        upload_job.progress = 0
-        
-        # 2. Add chunks to vector store
-        collection = vector_store.get_or_create_collection(chat_id_str)
-        added_count = vector_store.add_chunks(collection, chunks_as_dicts)
-        
-        upload_job.stage = ProcessingStage.SAVING_METADATA
-        upload_job.progress = 0
-        
-        # 3. Save document and chunks to PostgreSQL
+        # 1. Register the document up front so batches can be attached to it as they are indexed
+        doc_id = uuid4()
         now = datetime.now()
         new_document = SQLDocument(
             id=doc_id,
             filename=filename,
-            file_hash=get_file_hash(temp_path),
-            file_size=os.path.getsize(temp_path),
+            file_hash=file_hash,
+            file_size=os.path.getsize(file_path),
+            doc_type=doc_type,
+            status="processing",
             uploaded_at=now,
-            processing_stats=stats,
-            chunks=[
-                DocumentChunk(
-                    content=chunk["content"],
-                    chunk_metadata=chunk["metadata"]
-                ) for chunk in chunks_as_dicts
-            ]
+            # Replaced by the real stats once finished; lets a retry of this job find its own leftovers
+            processing_stats={"job_id": job_id},
         )
         doc_repo.add_document_to_chat(chat, new_document)
+        collection = vector_store.get_or_create_collection(chat_id_str, refresh=True)
+
+        # 2. Stream pages (or sheet rows) -> chunks -> embed/index in fixed-size batches,
+        #    so only one batch of chunks and vectors is alive at a time and early pages
+        #    become searchable while the rest of the document is still being processed.
+        stats = {}
+        added_count = 0
+        try:
+            if doc_type == "excel":
+                chunk_stream = excel_processor.iter_chunks(reporter, file_path, str(doc_id), filename, stats)
+            else:
+                chunk_stream = pdf_processor.iter_chunks(reporter, file_path, str(doc_id), filename, stats, file_hash)
+            for batch in batched(chunk_stream, settings.INGEST_BATCH_SIZE):
+                added_count += vector_store.add_chunks(collection, batch, stats)
+                doc_repo.add_chunks(new_document, batch)
+        except Exception:
+            # Don't leave a half-indexed document behind
+            db.rollback()
+            vector_store.delete_document(collection, str(doc_id))
+            doc_repo.delete(new_document)
+            raise
         
-        # 4. Update job status to 'done'
-        upload_job.status = ProcessingStatus.FINISHED
-        upload_job.progress = 100
-        upload_job.finished_at = now.isoformat()
-        upload_job.chunks_added = added_count
-        print(f"✅ PDF {filename} processed successfully for job {job_id}")
-
-    except Exception as e:
-        error_msg = str(e)
-        print(f"❌ Processing error for job {job_id}: {error_msg}")
-        traceback.print_exc()
-        upload_job.status = ProcessingStatus.FAILED
-        upload_job.error = error_msg
-        upload_job.finished_at = datetime.now().isoformat()
-    
+        reporter.update(ProcessingStage.SAVING_METADATA, 0)
+        
+        cache_lookups = stats.get("embedding_cache_hits", 0) + stats.get("embedding_cache_misses", 0)
+        if cache_lookups:
+            stats["embedding_cache_hit_rate"] = round(stats["embedding_cache_hits"] / cache_lookups, 3)
+            print(f"🧠 Embedding cache: {stats['embedding_cache_hits']}/{cache_lookups} chunks served from cache ({stats['embedding_cache_hit_rate']:.0%})")
+        
+        # 3. Mark the document as complete
+        doc_repo.finalize(new_document, "active", stats)
+        _record_drive_source(db, chat, new_document, drive_file, replaces)
+        reporter.flush()
+        print(f"✅ {doc_type.upper()} {filename} processed successfully for job {job_id}")
+        return added_count
+
     finally:
         db.close()
-        # 6. Clean up temporary file
-        try:
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-        except Exception as e:
-            print(f"⚠️  Cleanup error for job {job_id}: {e}")
+
+def _left_by_job(document: SQLDocument, job_id: str) -> bool:
+    """Whether `document` is the unfinished document an earlier attempt of this job registered."""
+    return document.status == "processing" and (document.processing_stats or {}).get("job_id") == job_id
+
+def _record_drive_source(db: Session, chat: SQLChat, document: SQLDocument, drive_file: Optional[Dict], replaces: Optional[str]) -> None:
+    if drive_file:
+        DocumentRepository(db).set_drive_metadata(chat, document, drive_file["id"], drive_file.get("md5Checksum"), drive_file.get("modifiedTime"))
+    if replaces:
+        previous = next((doc for doc in chat.documents if str(doc.id) == replaces and doc.id != document.id), None)
+        if previous:
+            unlink_document(db, chat, previous)
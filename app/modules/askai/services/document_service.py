@@ -1,28 +1,53 @@
 import re
-from typing import List, Dict, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 import os
 import traceback
 import time
+from collections import deque
+from itertools import islice
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, time as dt_time
 from pathlib import Path
 
 from llama_parse import LlamaParse, ResultType
-import pytesseract
-from PIL import Image
 import fitz  # PyMuPDF
-import pdfplumber
+import openpyxl
 
 from app.config import settings
-from app.core.global_stores import upload_jobs
+from app.core.parse_cache import ParseCache
+from app.core.progress import ProgressReporter
 from app.modules.askai.models.document import ProcessingStage
+from app.modules.askai.services import pdf_pipeline
+from app.modules.askai.services.chunking import RowChunker, TokenChunker, split_words
+from app.utils import get_file_hash
+
+def clean_metadata(metadata: Dict) -> Dict:
+    """Clean metadata for ChromaDB compatibility"""
+    cleaned = {}
+    for k, v in metadata.items():
+        str_val = str(v)
+        str_val = re.sub(r'[^\w\s\-\.\,\/]', '_', str_val)
+        str_val = str_val.strip()
+        cleaned[k] = str_val if str_val else "unknown"
+    return cleaned
 
 class PDFProcessor:
-    """Enhanced PDF processing with LlamaParse OCR"""
+    """
+    Enhanced PDF processing with LlamaParse OCR.
+
+    A single instance is shared by all uploads, so per-job state (progress
+    reporting) is passed into each call rather than stored on the instance.
+    """
 
-    job_id = None
+    # Bump when the LlamaParse configuration below changes, so cached results are not reused.
+    LLAMAPARSE_VERSION = "md-v1"
     
-    def __init__(self, embedding_model, tokenizer):
+    def __init__(self, embedding_model, tokenizer, parse_cache: Optional[ParseCache] = None):
         self.embedding_model = embedding_model
         self.tokenizer = tokenizer
+        self.parse_cache = parse_cache
+        # Created lazily on the first document large enough to shard
+        self._executor = None
         
         llama_key = settings.LLAMA_CLOUD_API_KEY
         if llama_key:
@@ -49,78 +74,135 @@ class PDFProcessor:
         return text.strip()
     
     def _clean_metadata(self, metadata: Dict) -> Dict:
-        """Clean metadata for ChromaDB compatibility"""
-        cleaned = {}
-        for k, v in metadata.items():
-            str_val = str(v)
-            str_val = re.sub(r'[^\w\s\-\.\,\/]', '_', str_val)
-            str_val = str_val.strip()
-            cleaned[k] = str_val if str_val else "unknown"
-        return cleaned
+        return clean_metadata(metadata)
     
-    def update_progress(self, stage: ProcessingStage, progress: float) -> None:
-        print(f"📄 Progress: {stage} {progress}%")
-        if not self.job_id:
-            return
-        upload_jobs[self.job_id].stage = stage
-        upload_jobs[self.job_id].progress = progress
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = pdf_pipeline.create_executor(settings.PDF_EXTRACTION_WORKERS)
+            print(f"✅ PDF extraction pool started with {settings.PDF_EXTRACTION_WORKERS} workers")
+        return self._executor
 
-    def create_smart_chunks(self, text: str, curr_page_no: int, no_of_pages: int, metadata: Dict) -> List[Dict]:
-        """Create overlapping chunks with metadata"""
-        words = text.split()
-        chunks = []
+    def close(self) -> None:
+        """Shut down the extraction process pool"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
 
-        no_of_words = len(words)
-        
-        if len(words) <= settings.CHUNK_SIZE:
+    def _page_batch_size(self, doc: fitz.Document, options: Dict) -> int:
+        # OCR costs seconds per page, so scanned documents are spread across the pool in smaller batches
+        if options.get("text", True) and options.get("ocr", True) and pdf_pipeline.looks_scanned(doc, options):
+            return settings.PDF_OCR_PAGE_BATCH_SIZE
+        return settings.PDF_PAGE_BATCH_SIZE
+
+    def iter_pages(self, pdf_path: str, options: Dict, stats: Dict, reporter: Optional[ProgressReporter] = None) -> Iterator[Dict]:
+        """Yield page results in page order, sharding page ranges across the pool for large documents.
+
+        Only a bounded window of page batches is in flight at once, so memory
+        does not grow with the size of the document.
+        """
+        self.update_progress(reporter, ProcessingStage.PYMUPDF_LOADING, 0)
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+            stats["page_count"] = page_count
+            batch_size = self._page_batch_size(doc, options)
+            if settings.PDF_EXTRACTION_WORKERS <= 1 or page_count <= batch_size:
+                for result in pdf_pipeline.iter_pages(doc, 0, page_count, options):
+                    self.update_progress(reporter, ProcessingStage.EXTRACTING_CONTENT, (result["page"]/page_count)*100)
+                    yield result
+                return
+
+        batches = iter(pdf_pipeline.page_batches(page_count, batch_size))
+        in_flight = deque()
+        executor = self._get_executor()
+        try:
+            def submit(start: int, end: int):
+                # Only this range's cached OCR text is pickled into the job
+                return executor.submit(pdf_pipeline.process_page_range, pdf_path, start, end, pdf_pipeline.range_options(options, start, end))
+
+            for start, end in islice(batches, settings.PDF_EXTRACTION_WORKERS * 2):
+                in_flight.append(submit(start, end))
+            while in_flight:
+                page_results = in_flight.popleft().result()
+                for start, end in islice(batches, 1):
+                    in_flight.append(submit(start, end))
+                for result in page_results:
+                    self.update_progress(reporter, ProcessingStage.EXTRACTING_CONTENT, (result["page"]/page_count)*100)
+                    yield result
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); drop the pool so the next document gets a fresh one.
+            # Shut it down so its management thread and surviving children go with it; another
+            # job thread may already have replaced it.
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            # The consumer may stop early (e.g. chunk limit reached)
+            for future in in_flight:
+                future.cancel()
+
+    def update_progress(self, reporter: Optional[ProgressReporter], stage: ProcessingStage, progress: float) -> None:
+        if reporter:
+            reporter.update(stage, progress)
+
+    def create_smart_chunks(self, text: str, curr_page_no: int, no_of_pages: int, metadata: Dict) -> List[Dict]:
+        """Create overlapping word-window chunks with metadata"""
+        pieces = split_words(text, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+        if len(pieces) == 1:
             return [{
                 "content": text,
                 "metadata": self._clean_metadata(metadata),
-                "word_count": len(words)
+                "word_count": len(text.split())
             }]
         
-        chunk_index = 0
-        start = 0
-        
-        while start < len(words):
-            progress_from_previous_pages = (curr_page_no-1)/no_of_pages
-            progress_on_current_page = (start/no_of_words) * (1/no_of_pages)
-            self.update_progress(ProcessingStage.CREATING_CHUNKS, (progress_from_previous_pages + progress_on_current_page) * 100)
-            end = min(start + settings.CHUNK_SIZE, len(words))
-            chunk_words = words[start:end]
-            chunk_text = ' '.join(chunk_words)
-            
+        chunks = []
+        for chunk_index, chunk_text in enumerate(pieces):
             chunk_meta = metadata.copy()
             chunk_meta["chunk_index"] = chunk_index
-            
             chunks.append({
                 "content": chunk_text,
                 "metadata": self._clean_metadata(chunk_meta),
-                "word_count": len(chunk_words)
+                "word_count": len(chunk_text.split())
+            })
+        return chunks
+    
+    def create_token_chunker(self) -> TokenChunker:
+        return TokenChunker(self.tokenizer, settings.CHUNK_SIZE_TOKENS, settings.CHUNK_OVERLAP_TOKENS, settings.CHUNK_ACROSS_PAGES)
+    
+    def create_token_chunks(self, pieces: List[Tuple[str, str, int]], metadata: Dict, first_index: int) -> List[Dict]:
+        """Wrap (content, page_label, token_count) pieces from a TokenChunker as chunks"""
+        chunks = []
+        for offset, (chunk_text, page_label, token_count) in enumerate(pieces):
+            chunk_meta = metadata.copy()
+            chunk_meta["page"] = page_label
+            chunk_meta["chunk_index"] = first_index + offset
+            chunks.append({
+                "content": chunk_text,
+                "metadata": self._clean_metadata(chunk_meta),
+                "word_count": len(chunk_text.split()),
+                "token_count": token_count,
             })
-            
-            chunk_index += 1
-            start = end - settings.CHUNK_OVERLAP
-            
-            if start >= len(words) - settings.CHUNK_OVERLAP:
-                break
-        
         return chunks
     
-    def extract_with_llamaparse(self, pdf_path: str) -> Dict[int, str]:
-        """Primary extraction using LlamaParse"""
+    def extract_with_llamaparse(self, pdf_path: str, file_hash: Optional[str] = None, reporter: Optional[ProgressReporter] = None) -> Dict[int, str]:
+        """Primary extraction using LlamaParse; served from the parse cache when possible"""
         if not self.has_llamaparse:
             return {}
         
+        if self.parse_cache and file_hash:
+            cached = self.parse_cache.get(file_hash, "llamaparse", self.LLAMAPARSE_VERSION)
+            if cached:
+                return cached
+        
         try:
             print(f"🔍 LlamaParse processing for {Path(pdf_path).name}...")
-            self.update_progress(ProcessingStage.LLAMA_LOADING, 0)
+            self.update_progress(reporter, ProcessingStage.LLAMA_LOADING, 0)
             documents = self.llama_parser.load_data(pdf_path)
             
             page_texts = {}
             no_of_pages = len(documents)
             for doc in documents:
-                self.update_progress(ProcessingStage.EXTRACTING_CONTENT, (documents.index(doc)/no_of_pages)*100)
+                self.update_progress(reporter, ProcessingStage.EXTRACTING_CONTENT, (documents.index(doc)/no_of_pages)*100)
                 page_num_str = doc.metadata.get('page_label', doc.metadata.get('page', '1'))
                 
                 try:
@@ -137,6 +219,8 @@ class PDFProcessor:
                     for p, texts in page_texts.items()}
             
             print(f"✅ LlamaParse extracted {len(result)} pages.")
+            if self.parse_cache and file_hash:
+                self.parse_cache.put(file_hash, "llamaparse", self.LLAMAPARSE_VERSION, result)
             return result
             
         except Exception as e:
@@ -144,130 +228,304 @@ class PDFProcessor:
             traceback.print_exc()
             return {}
     
-    def extract_with_pymupdf(self, pdf_path: str) -> Dict[int, str]:
-        """Fallback extraction using PyMuPDF"""
-        page_texts = {}
-        try:
-            self.update_progress(ProcessingStage.PYMUPDF_LOADING, 0)
-            doc = fitz.open(pdf_path)
-            no_of_pages = doc.page_count
-            for page_num in range(doc.page_count):
-                self.update_progress(ProcessingStage.EXTRACTING_CONTENT, (page_num/no_of_pages)*100)
-                page = doc[page_num]
-                text = page.get_text()
-                if text and text.strip():
-                    page_texts[page_num + 1] = self.clean_text(text)
-            doc.close()
-            print(f"✅ PyMuPDF extracted {len(page_texts)} pages")
-        except Exception as e:
-            print(f"❌ PyMuPDF error: {e}")
-        return page_texts
-    
-    def extract_with_tesseract(self, pdf_path: str) -> Dict[int, str]:
-        """Final fallback OCR using Tesseract for purely scanned documents."""
-        page_texts = {}
-        try:
-            print(f"🔎 Tesseract OCR processing...")
-            self.update_progress(ProcessingStage.TESSERACT_LOADING, 0)
-            doc = fitz.open(pdf_path)
-            no_of_pages = doc.page_count
-            for i, page in enumerate(doc):
-                self.update_progress(ProcessingStage.EXTRACTING_CONTENT, (i/no_of_pages)*100)
-                pix = page.get_pixmap(dpi=200) 
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                text = pytesseract.image_to_string(img)
-                if text and text.strip():
-                    page_texts[i + 1] = self.clean_text(text)
-            print(f"✅ Tesseract OCR extracted {len(page_texts)} pages.")
-        except Exception as e:
-            print(f"❌ Tesseract OCR error: {e}")
-            traceback.print_exc()
-        return page_texts
-    
-    def extract_tables(self, pdf_path: str) -> List[Dict]:
-        """Extract tables using pdfplumber"""
-        tables = []
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-                for page_num, page in enumerate(pdf.pages, start=1):
-                    page_tables = page.extract_tables() or []
-                    
-                    no_of_tables = len(page_tables)
-                    for table_idx, table in enumerate(page_tables):
-                        progress_from_previous_pages = (page_num-1)/total_pages
-                        progress_on_current_page = ((table_idx+1)/no_of_tables) * (1/total_pages)
-                        total_progress = progress_from_previous_pages + progress_on_current_page
-                        self.update_progress(ProcessingStage.EXTRACTING_TABLES, total_progress*100)
-                        if len(table) < 2: continue
-                        headers = table[0] if table[0] else []
-                        table_text = f"Table {table_idx + 1} on page {page_num}:\n"
-                        if headers:
-                            table_text += "Headers: " + " | ".join(str(h) for h in headers if h) + "\n"
-                        for row in table[1:]:
-                            if not any(row): continue
-                            row_text = " | ".join(str(cell) if cell else "" for cell in row)
-                            table_text += row_text + "\n"
-                        tables.append({
-                            "content": self.clean_text(table_text),
-                            "page": page_num,
-                            "type": "table", "table_index": table_idx
-                        })
-            print(f"✅ Extracted {len(tables)} tables")
-        except Exception as e:
-            print(f"⚠️  Table extraction error: {e}")
-        return tables
+    def format_table(self, table: List[List], table_idx: int, page_num: int) -> str:
+        """Render an extracted table as header/row text; returns "" for tables without data rows"""
+        if len(table) < 2:
+            return ""
+        headers = table[0] if table[0] else []
+        table_text = f"Table {table_idx + 1} on page {page_num}:\n"
+        if headers:
+            table_text += "Headers: " + " | ".join(str(h) for h in headers if h) + "\n"
+        for row in table[1:]:
+            if not any(row): continue
+            row_text = " | ".join(str(cell) if cell else "" for cell in row)
+            table_text += row_text + "\n"
+        return self.clean_text(table_text)
     
-    def process_pdf(self, job_id: str, pdf_path: str, doc_id: str, filename: str) -> Tuple[List[Dict], Dict]:
-        """Main PDF processing pipeline"""
-        self.job_id = job_id
+    def _page_chunks(self, text: str, page_num: int, page_count: int, doc_id: str, filename: str, chunker: Optional[TokenChunker] = None) -> List[Dict]:
+        base_metadata = {"doc_id": str(doc_id), "source": str(filename), "page": str(page_num), "type": "text", "doc_type": "pdf"}
+        if chunker:
+            # Chunk indexes run through the whole document, since chunks may span pages
+            pieces = chunker.add_page(text, page_num) if text.strip() else []
+            return self.create_token_chunks(pieces, base_metadata, chunker.chunk_count - len(pieces))
+        if not text.strip():
+            return []
+        return self.create_smart_chunks(text, page_num, page_count, base_metadata)
+
+    def _table_chunks(self, tables: List[List], page_num: int, doc_id: str, filename: str) -> List[Dict]:
+        chunks = []
+        for table_idx, table in enumerate(tables):
+            table_text = self.format_table(table, table_idx, page_num)
+            if not table_text: continue
+            table_meta = {"doc_id": str(doc_id), "source": str(filename), "page": str(page_num), "type": "table", "doc_type": "pdf", "table_index": str(table_idx)}
+            chunks.append({"content": table_text, "metadata": self._clean_metadata(table_meta), "word_count": len(table_text.split())})
+        return chunks
+
+    def iter_chunks(self, reporter: Optional[ProgressReporter], pdf_path: str, doc_id: str, filename: str, stats: Dict, file_hash: Optional[str] = None) -> Iterator[Dict]:
+        """Streaming PDF processing pipeline.
+
+        Chunks are yielded page by page as soon as each page is processed, so
+        callers can embed and index them in batches instead of holding the
+        whole document. `stats` is filled in as the stream progresses and is
+        complete once the generator is exhausted.
+        """
         print(f"\n{'='*60}\n📄 Processing PDF: {filename}\n{'='*60}")
         start_time = time.time()
         
-        page_texts = self.extract_with_llamaparse(pdf_path)
-        if not page_texts:
-            print("⚠️  LlamaParse failed, attempting PyMuPDF fallback...")
-            page_texts = self.extract_with_pymupdf(pdf_path)
-        if not page_texts:
-            print("⚠️  PyMuPDF also failed, attempting Tesseract OCR fallback...")
-            page_texts = self.extract_with_tesseract(pdf_path)
-        if not page_texts:
-            raise Exception("Failed to extract any text from PDF")
+        file_hash = file_hash or get_file_hash(pdf_path)
+        llama_texts = self.extract_with_llamaparse(pdf_path, file_hash, reporter)
+        use_llama = bool(llama_texts)
+        if not use_llama:
+            print("⚠️  LlamaParse failed, using the local page pipeline (PyMuPDF, Tesseract for scanned pages)...")
         
-        tables = self.extract_tables(pdf_path)
+        # Pages already OCR'd in an earlier run of this file are not rendered again
+        ocr_cache = {}
+        if self.parse_cache and not use_llama:
+            ocr_cache = self.parse_cache.get(file_hash, "tesseract", pdf_pipeline.OCR_VERSION) or {}
+        new_ocr_texts = {}
         
-        all_chunks = []
-        no_of_pages = len(page_texts)
-        for page_num, text in page_texts.items():
-            # print(f"📄 Processing page {page_num} of {no_of_pages}")
-            if not text.strip(): continue
-            base_metadata = {"doc_id": str(doc_id), "source": str(filename), "page": str(page_num), "type": "text", "doc_type": "pdf"}
-            chunks = self.create_smart_chunks(text, page_num, no_of_pages, base_metadata)
-            all_chunks.extend(chunks)
+        chunker = self.create_token_chunker() if settings.CHUNKING_STRATEGY == "tokens" else None
+        base_metadata = {"doc_id": str(doc_id), "source": str(filename), "type": "text", "doc_type": "pdf"}
         
-        for table in tables:
-            table_meta = {"doc_id": str(doc_id), "source": str(filename), "page": str(table["page"]), "type": "table", "doc_type": "pdf", "table_index": str(table.get("table_index", 0))}
-            all_chunks.append({"content": table["content"], "metadata": self._clean_metadata(table_meta), "word_count": len(table["content"].split())})
+        page_routes = {}
+        stage_timings = {}
+        text_pages = ocr_pages = table_count = chunk_count = table_candidates = ocr_timeouts = ocr_failures = 0
+        pages_started = time.perf_counter()
         
-        if len(all_chunks) > settings.MAX_CHUNKS_PER_DOCUMENT:
-            print(f"⚠️  Limiting to {settings.MAX_CHUNKS_PER_DOCUMENT} chunks")
-            all_chunks = all_chunks[:settings.MAX_CHUNKS_PER_DOCUMENT]
+        def limited(chunks: List[Dict]) -> Iterator[Dict]:
+            nonlocal chunk_count
+            for chunk in chunks:
+                if chunk_count >= settings.MAX_CHUNKS_PER_DOCUMENT:
+                    return
+                chunk_count += 1
+                yield chunk
         
-        stats = {"total_chunks": len(all_chunks), "pages": len(page_texts), "tables": len(tables), "processing_time": time.time() - start_time}
-        print(f"✅ Created {stats['total_chunks']} chunks from {stats['pages']} pages")
-        print(f"⏱️  Processing time: {stats['processing_time']:.2f}s\n")
+        # One pass over the document: tables always; text and per-page OCR routing only when LlamaParse gave us nothing.
+        try:
+            pages = self.iter_pages(pdf_path, {
+                "text": not use_llama,
+                "ocr": True,
+                "tables": True,
+                "ocr_max_text_density": settings.PDF_OCR_MAX_TEXT_DENSITY,
+                "ocr_min_image_coverage": settings.PDF_OCR_MIN_IMAGE_COVERAGE,
+                "ocr_cache": ocr_cache,
+                "ocr_min_dpi": settings.PDF_OCR_MIN_DPI,
+                "ocr_max_dpi": settings.PDF_OCR_MAX_DPI,
+                "ocr_default_dpi": settings.PDF_OCR_DEFAULT_DPI,
+                "ocr_max_megapixels": settings.PDF_OCR_MAX_MEGAPIXELS,
+                "ocr_timeout": settings.PDF_OCR_TIMEOUT_SECONDS,
+                "table_prefilter": settings.PDF_TABLE_PREFILTER,
+                "table_min_rulings": settings.PDF_TABLE_MIN_RULINGS,
+            }, stats, reporter)
+            for result in pages:
+                page_num = result["page"]
+                for stage, seconds in result["timings"].items():
+                    stage_timings[stage] = stage_timings.get(stage, 0.0) + seconds
+                if result.get("table_candidate"):
+                    table_candidates += 1
+                if result.get("ocr_timed_out"):
+                    ocr_timeouts += 1
+                elif result.get("ocr_error"):
+                    ocr_failures += 1
+                page_count = stats["page_count"]
+                text = llama_texts.pop(page_num, "") if use_llama else self.clean_text(result["text"])
+                if result["route"]:
+                    page_routes[str(page_num)] = result["route"]
+                if result["source"] == "tesseract":
+                    ocr_pages += 1
+                    if not result.get("ocr_cached"):
+                        new_ocr_texts[page_num] = result["text"]
+                if text.strip():
+                    text_pages += 1
+                table_chunks = self._table_chunks(result["tables"], page_num, doc_id, filename)
+                table_count += len(table_chunks)
+                yield from limited(self._page_chunks(text, page_num, page_count, doc_id, filename, chunker) + table_chunks)
+                if chunk_count >= settings.MAX_CHUNKS_PER_DOCUMENT:
+                    print(f"⚠️  Limiting to {settings.MAX_CHUNKS_PER_DOCUMENT} chunks")
+                    pages.close()
+                    break
+        except Exception as e:
+            # Earlier pages have already been yielded and indexed, so a failure must reach the
+            # caller: it rolls the document back and the ingestion job is retried
+            print(f"❌ Page pipeline error on {filename}: {e}")
+            raise
+        finally:
+            # Pages OCR'd before a failure are not redone on the retry
+            if self.parse_cache and new_ocr_texts:
+                self.parse_cache.put(file_hash, "tesseract", pdf_pipeline.OCR_VERSION, new_ocr_texts)
+        # Includes the time the consumer spends embedding and indexing each batch
+        pages_seconds = time.perf_counter() - pages_started
         
+        # LlamaParse pages the local pass did not line up with (e.g. custom page labels)
+        for page_num, text in llama_texts.items():
+            if text.strip():
+                text_pages += 1
+            yield from limited(self._page_chunks(text, page_num, len(llama_texts), doc_id, filename, chunker))
+        
+        if chunker:
+            pieces = chunker.flush()
+            yield from limited(self.create_token_chunks(pieces, base_metadata, chunker.chunk_count - len(pieces)))
+        
+        if not chunk_count:
+            raise Exception("Failed to extract any text from PDF")
+        
+        route_counts = {route: list(page_routes.values()).count(route) for route in ("text", "ocr", "ocr_failed", "empty")}
+        if page_routes:
+            print(f"🧭 Page routing: {route_counts['text']} text, {route_counts['ocr']} OCR, {route_counts['ocr_failed']} OCR failed "
+                  f"(text layer used), {route_counts['empty']} empty")
+        # Summed across pages, so with a worker pool these add up to more than the wall-clock time
+        stage_timings = {stage: round(seconds, 3) for stage, seconds in stage_timings.items()}
+        if stage_timings:
+            print(f"⏱️  Stage timings (summed over pages): " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in stage_timings.items()))
+            print(f"📊 Table detection ran on {table_candidates}/{stats.get('page_count', 0)} pages")
+        
+        # OCR throughput per worker, over pages actually rendered and recognised (not cache hits)
+        ocr_seconds = stage_timings.get("ocr", 0.0)
+        ocr_rendered = len(new_ocr_texts) + ocr_timeouts
+        throughput = {
+            "pages_per_second": round(stats.get("page_count", 0) / pages_seconds, 2) if pages_seconds else None,
+            "ocr_pages_per_second": round(ocr_rendered / ocr_seconds, 2) if ocr_rendered and ocr_seconds else None,
+            "ocr_timeouts": ocr_timeouts,
+            "ocr_failures": ocr_failures,
+        }
+        if ocr_rendered:
+            print(f"🔎 OCR: {ocr_rendered} pages at {throughput['ocr_pages_per_second']} pages/s per worker ({ocr_timeouts} skipped after timeout)")
+        if ocr_failures:
+            print(f"⚠️  OCR failed on {ocr_failures} pages; see page_routes for which")
+        
+        stats.update(throughput)
+        stats.update({"total_chunks": chunk_count, "pages": text_pages, "tables": table_count, "ocr_pages": ocr_pages, "ocr_cached_pages": ocr_pages - len(new_ocr_texts), "route_counts": route_counts, "page_routes": page_routes, "stage_timings": stage_timings, "table_candidate_pages": table_candidates, "processing_time": time.time() - start_time})
+        print(f"✅ Created {stats['total_chunks']} chunks from {stats['pages']} pages ({ocr_pages} via OCR) and {table_count} tables")
+        print(f"⏱️  Processing time: {stats['processing_time']:.2f}s\n")
+    
+    def process_pdf(self, reporter: Optional[ProgressReporter], pdf_path: str, doc_id: str, filename: str, file_hash: Optional[str] = None) -> Tuple[List[Dict], Dict]:
+        """Main PDF processing pipeline; collects the full chunk stream"""
+        stats = {}
+        all_chunks = list(self.iter_chunks(reporter, pdf_path, doc_id, filename, stats, file_hash))
         return all_chunks, stats
 
 class ExcelProcessor:
-    """Placeholder for Excel processing logic"""
+    """
+    Streaming Excel (.xlsx) processing.
+
+    Workbooks are opened read-only, so openpyxl parses each sheet as its rows
+    are iterated instead of loading the whole workbook: memory stays flat
+    however many rows a BOQ has. Rows are grouped into chunks under the same
+    budget as PDF text, and every chunk repeats the sheet name and header row.
+    """
+
+    # Non-empty rows searched for a header before a sheet is treated as headerless
+    HEADER_SCAN_ROWS = 20
+
     def __init__(self, embedding_model, tokenizer):
-        pass
-        
-    def process_excel(self, excel_path: str, doc_id: str, filename: str) -> Tuple[List[Dict], Dict]:
-        """Returns dummy data for now"""
-        print(f"⚠️  Excel processing is not yet fully implemented for {filename}. Returning dummy data.")
-        time.sleep(1)
-        chunks = [{"content": f"Dummy chunk for Excel file {filename}", "metadata": {"doc_id": doc_id, "source": filename, "doc_type": "excel"}, "word_count": 10}]
-        stats = {"total_chunks": 1, "sheets": 1, "processing_time": 1.0}
+        self.embedding_model = embedding_model
+        self.tokenizer = tokenizer
+
+    def _measure(self, text: str) -> int:
+        if settings.CHUNKING_STRATEGY == "tokens":
+            return len(self.tokenizer.encode(text))
+        return len(text.split())
+
+    def _budget(self) -> int:
+        return settings.CHUNK_SIZE_TOKENS if settings.CHUNKING_STRATEGY == "tokens" else settings.CHUNK_SIZE
+
+    def format_cell(self, value) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, float):
+            return str(int(value)) if value.is_integer() else str(round(value, 6))
+        if isinstance(value, datetime):
+            return value.date().isoformat() if value.time() == dt_time() else value.isoformat(sep=" ")
+        if isinstance(value, (date, dt_time)):
+            return value.isoformat()
+        return " ".join(str(value).split())
+
+    def format_row(self, values) -> List[str]:
+        cells = [self.format_cell(value) for value in values]
+        while cells and not cells[-1]:
+            cells.pop()
+        return cells
+
+    def is_header(self, cells: List[str]) -> bool:
+        """A header row has at least two labels and no numbers (BOQ title rows are usually a single cell)"""
+        labels = [cell for cell in cells if cell]
+        return len(labels) >= 2 and not any(re.fullmatch(r"[-+]?[\d.,]+%?", label) for label in labels)
+
+    def iter_chunks(self, reporter: Optional[ProgressReporter], excel_path: str, doc_id: str, filename: str, stats: Dict) -> Iterator[Dict]:
+        """Streaming workbook processing pipeline.
+
+        Sheets are read row by row and chunks are yielded as soon as they fill
+        up, so callers embed and index them in batches, exactly as for PDFs.
+        `stats` is complete once the generator is exhausted.
+        """
+        print(f"\n{'='*60}\n📊 Processing Excel: {filename}\n{'='*60}")
+        start_time = time.time()
+        base_metadata = {"doc_id": str(doc_id), "source": str(filename), "type": "table", "doc_type": "excel"}
+        chunk_count = row_count = sheet_count = header_count = 0
+
+        def limited(title: str, pieces: List[Tuple[str, int, int, int]]) -> Iterator[Dict]:
+            nonlocal chunk_count
+            for content, first_row, last_row, _ in pieces:
+                if chunk_count >= settings.MAX_CHUNKS_PER_WORKBOOK:
+                    return
+                rows = f"{first_row}-{last_row}" if first_row != last_row else str(first_row)
+                chunk_meta = {**base_metadata, "page": f"{title} rows {rows}", "sheet": title, "rows": rows, "chunk_index": chunk_count}
+                chunk_count += 1
+                yield {"content": content, "metadata": clean_metadata(chunk_meta), "word_count": len(content.split())}
+
+        workbook = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+        try:
+            # From each sheet's dimension record; the rows themselves are not read here
+            total_rows = sum(sheet.max_row or 0 for sheet in workbook.worksheets)
+            for sheet in workbook.worksheets:
+                sheet_count += 1
+                title = " ".join(str(sheet.title).split())
+                chunker = RowChunker(self._measure, self._budget(), f"Sheet: {title}")
+                header_found = False
+                scanned = 0
+                for row_number, values in enumerate(sheet.iter_rows(values_only=True), 1):
+                    row_count += 1
+                    if total_rows and row_count % 1000 == 0 and reporter:
+                        reporter.update(ProcessingStage.EXTRACTING_CONTENT, min(99.0, row_count / total_rows * 100))
+                    cells = self.format_row(values)
+                    if not cells:
+                        continue
+                    if not header_found and scanned < self.HEADER_SCAN_ROWS:
+                        scanned += 1
+                        if self.is_header(cells):
+                            # Rows above the header (titles, notes) go out under the sheet name alone
+                            header_found = True
+                            header_count += 1
+                            yield from limited(title, chunker.set_prefix(f"Sheet: {title}\nHeaders: " + " | ".join(cells)))
+                            continue
+                    yield from limited(title, chunker.add_row(" | ".join(cells), row_number))
+                    if chunk_count >= settings.MAX_CHUNKS_PER_WORKBOOK:
+                        break
+                yield from limited(title, chunker.flush())
+                if chunk_count >= settings.MAX_CHUNKS_PER_WORKBOOK:
+                    print(f"⚠️  Limiting to {settings.MAX_CHUNKS_PER_WORKBOOK} chunks")
+                    break
+        finally:
+            # Read-only workbooks keep the file open until closed
+            workbook.close()
+
+        if not chunk_count:
+            raise Exception("Failed to extract any rows from workbook")
+
+        processing_time = time.time() - start_time
+        stats.update({
+            "total_chunks": chunk_count,
+            "sheets": sheet_count,
+            "sheets_with_header": header_count,
+            "rows": row_count,
+            "rows_per_second": round(row_count / processing_time, 1) if processing_time else None,
+            "processing_time": processing_time,
+        })
+        print(f"✅ Created {chunk_count} chunks from {row_count} rows in {sheet_count} sheets ({header_count} with a header row)")
+        print(f"⏱️  Processing time: {processing_time:.2f}s\n")
+
+    def process_excel(self, reporter: Optional[ProgressReporter], excel_path: str, doc_id: str, filename: str) -> Tuple[List[Dict], Dict]:
+        """Non-streaming wrapper around iter_chunks; returns (chunks, stats)"""
+        stats = {}
+        chunks = list(self.iter_chunks(reporter, excel_path, doc_id, filename, stats))
         return chunks, stats
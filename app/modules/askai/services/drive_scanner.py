@@ -0,0 +1,98 @@
+"""
+Breadth-first Google Drive folder scanner.
+
+Each level of the tree is listed with one query per group of parents
+(`'a' in parents or 'b' in parents ...`), the groups run concurrently and
+every query follows its page tokens, so a tree costs about one call per
+`parents_per_query` folders instead of one per folder.
+
+Listings are always fetched fresh. A folder's modifiedTime does not
+change when the content of a file inside it is edited, so it cannot be
+used to reuse a listing: the files' md5Checksum and modifiedTime must be
+current for Drive sync to see edits.
+
+The Drive client is injected through `client_factory` (called once per
+thread, as googleapiclient clients are not thread-safe). Anything with the
+`files().list(...).execute()` shape of the Drive v3 client works, including
+a local fake.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from app.modules.askai.models.document import DriveFile, DriveFolder
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+ITEM_FIELDS = "id, name, mimeType, size, md5Checksum, modifiedTime, parents"
+
+
+class DriveFolderScanner:
+    def __init__(self, client_factory: Callable[[], Any], max_workers: int = 8, parents_per_query: int = 20):
+        self.client_factory = client_factory
+        self.max_workers = max_workers
+        self.parents_per_query = parents_per_query
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats = {"folders": 0, "queries": 0}
+
+    def _client(self):
+        if not hasattr(self._local, "client"):
+            self._local.client = self.client_factory()
+        return self._local.client
+
+    def _list(self, query: str, fields: str) -> List[dict]:
+        """Run a files().list query, following every page."""
+        items, page_token = [], None
+        while True:
+            results = self._client().files().list(
+                q=query, fields=f"nextPageToken, files({fields})", pageSize=1000, pageToken=page_token
+            ).execute()
+            with self._stats_lock:
+                self.stats["queries"] += 1
+            items.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return items
+
+    def list_children(self, parent_ids: List[str]) -> Dict[str, List[dict]]:
+        """Direct children (files and folders) of several parents in one query, grouped by parent."""
+        parents = " or ".join(f"'{parent_id}' in parents" for parent_id in parent_ids)
+        listings: Dict[str, List[dict]] = {parent_id: [] for parent_id in parent_ids}
+        for item in self._list(f"({parents}) and trashed=false", ITEM_FIELDS):
+            # An item with several parents in this group belongs to each of them
+            for parent_id in item.get('parents', []):
+                if parent_id in listings:
+                    listings[parent_id].append(item)
+        return listings
+
+    def scan(self, root_id: str) -> DriveFolder:
+        """Scan the tree under `root_id` level by level and return its structure."""
+        listings: Dict[str, List[dict]] = {}
+        level = [root_id]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="drive-scan") as pool:
+            while level:
+                groups = [level[i:i + self.parents_per_query] for i in range(0, len(level), self.parents_per_query)]
+                next_level = []
+                for group_listings in pool.map(self.list_children, groups):
+                    listings.update(group_listings)
+                    next_level.extend(item['id'] for items in group_listings.values() for item in items
+                                      if item.get('mimeType') == FOLDER_MIME_TYPE)
+                self.stats["folders"] += len(level)
+                # Skip folders already scanned (a folder can have several parents)
+                level = list(dict.fromkeys(folder_id for folder_id in next_level if folder_id not in listings))
+
+        return self._build(root_id, listings, set())
+
+    def _build(self, folder_id: str, listings: Dict[str, List[dict]], seen: set) -> DriveFolder:
+        seen.add(folder_id)
+        files: List[DriveFile] = []
+        subfolders: List[DriveFolder] = []
+        for item in listings.get(folder_id, []):
+            if item.get('mimeType') == FOLDER_MIME_TYPE:
+                if item['id'] in listings and item['id'] not in seen:
+                    subfolders.append(self._build(item['id'], listings, seen))
+            else:
+                # The 'size' field might be missing for certain Google Docs formats
+                files.append(DriveFile.model_validate({**item, 'size': item.get('size', "0")}))
+        return DriveFolder(id=folder_id, files=files, subfolders=subfolders)
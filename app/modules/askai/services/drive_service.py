@@ -8,29 +8,30 @@ from dateutil import parser
 import io
 import os
 import re
-import tempfile
-import uuid
-from typing import List
-import re
-import tempfile
-import uuid
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
 from uuid import UUID
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.core.global_stores import upload_jobs
-from app.modules.askai.models.document import ProcessingJob, ProcessingStage, ProcessingStatus, UploadJob, DriveFile, DriveFolder
-from app.modules.askai.db.repository import ChatRepository
-from app.modules.askai.services.document_processing_service import process_uploaded_pdf
+from app.db.database import SessionLocal
+from app.core.global_stores import get_progress_reporter, notify_job_changed
+from app.modules.askai.models.document import ProcessingStage, ProcessingStatus, DriveFile, DriveFolder
+from app.modules.askai.db.repository import ChatRepository, DocumentRepository, DriveSource, IngestionJobRepository
+from app.modules.askai.services import ingestion_service
+from app.modules.askai.services.document_processing_service import link_existing_document, unlink_document
+from app.modules.askai.services.drive_scanner import DriveFolderScanner
 
 
 # Google drive setup
 SCOPES = ['https://www.googleapis.com/auth/drive']
 creds = None
+DRIVE_DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
 
-def authenticate_google_drive():
-    """Authenticates with the Google Drive API and returns a service object."""
+def get_drive_credentials():
+    """Loads (refreshing or creating if needed) the Google Drive OAuth credentials."""
     creds = None
     token_path = os.path.join(settings.ROOT_DIR, 'token.json')
     creds_path = os.path.join(settings.ROOT_DIR, 'credentials.json')
@@ -55,55 +56,51 @@ def authenticate_google_drive():
         # Save the credentials for the next run
         with open(token_path, 'w') as token:
             token.write(creds.to_json())
-            
+    return creds
+
+def build_drive_service(creds):
+    """Builds a Drive API client. Clients are not thread-safe, so build one per thread."""
+    return build('drive', 'v3', credentials=creds, cache_discovery=False)
+
+def authenticate_google_drive():
+    """Authenticates with the Google Drive API and returns a service object."""
+    creds = get_drive_credentials()
+    if not creds:
+        return None
     try:
-        service = build('drive', 'v3', credentials=creds)
+        service = build_drive_service(creds)
         print("✅ Google Drive API Authentication Successful!")
         return service
     except HttpError as error:
         print(f"An error occurred during authentication: {error}")
         return None
 
-def _scan_folder_recursively(service, folder_id: str) -> DriveFolder:
-    """Helper to recursively scan a Google Drive folder."""
+def extract_folder_id(drive_url: str) -> str:
+    match = re.search(r'/folders/([a-zA-Z0-9_-]+)', drive_url)
+    if not match:
+        raise ValueError("Invalid Google Drive folder URL provided.")
+    return match.group(1)
+
+def scan_drive_folder(folder_id: str, client_factory: Optional[Callable[[], Any]] = None) -> DriveFolder:
+    """Scans a Drive folder tree breadth-first, listing each level with a few grouped queries."""
+    if client_factory is None:
+        creds = get_drive_credentials()
+        if not creds:
+            raise Exception("Could not authenticate with Google Drive.")
+        client_factory = lambda: build_drive_service(creds)
+
+    scanner = DriveFolderScanner(client_factory, settings.DRIVE_SCAN_CONCURRENCY)
     try:
-        # List files and folders in the current folder
-        query = f"'{folder_id}' in parents and trashed=false"
-        # Request all fields needed for DriveFile model
-        fields = "files(id, name, mimeType, size)"
-        results = service.files().list(q=query, fields=fields).execute()
-        items = results.get('files', [])
-
-        files: List[DriveFile] = []
-        subfolders: List[DriveFolder] = []
-        for item in items:
-            if item.get('mimeType') == 'application/vnd.google-apps.folder':
-                subfolders.append(_scan_folder_recursively(service, item['id']))
-            else:
-                # The 'size' field might be missing for certain Google Docs formats
-                if 'size' not in item:
-                    item['size'] = "0"
-                files.append(DriveFile.model_validate(item))
-
-        return DriveFolder(
-            id=folder_id,
-            files=files,
-            subfolders=subfolders
-        )
+        folder_structure = scanner.scan(folder_id)
     except HttpError as error:
         print(f"An error occurred while scanning folder {folder_id}: {error}")
         raise Exception(f"Failed to access Google Drive folder. Please check permissions and URL.") from error
+    print(f"📁 Scanned Drive folder {folder_id}: {scanner.stats['folders']} folders in {scanner.stats['queries']} list calls")
+    return folder_structure
 
 def add_drive_folder_to_chat(db: Session, chat_id: UUID, drive_url: str) -> DriveFolder:
     """Scans a Google Drive folder and adds its structure to a chat document."""
-    service = authenticate_google_drive()
-    if not service:
-        raise Exception("Could not authenticate with Google Drive.")
-
-    match = re.search(r'/folders/([a-zA-Z0-9_-]+)', drive_url)
-    if not match:
-        raise ValueError("Invalid Google Drive folder URL provided.")
-    folder_id = match.group(1)
+    folder_id = extract_folder_id(drive_url)
 
     chat_repo = ChatRepository(db)
     chat = chat_repo.get_by_id(chat_id)
@@ -114,75 +111,227 @@ def add_drive_folder_to_chat(db: Session, chat_id: UUID, drive_url: str) -> Driv
     if any(folder['id'] == folder_id for folder in chat.drive_folders):
         raise ValueError(f"Drive folder {folder_id} is already added to this chat.")
 
-    folder_structure = _scan_folder_recursively(service, folder_id)
+    folder_structure = scan_drive_folder(folder_id)
 
     chat_repo.add_drive_folder(chat, folder_structure.model_dump())
     
     print(f"✅ Added Drive folder '{folder_id}' to chat '{chat_id}'")
     return folder_structure
 
-def download_files_from_drive(drive_url: str, conversation_id: str):
-    """
-    Downloads all files from a Google Drive folder and processes them.
-    This function is intended to be run in a background task.
-    """
-    service = authenticate_google_drive()
-    if not service:
-        print("❌ Could not authenticate with Google Drive. Aborting download.")
-        return
-
-    match = re.search(r'/folders/([a-zA-Z0-9_-]+)', drive_url)
-    if not match:
-        print(f"❌ Invalid Google Drive folder URL: {drive_url}")
-        return
-    folder_id = match.group(1)
-
-    try:
+def _iter_folder_files(service, folder_id: str) -> Iterator[dict]:
+    """Yield the downloadable files directly inside a folder, following every page of the listing."""
+    page_token = None
+    while True:
         results = service.files().list(
             q=f"'{folder_id}' in parents and trashed=false",
-            fields="nextPageToken, files(id, name)"
+            fields="nextPageToken, files(id, name, mimeType, md5Checksum, modifiedTime)",
+            pageSize=1000,
+            pageToken=page_token,
         ).execute()
-        items = results.get('files', [])
-
-        if not items:
-            print(f"No files found in the folder: {drive_url}")
+        for item in results.get('files', []):
+            # Only PDFs and workbooks can be ingested; folders and native Google Docs/Sheets have no content to download
+            if ingestion_service.drive_job_type(item['name'], item.get('mimeType', '')):
+                yield item
+        page_token = results.get('nextPageToken')
+        if not page_token:
             return
 
-        for item in items:
-            file_id = item['id']
-            file_name = item['name']
-            print(f"⬇️ Downloading {file_name} ({file_id})")
-
-            job_id = str(uuid.uuid4())
-            upload_jobs[job_id] = UploadJob(
-                job_id=job_id,
-                filename=file_name,
-                chat_id=conversation_id,
-                status=ProcessingStatus.DOWNLOADING,
-                stage=ProcessingStage.NOT_PROCESSING,
-                progress=0,
-                finished_at="",
-                chunks_added=0,
-                error=None
-            )
-            new_upload_job = upload_jobs[job_id]
+def _download_and_queue(service, item: dict, conversation_id: str, payload: Optional[dict] = None) -> bool:
+    """Download one Drive file into the upload directory and queue it for processing.
 
+    The file's UploadJob (an ingestion_jobs row) shows the download progress and then
+    the processing status. Returns False if the download failed.
+    """
+    file_id = item['id']
+    file_name = item['name']
+    print(f"⬇️ Downloading {file_name} ({file_id})")
+
+    db = SessionLocal()
+    try:
+        job_repo = IngestionJobRepository(db)
+        job = ingestion_service.create_download_job(db, UUID(conversation_id), file_name,
+                                                    job_type=ingestion_service.drive_job_type(file_name, item.get('mimeType', '')))
+        reporter = get_progress_reporter(str(job.id), conversation_id)
+        file_path = ingestion_service.new_upload_path(f"_{file_name}")
+
+        try:
             request = service.files().get_media(fileId=file_id)
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file_name}") as tmp_file:
-                downloader = MediaIoBaseDownload(tmp_file, request)
+            with open(file_path, "wb") as out_file:
+                downloader = MediaIoBaseDownload(out_file, request, chunksize=DRIVE_DOWNLOAD_CHUNK_SIZE)
                 done = False
                 while not done:
                     status, done = downloader.next_chunk()
-                    print(f"Download {int(status.progress() * 100)}%.")
-                    new_upload_job.progress = int(status.progress() * 100)
+                    reporter.update(ProcessingStage.NOT_PROCESSING, int(status.progress() * 100))
+            reporter.flush()
+        except (HttpError, OSError) as error:
+            # One bad file should not stop the rest of the folder
+            print(f'❌ Download failed for {file_name}: {error}')
+            ingestion_service.remove_upload(str(file_path))
+            job_repo.update(job.id, status=ProcessingStatus.FAILED.value, error=str(error), finished_at=datetime.now())
+            notify_job_changed(job_repo, str(job.id), conversation_id)
+            return False
 
-                temp_path = tmp_file.name
+        print(f"📂 File saved to upload path: {file_path}")
+        # Drive's md5Checksum is the MD5 of the content, so the worker need not hash the file again
+        ingestion_service.release_download(db, job, str(file_path), item.get('md5Checksum'), **(payload or {}))
+        notify_job_changed(job_repo, str(job.id), conversation_id)
+        return True
+    finally:
+        db.close()
 
-            print(f"📂 File saved to temporary path: {temp_path}")
-            
-            new_upload_job.status = ProcessingStatus.QUEUED
-            process_uploaded_pdf(temp_path, conversation_id, file_name, job_id)
+def download_files_from_drive(drive_url: str, conversation_id: str, on_progress: Optional[Callable[[float], None]] = None):
+    """
+    Downloads all files from a Google Drive folder, DRIVE_DOWNLOAD_CONCURRENCY at a time,
+    and queues each one for processing as soon as it lands.
+    Runs inside the ingestion worker as a 'drive_folder' job; `on_progress` receives the
+    percentage of files done after each file.
+    """
+    creds = get_drive_credentials()
+    if not creds:
+        raise Exception("Could not authenticate with Google Drive.")
 
-    except HttpError as error:
-        print(f'An error occurred: {error}')
+    folder_id = extract_folder_id(drive_url)
+
+    # Downloads start while later pages of the listing are still being fetched. The Drive
+    # metadata is stored with each of the chat's documents so later syncs only fetch what changed.
+    downloads = (
+        (item, {"drive_file": {key: item.get(key) for key in ("id", "md5Checksum", "modifiedTime")}})
+        for item in _iter_folder_files(build_drive_service(creds), folder_id)
+    )
+    results = _download_all(creds, downloads, conversation_id, on_progress)
+
+    if not results:
+        print(f"No files found in the folder: {drive_url}")
+        return
+    print(f"✅ Drive import for chat {conversation_id}: {results.count(True)} files queued, {results.count(False)} failed")
+
+def _download_all(creds, downloads: Iterable[Tuple[dict, Optional[dict]]], conversation_id: str,
+                  on_progress: Optional[Callable[[float], None]] = None) -> List[bool]:
+    """Download (item, extra job payload) pairs DRIVE_DOWNLOAD_CONCURRENCY at a time; returns per-file success."""
+    thread_state = threading.local()
+
+    def download(item: dict, payload: Optional[dict]) -> bool:
+        if not hasattr(thread_state, "service"):
+            thread_state.service = build_drive_service(creds)
+        return _download_and_queue(thread_state.service, item, conversation_id, payload)
+
+    with ThreadPoolExecutor(max_workers=settings.DRIVE_DOWNLOAD_CONCURRENCY, thread_name_prefix="drive-download") as pool:
+        futures = [pool.submit(download, item, payload) for item, payload in downloads]
+        results = []
+        for future in as_completed(futures):
+            results.append(future.result())
+            if on_progress:
+                on_progress(len(results) / len(futures) * 100)
+    return results
+
+def _iter_tree_files(folder: DriveFolder) -> Iterator[DriveFile]:
+    for drive_file in folder.files:
+        if not drive_file.mime_type.startswith('application/vnd.google-apps.'):
+            yield drive_file
+    for subfolder in folder.subfolders:
+        yield from _iter_tree_files(subfolder)
+
+def _stored_file_ids(folder: dict) -> set:
+    """Drive file ids in a folder structure as stored on the chat (DriveFolder.model_dump())."""
+    file_ids = {drive_file['id'] for drive_file in folder.get('files', [])}
+    for subfolder in folder.get('subfolders', []):
+        file_ids |= _stored_file_ids(subfolder)
+    return file_ids
+
+def sync_drive_folders(conversation_id: str, folder_ids: Optional[List[str]] = None,
+                       on_progress: Optional[Callable[[float], None]] = None) -> dict:
+    """
+    Incrementally sync a chat with its linked Drive folders (all of them unless `folder_ids` is given).
+
+    Files are matched to the chat's documents by content hash (Drive's md5Checksum is the
+    MD5 our file_hash uses) and by Drive file id:
+    - files that are not PDFs or workbooks (Docs, images...) are skipped;
+    - unchanged files are skipped;
+    - new or changed files whose content is already indexed elsewhere are linked;
+    - other new or changed files are downloaded and queued, and a changed file's previous
+      version is removed once the new one is indexed;
+    - documents whose Drive file is gone are removed with their vectors and chunks. When only
+      some of the chat's folders are synced, that is limited to files the synced folders held
+      at their previous sync, so documents from the other folders are left alone.
+    Listings are fetched fresh (see drive_scanner), so edited files are seen as changed.
+    Runs inside the ingestion worker as a 'drive_sync' job.
+    """
+    creds = get_drive_credentials()
+    if not creds:
+        raise Exception("Could not authenticate with Google Drive.")
+
+    db = SessionLocal()
+    try:
+        chat_repo = ChatRepository(db)
+        doc_repo = DocumentRepository(db)
+        chat = chat_repo.get_by_id(UUID(conversation_id))
+        if not chat:
+            raise ValueError(f"Chat {conversation_id} not found")
+        linked = {folder['id']: folder for folder in chat.drive_folders or []}
+        folder_ids = folder_ids or list(linked)
+        if not folder_ids:
+            raise ValueError("Chat has no linked Google Drive folders")
+        # With a subset, only files last seen in these folders may be removed
+        all_folders = set(folder_ids) >= set(linked)
+        previous_file_ids = set().union(*(_stored_file_ids(linked[folder_id]) for folder_id in folder_ids if folder_id in linked))
+        other_file_ids = set().union(*(_stored_file_ids(folder) for folder_id, folder in linked.items() if folder_id not in folder_ids))
+
+        remote = {}
+        for folder_id in folder_ids:
+            structure = scan_drive_folder(folder_id, lambda: build_drive_service(creds))
+            chat_repo.set_drive_folder(chat, structure.model_dump())
+            remote.update({drive_file.id: drive_file for drive_file in _iter_tree_files(structure)})
+        remote_hashes = {drive_file.md5_checksum for drive_file in remote.values() if drive_file.md5_checksum}
+
+        by_hash = {doc.file_hash: doc for doc in chat.documents}
+        # Drive metadata is stored per chat, since chats share documents by content hash
+        sources = doc_repo.get_drive_sources(chat.id)
+        by_drive_id = {sources[doc.id].file_id: doc for doc in chat.documents if doc.id in sources}
+        summary = {"unchanged": 0, "linked": 0, "queued": 0, "failed": 0, "removed": 0, "skipped": 0}
+        downloads = []
+        for drive_file in remote.values():
+            if not ingestion_service.drive_job_type(drive_file.name, drive_file.mime_type):
+                # Not a PDF or workbook: queuing it would only fail in the pipeline after every retry
+                summary["skipped"] += 1
+                continue
+            previous = by_drive_id.get(drive_file.id)
+            current = by_hash.get(drive_file.md5_checksum) if drive_file.md5_checksum else None
+            if not current and not drive_file.md5_checksum and previous and sources[previous.id].modified_time == drive_file.modified_time:
+                current = previous
+            if current:
+                source = DriveSource(drive_file.id, drive_file.md5_checksum, drive_file.modified_time)
+                if sources.get(current.id) != source:
+                    doc_repo.set_drive_metadata(chat, current, *source)
+                summary["unchanged"] += 1
+                continue
+
+            existing = doc_repo.get_by_hash(drive_file.md5_checksum) if drive_file.md5_checksum else None
+            if existing and existing.status == "active":
+                # Same content already indexed for another chat: no download needed
+                link_existing_document(db, chat, existing)
+                doc_repo.set_drive_metadata(chat, existing, drive_file.id, drive_file.md5_checksum, drive_file.modified_time)
+                if previous:
+                    unlink_document(db, chat, previous)
+                summary["linked"] += 1
+                continue
+
+            drive_meta = {"id": drive_file.id, "md5Checksum": drive_file.md5_checksum, "modifiedTime": drive_file.modified_time}
+            downloads.append((
+                {"id": drive_file.id, "name": drive_file.name, "mimeType": drive_file.mime_type, "md5Checksum": drive_file.md5_checksum},
+                {"drive_file": drive_meta, "replaces": str(previous.id) if previous else None},
+            ))
+
+        for doc in list(chat.documents):
+            source = sources.get(doc.id)
+            if not source or source.file_id in remote or doc.file_hash in remote_hashes:
+                continue
+            if all_folders or (source.file_id in previous_file_ids and source.file_id not in other_file_ids):
+                unlink_document(db, chat, doc)
+                summary["removed"] += 1
+
+        results = _download_all(creds, downloads, conversation_id, on_progress)
+        summary["queued"], summary["failed"] = results.count(True), results.count(False)
+        print(f"🔄 Drive sync for chat {conversation_id}: {summary}")
+        return summary
+    finally:
+        db.close()
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import stat
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from fastapi import UploadFile
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.modules.askai.db.models import IngestionJob
+from app.modules.askai.db.repository import IngestionJobRepository
+from app.modules.askai.models.document import ProcessingJob, ProcessingStage, ProcessingStatus, UploadJob
+from app.utils import ensure_directory_exists
+
+JOB_TYPE_PDF = "pdf"
+JOB_TYPE_EXCEL = "excel"
+JOB_TYPE_DRIVE_FOLDER = "drive_folder"
+JOB_TYPE_DRIVE_SYNC = "drive_sync"
+
+# Jobs that produce a document, i.e. the ones listed next to a chat's documents
+DOCUMENT_JOB_TYPES = [JOB_TYPE_PDF, JOB_TYPE_EXCEL]
+
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+PDF_MIME_TYPE = "application/pdf"
+EXCEL_MIME_TYPES = ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    "application/vnd.ms-excel.sheet.macroEnabled.12")
+
+# Read size when copying uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# How long finished and failed jobs keep showing up in a chat's document list
+RECENT_JOB_WINDOW = timedelta(hours=1)
+
+
+class PermanentJobError(Exception):
+    """A job failure that retrying cannot fix (e.g. the document is already in the chat); the job fails at once."""
+
+
+def new_upload_path(suffix: str) -> Path:
+    """A fresh path in the upload directory shared by the API and the ingestion worker."""
+    ensure_directory_exists(settings.UPLOAD_DIR)
+    return settings.UPLOAD_DIR / f"{uuid4()}{suffix}"
+
+async def receive_upload(upload: UploadFile, suffix: str, max_bytes: int) -> Tuple[Path, str, int]:
+    """
+    Stream an upload into the upload directory in fixed-size chunks, hashing it on the way.
+    Only one chunk is held in memory. Raises ValueError (and removes the partial file) as soon
+    as the upload exceeds `max_bytes`. Returns (path, md5 hex digest, size in bytes).
+    """
+    path = new_upload_path(suffix)
+    hasher = hashlib.md5()
+    size = 0
+    try:
+        with open(path, "wb") as out_file:
+            os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"File too large. Max: {max_bytes // (1024 * 1024)}MB")
+                hasher.update(chunk)
+                await run_in_threadpool(out_file.write, chunk)
+    except BaseException:
+        remove_upload(str(path))
+        raise
+    return path, hasher.hexdigest(), size
+
+def remove_upload(file_path: Optional[str]) -> None:
+    try:
+        if file_path and os.path.exists(file_path):
+            os.unlink(file_path)
+    except OSError as e:
+        print(f"⚠️  Could not remove upload {file_path}: {e}")
+
+def job_type_for(filename: str) -> str:
+    """The document job type for a file, by extension (PDF unless it is a workbook)."""
+    return JOB_TYPE_EXCEL if filename.lower().endswith(EXCEL_EXTENSIONS) else JOB_TYPE_PDF
+
+def drive_job_type(name: str, mime_type: str) -> Optional[str]:
+    """The document job type for a Drive file, or None if it cannot be ingested (Google Docs, images, Word files...)."""
+    if mime_type == PDF_MIME_TYPE:
+        return JOB_TYPE_PDF
+    if mime_type in EXCEL_MIME_TYPES or name.lower().endswith(EXCEL_EXTENSIONS):
+        return JOB_TYPE_EXCEL
+    return None
+
+def enqueue_document(db: Session, chat_id: UUID, filename: str, file_path: str, file_hash: Optional[str] = None,
+                     priority: int = settings.INGESTION_PRIORITY_UPLOAD) -> IngestionJob:
+    """Queue a PDF or workbook that is already on disk for the ingestion worker."""
+    job = IngestionJobRepository(db).create(
+        job_type_for(filename), chat_id, filename, {"file_path": str(file_path), "file_hash": file_hash},
+        priority=priority, max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+    )
+    print(f"📥 Queued {filename} for chat {chat_id} (job {job.id})")
+    return job
+
+def create_download_job(db: Session, chat_id: UUID, filename: str, priority: int = settings.INGESTION_PRIORITY_DRIVE,
+                        job_type: Optional[str] = None) -> IngestionJob:
+    """Register a file that is still being downloaded; workers do not pick it up until release_download()."""
+    return IngestionJobRepository(db).create(
+        job_type or job_type_for(filename), chat_id, filename, {}, priority=priority,
+        max_attempts=settings.INGESTION_MAX_ATTEMPTS, status=ProcessingStatus.DOWNLOADING.value,
+    )
+
+def release_download(db: Session, job: IngestionJob, file_path: str, file_hash: Optional[str] = None, **payload) -> None:
+    """Queue a downloaded file; extra payload (e.g. drive_file, replaces) is passed on to processing."""
+    IngestionJobRepository(db).update(job.id, payload={"file_path": str(file_path), "file_hash": file_hash, **payload},
+                                      status=ProcessingStatus.QUEUED.value, progress=0)
+
+def enqueue_drive_folder(db: Session, chat_id: UUID, drive_url: str) -> IngestionJob:
+    return IngestionJobRepository(db).create(
+        JOB_TYPE_DRIVE_FOLDER, chat_id, drive_url, {"drive_url": drive_url},
+        priority=settings.INGESTION_PRIORITY_DRIVE, max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+    )
+
+def enqueue_drive_sync(db: Session, chat_id: UUID, folder_ids: Optional[List[str]] = None) -> IngestionJob:
+    """Queue an incremental sync of the chat's Drive folders (all linked folders if none are given)."""
+    return IngestionJobRepository(db).create(
+        JOB_TYPE_DRIVE_SYNC, chat_id, "Google Drive sync", {"folder_ids": folder_ids},
+        priority=settings.INGESTION_PRIORITY_DRIVE, max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+    )
+
+def record_finished_upload(db: Session, chat_id: UUID, filename: str, chunks_added: int) -> IngestionJob:
+    """Record an upload that completed without queueing (e.g. linked to an existing document)."""
+    return IngestionJobRepository(db).create(
+        job_type_for(filename), chat_id, filename, {}, status=ProcessingStatus.FINISHED.value,
+        progress=100, chunks_added=chunks_added, finished_at=datetime.now(),
+    )
+
+def to_upload_job(job: IngestionJob) -> UploadJob:
+    return UploadJob(
+        job_id=str(job.id),
+        filename=job.filename,
+        chat_id=str(job.chat_id),
+        status=ProcessingStatus(job.status),
+        stage=ProcessingStage(job.stage),
+        progress=job.progress,
+        finished_at=job.finished_at.isoformat() if job.finished_at else "",
+        chunks_added=job.chunks_added,
+        error=job.error,
+    )
+
+def get_chat_jobs(db: Session, chat_id: UUID) -> List[ProcessingJob]:
+    """Pending document jobs for a chat, plus recently finished or failed ones."""
+    jobs = IngestionJobRepository(db).get_for_chat(chat_id, DOCUMENT_JOB_TYPES, datetime.now() - RECENT_JOB_WINDOW)
+    return [
+        ProcessingJob(name=job.filename, job_id=str(job.id), status=ProcessingStatus(job.status),
+                      stage=ProcessingStage(job.stage), progress=job.progress)
+        for job in jobs
+    ]
@@ -0,0 +1,243 @@
+"""
+Single-pass, page-level PDF pipeline for PDFProcessor.
+
+The document is opened once and every page is visited once; routing, text
+extraction, OCR and table detection all run as stages on the same page
+object. The functions in this module also run inside a process
+pool, so it deliberately imports nothing from the app (no settings, no
+models). Results carry raw text; cleaning happens in the parent process.
+"""
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+
+
+# Bump when the OCR stage changes output, so cached OCR text is not reused.
+OCR_VERSION = "gray-adaptive-v2"
+
+POINTS_PER_SQ_INCH = 72 * 72
+
+# Errors that fail OCR for a single page. pytesseract raises a plain RuntimeError on timeout,
+# TesseractError (a RuntimeError subclass) when Tesseract exits non-zero and
+# TesseractNotFoundError (an OSError) when the binary is missing; PIL raises OSError on bad image data.
+OCR_ERRORS = (RuntimeError, pytesseract.TesseractError, pytesseract.TesseractNotFoundError, OSError)
+
+
+def create_executor(max_workers: int) -> ProcessPoolExecutor:
+    """Create a process pool for page extraction.
+
+    The 'spawn' context is used because the API process holds torch and gRPC
+    threads, which are not safe to fork.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+def page_batches(page_count: int, batch_size: int) -> List[Tuple[int, int]]:
+    """Split [0, page_count) into contiguous (start, end) page ranges."""
+    return [(start, min(start + batch_size, page_count)) for start in range(0, page_count, batch_size)]
+
+# --- Page stages ---
+
+def extract_text(page: fitz.Page) -> str:
+    return page.get_text() or ""
+
+def choose_ocr_dpi(page: fitz.Page, options: Dict) -> int:
+    """Pick a render resolution for OCR.
+
+    Tesseract reads best when capital letters are roughly 30px tall. When the
+    page has a text layer, the median font size gives the DPI that achieves
+    that; otherwise the native resolution of the largest embedded image is
+    used (rendering a scan above its own resolution adds nothing). The result
+    is clamped to [ocr_min_dpi, ocr_max_dpi] and to the pixel budget.
+    """
+    min_dpi = options.get("ocr_min_dpi", 150)
+    max_dpi = options.get("ocr_max_dpi", 300)
+    dpi = options.get("ocr_default_dpi", 200)
+
+    sizes = sorted(
+        span["size"]
+        for block in page.get_text("dict")["blocks"]
+        for line in block.get("lines", [])
+        for span in line["spans"]
+        if span["text"].strip() and span["size"] > 0
+    )
+    if sizes:
+        dpi = 30 * 72 / sizes[len(sizes) // 2]
+    else:
+        images = [info for info in page.get_image_info() if abs(fitz.Rect(info["bbox"]))]
+        if images:
+            largest = max(images, key=lambda info: abs(fitz.Rect(info["bbox"])))
+            width_inches = fitz.Rect(largest["bbox"]).width / 72
+            if width_inches:
+                dpi = largest["width"] / width_inches
+
+    # Large pages (drawings, A1 maps) are rendered at lower DPI rather than blowing the budget
+    area_sq_inches = (abs(page.rect) or 1.0) / POINTS_PER_SQ_INCH
+    budget_dpi = (options.get("ocr_max_megapixels", 16) * 1_000_000 / area_sq_inches) ** 0.5
+    return int(min(max(dpi, min_dpi), max_dpi, budget_dpi))
+
+def ocr_page(page: fitz.Page, dpi: int = 200, timeout: float = 0) -> str:
+    """Render the page in grayscale and OCR it.
+
+    Raises RuntimeError if Tesseract runs longer than `timeout` seconds (0 disables the limit),
+    and one of the other OCR_ERRORS if Tesseract or the image conversion fails.
+    """
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    img = Image.frombytes("L", [pix.width, pix.height], pix.samples)
+    return pytesseract.image_to_string(img, timeout=timeout) or ""
+
+def find_tables(page: fitz.Page) -> List[List[List[Optional[str]]]]:
+    """Detect tables on the page and return them as lists of rows."""
+    return [table.extract() for table in page.find_tables().tables]
+
+def count_rulings(page: fitz.Page, limit: int) -> int:
+    """Count straight ruling segments in the page's vector drawings, stopping at `limit`.
+
+    Lines count once, rectangles and quads count as four edges (a thin
+    filled rectangle is a single rule).
+    """
+    rulings = 0
+    for path in page.get_drawings():
+        for item in path["items"]:
+            if item[0] == "l":
+                rulings += 1
+            elif item[0] == "re":
+                rect = item[1]
+                rulings += 1 if min(rect.width, rect.height) < 2 else 4
+            elif item[0] == "qu":
+                rulings += 4
+        if rulings >= limit:
+            break
+    return rulings
+
+def is_table_candidate(page: fitz.Page, options: Dict) -> bool:
+    """Cheap check for whether find_tables can find anything on the page.
+
+    find_tables uses the default "lines" strategy, which builds cells from
+    vector rulings; pages with fewer rulings than a minimal grid cannot
+    produce a table, so they are skipped without running the detector.
+    """
+    min_rulings = options.get("table_min_rulings", 6)
+    return count_rulings(page, min_rulings) >= min_rulings
+
+# --- Page routing ---
+
+def image_coverage(page: fitz.Page) -> float:
+    """Fraction of the page area covered by embedded images (overlaps are not merged)."""
+    page_rect = page.rect
+    page_area = abs(page_rect) or 1.0
+    covered = 0.0
+    for info in page.get_image_info():
+        covered += abs(fitz.Rect(info["bbox"]) & page_rect)
+    return min(1.0, covered / page_area)
+
+def classify_page(page: fitz.Page, text: str, options: Dict) -> str:
+    """Route a page to 'text', 'ocr' or 'empty'.
+
+    A page goes to OCR when its text layer is sparse (fewer characters per
+    square inch than the threshold) and images cover most of it, or when it
+    has images but no text at all. Scanned annexures with a stamped page
+    number are therefore OCR'd, while text pages with a logo are not.
+    """
+    chars = len(text.strip())
+    coverage = image_coverage(page)
+    density = chars / ((abs(page.rect) or 1.0) / POINTS_PER_SQ_INCH)
+
+    if coverage >= options.get("ocr_min_image_coverage", 0.5) and density < options.get("ocr_max_text_density", 1.0):
+        return "ocr"
+    if chars:
+        return "text"
+    if coverage > 0:
+        return "ocr"
+    return "empty"
+
+def looks_scanned(doc: fitz.Document, options: Dict, sample: int = 3) -> bool:
+    """Whether the first few pages would be routed to OCR (used to size page batches)."""
+    pages = [doc[page_num] for page_num in range(min(sample, doc.page_count))]
+    return any(classify_page(page, extract_text(page), options) == "ocr" for page in pages)
+
+def process_page(page: fitz.Page, options: Dict) -> Dict:
+    """Route the page, then run every enabled stage on it.
+
+    Time spent in each stage is returned in seconds under "timings".
+    """
+    result = {"page": page.number + 1, "text": "", "source": None, "route": None, "tables": [], "timings": {}}
+    timings = result["timings"]
+
+    if options.get("text", True):
+        started = time.perf_counter()
+        text = extract_text(page)
+        route = classify_page(page, text, options)
+        if route == "ocr" and not options.get("ocr", True):
+            route = "text" if text.strip() else "empty"
+        result["route"] = route
+        timings["text"] = time.perf_counter() - started
+
+        if route == "ocr":
+            started = time.perf_counter()
+            cached = options.get("ocr_cache", {}).get(result["page"])
+            ocr_text = cached
+            if cached is None:
+                result["ocr_dpi"] = choose_ocr_dpi(page, options)
+                try:
+                    ocr_text = ocr_page(page, result["ocr_dpi"], options.get("ocr_timeout", 0))
+                except OCR_ERRORS as e:
+                    # Timeouts, a missing or failing Tesseract and image errors only cost this page
+                    # its OCR: fall back to the text layer and record the failed route
+                    print(f"⚠️  OCR failed on page {result['page']}: {e!r}")
+                    result["route"] = "ocr_failed"
+                    if type(e) is RuntimeError:
+                        result["ocr_timed_out"] = True
+                    else:
+                        result["ocr_error"] = repr(e)
+                    ocr_text = ""
+            result["ocr_cached"] = cached is not None
+            if ocr_text.strip():
+                result["text"], result["source"] = ocr_text, "tesseract"
+            timings["ocr"] = time.perf_counter() - started
+        if not result["source"] and text.strip():
+            result["text"], result["source"] = text, "pymupdf"
+
+    if options.get("tables", True):
+        candidate = True
+        if options.get("table_prefilter", True):
+            started = time.perf_counter()
+            candidate = is_table_candidate(page, options)
+            timings["table_prefilter"] = time.perf_counter() - started
+        result["table_candidate"] = candidate
+
+        if candidate:
+            started = time.perf_counter()
+            try:
+                result["tables"] = find_tables(page)
+            except Exception as e:
+                print(f"⚠️  Table detection error on page {result['page']}: {e}")
+            timings["tables"] = time.perf_counter() - started
+
+    return result
+
+def iter_pages(doc: fitz.Document, start: int, end: int, options: Dict) -> Iterator[Dict]:
+    """Run the page pipeline over pages [start, end) of an already open document."""
+    for page_num in range(start, min(end, doc.page_count)):
+        yield process_page(doc[page_num], options)
+
+def range_options(options: Dict, start: int, end: int) -> Dict:
+    """Options for pages [start, end), with the OCR cache cut down to those pages.
+
+    Called in the parent before submitting a range, so each worker job only
+    pickles the cached OCR text it can use rather than the whole document's.
+    """
+    ocr_cache = options.get("ocr_cache") or {}
+    return dict(options, ocr_cache={page: text for page, text in ocr_cache.items() if start < page <= end})
+
+def process_page_range(pdf_path: str, start: int, end: int, options: Dict) -> List[Dict]:
+    """Process-pool entry point: open the document once and run pages [start, end).
+
+    `options` should come from range_options, so only this range's cached OCR text is shipped.
+    """
+    with fitz.open(pdf_path) as doc:
+        return list(iter_pages(doc, start, end, options))
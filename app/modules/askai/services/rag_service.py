@@ -34,6 +34,10 @@ def send_message_to_chat(db: Session, chat_id: UUID, user_message: str) -> Dict:
                     content_type = meta.get('type', 'text')
                     location = f"Page {page}"
                     if content_type == 'table': location += ", Table"
+                elif doc_type == 'excel':
+                    # 'page' holds the sheet and row range, e.g. "BOQ rows 120-141"
+                    location = f"Sheet {meta.get('page', 'unknown')}"
+                    content_type = meta.get('type', 'table')
                 else:
                     location = "Unknown location"
                     content_type = meta.get('type', 'unknown')
@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from app.modules.health.models.health import HealthResponse
 from app.utils import get_consistent_timestamp
-from app.core.services import pdf_processor
+from app.core.services import pdf_processor, vector_store
 
 router = APIRouter()
 
@@ -11,5 +11,6 @@ def health_check():
     return {
         "status": "healthy",
         "timestamp": get_consistent_timestamp(),
-        "llamaparse": "available" if pdf_processor.has_llamaparse else "unavailable"
+        "llamaparse": "available" if pdf_processor.has_llamaparse else "unavailable",
+        "query_cache": vector_store.query_cache.stats() if vector_store and vector_store.query_cache else None,
     }
@@ -1,6 +1,15 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
+class QueryCacheStats(BaseModel):
+    hits: int
+    misses: int
+    size: int
+    max_size: int
+
 class HealthResponse(BaseModel):
     status: str
     timestamp: str
     llamaparse: str
+    query_cache: Optional[QueryCacheStats] = None
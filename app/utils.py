@@ -1,6 +1,10 @@
 import hashlib
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
 
 def get_consistent_timestamp() -> str:
     """Return ISO format timestamp"""
@@ -30,3 +34,9 @@ def format_file_size(size_bytes: int) -> str:
             return f"{size_bytes:.2f} {unit}"
         size_bytes /= 1024.0
     return f"{size_bytes:.2f} TB"
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Yield lists of up to `size` items from an iterable, consuming it lazily"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -0,0 +1,190 @@
+"""
+Ingestion worker: runs the uploads and Drive imports queued in the
+ingestion_jobs table, outside the API process.
+
+    python -m app.worker
+
+Starts INGESTION_WORKER_PROCESSES processes, each running
+INGESTION_WORKER_THREADS job loops that share one copy of the embedding
+model. Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, highest
+priority first, so any number of worker processes (on any number of hosts
+sharing UPLOAD_DIR) can run against the same database. Failed jobs are
+retried with a growing delay, and jobs left behind by a crashed worker are
+requeued once their lease runs out. A running job's lease is renewed by a
+heartbeat thread, and a worker that lost its lease cannot finish or fail
+the job any more.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from typing import Callable
+from uuid import UUID
+
+from app.config import settings
+from app.db.database import SessionLocal
+from app.modules.askai.db.models import IngestionJob
+from app.modules.askai.db.repository import IngestionJobRepository
+from app.modules.askai.services import ingestion_service
+
+
+def handle_job(job: IngestionJob, on_progress: Callable[[float], None]) -> int:
+    """Run one job; returns the number of chunks it indexed. Drive jobs report progress through `on_progress`."""
+    # Imported here so the supervisor process never loads the embedding model
+    from app.modules.askai.services.document_processing_service import process_uploaded_document
+    from app.modules.askai.services.drive_service import download_files_from_drive, sync_drive_folders
+
+    payload = job.payload or {}
+    if job.job_type in ingestion_service.DOCUMENT_JOB_TYPES:
+        return process_uploaded_document(payload["file_path"], str(job.chat_id), job.filename, str(job.id), payload.get("file_hash"),
+                                         payload.get("drive_file"), payload.get("replaces"), doc_type=job.job_type)
+    if job.job_type == ingestion_service.JOB_TYPE_DRIVE_FOLDER:
+        download_files_from_drive(payload["drive_url"], str(job.chat_id), on_progress)
+        return 0
+    if job.job_type == ingestion_service.JOB_TYPE_DRIVE_SYNC:
+        sync_drive_folders(str(job.chat_id), payload.get("folder_ids"), on_progress)
+        return 0
+    raise ValueError(f"Unknown job type '{job.job_type}'")
+
+def heartbeat(job_id: UUID, worker_id: str, attempt: int, done: threading.Event) -> None:
+    """Renew a running job's lease until `done` is set, so slow jobs (a long LlamaParse call) are not requeued."""
+    while not done.wait(settings.INGESTION_JOB_LEASE_SECONDS / 4):
+        db = SessionLocal()
+        try:
+            if not IngestionJobRepository(db).heartbeat(job_id, worker_id, attempt):
+                print(f"⚠️  {worker_id}: lost the lease on job {job_id}")
+                return
+        except Exception as e:
+            print(f"⚠️  {worker_id}: heartbeat for job {job_id} failed: {e}")
+        finally:
+            db.close()
+
+def job_loop(worker_id: str, stop: threading.Event) -> None:
+    """Claim and run jobs until `stop` is set."""
+    from app.core.global_stores import job_leases, notify_job_changed
+
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            repo = IngestionJobRepository(db)
+            job = repo.claim_next(worker_id)
+            if not job:
+                stop.wait(settings.INGESTION_POLL_SECONDS)
+                continue
+
+            # Plain values: the job's attributes are reloaded after a commit and could show another worker's claim
+            job_uuid, attempt = job.id, job.attempts
+            job_id, chat_id = str(job_uuid), str(job.chat_id)
+            file_path = (job.payload or {}).get("file_path")
+            notify_job_changed(repo, job_id, chat_id)
+            print(f"⚙️  {worker_id}: {job.job_type} job {job_id} ({job.filename}), attempt {attempt}/{job.max_attempts}")
+            done = threading.Event()
+            threading.Thread(target=heartbeat, args=(job_uuid, worker_id, attempt, done), name=f"heartbeat-{job_id}", daemon=True).start()
+            job_leases[job_id] = (worker_id, attempt)
+            try:
+                chunks_added = handle_job(job, lambda progress: repo.update_leased(job_uuid, worker_id, attempt, progress=progress))
+            except Exception as e:
+                traceback.print_exc()
+                db.rollback()
+                status = repo.fail(job_uuid, worker_id, attempt, str(e), settings.INGESTION_RETRY_DELAY_SECONDS * attempt,
+                                   retry=not isinstance(e, ingestion_service.PermanentJobError))
+                if status is None:
+                    print(f"⚠️  Job {job_id} failed after its lease was lost: {e}")
+                else:
+                    print(f"❌ Job {job_id} failed: {e}" + (" (will retry)" if status == "queued" else ""))
+                if status == "failed":
+                    ingestion_service.remove_upload(file_path)
+            else:
+                if repo.finish(job_uuid, worker_id, attempt, chunks_added):
+                    ingestion_service.remove_upload(file_path)
+                    print(f"✅ Job {job_id} finished ({chunks_added} chunks)")
+                else:
+                    print(f"⚠️  Job {job_id} finished after its lease was lost; leaving it to its new owner")
+            finally:
+                done.set()
+                job_leases.pop(job_id, None)
+            notify_job_changed(repo, job_id, chat_id)
+        except Exception as e:
+            # Database unavailable and the like: back off instead of spinning
+            print(f"⚠️  {worker_id}: {e}")
+            stop.wait(settings.INGESTION_POLL_SECONDS)
+        finally:
+            db.close()
+
+def worker_process(index: int) -> None:
+    """Entry point of one worker process."""
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    from app.core import services
+    from app.core.global_stores import persist_progress_event, progress_bus
+    progress_bus.subscribe(persist_progress_event)
+
+    threads = [
+        threading.Thread(target=job_loop, args=(f"{socket.gethostname()}:{os.getpid()}:{i}", stop), name=f"job-loop-{i}")
+        for i in range(settings.INGESTION_WORKER_THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    print(f"✅ Ingestion worker {index} ready with {len(threads)} job threads")
+    # Poll rather than block in join() so signals are handled promptly
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(timeout=1)
+    services.pdf_processor.close()
+
+def main() -> None:
+    context = multiprocessing.get_context("spawn")
+    processes = {}
+    stopping = threading.Event()
+
+    def start(index: int) -> None:
+        process = context.Process(target=worker_process, args=(index,), name=f"ingestion-worker-{index}")
+        process.start()
+        processes[index] = process
+
+    def shutdown(*_):
+        stopping.set()
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM: workers finish their current jobs, then exit
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"🚀 Starting {settings.INGESTION_WORKER_PROCESSES} ingestion worker processes")
+    for index in range(settings.INGESTION_WORKER_PROCESSES):
+        start(index)
+
+    last_reap = 0.0
+    while not stopping.is_set():
+        for index, process in list(processes.items()):
+            if not process.is_alive() and not stopping.is_set():
+                print(f"⚠️  Ingestion worker {index} exited with code {process.exitcode}; restarting")
+                start(index)
+
+        if time.monotonic() - last_reap >= settings.INGESTION_JOB_LEASE_SECONDS / 4:
+            last_reap = time.monotonic()
+            db = SessionLocal()
+            try:
+                requeued = IngestionJobRepository(db).requeue_stale(settings.INGESTION_JOB_LEASE_SECONDS)
+                if requeued:
+                    print(f"♻️  Requeued {requeued} jobs from unresponsive workers")
+            except Exception as e:
+                print(f"⚠️  Stale job check failed: {e}")
+            finally:
+                db.close()
+
+        stopping.wait(settings.INGESTION_POLL_SECONDS)
+
+    for process in processes.values():
+        process.join()
+    print("--- Ingestion workers stopped ---")
+
+
+if __name__ == "__main__":
+    main()
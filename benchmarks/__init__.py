@@ -0,0 +1 @@
+# Offline benchmarks for the ingestion pipeline. Run modules with `python -m benchmarks.<name>`.
@@ -0,0 +1,104 @@
+"""
+Word splitter vs. token-budgeted chunker.
+
+Measures chunking throughput and how much of each chunk the embedding model
+actually sees (its tokenizer truncates at max_seq_length word pieces).
+
+    python -m benchmarks.chunking tender.pdf other.pdf
+    python -m benchmarks.chunking --pages 300 --json chunking.json
+"""
+import argparse
+import json
+import random
+import time
+from typing import Dict, List
+
+import fitz  # PyMuPDF
+import tiktoken
+from transformers import AutoTokenizer
+
+from app.modules.askai.services.chunking import TokenChunker, split_words
+
+CLAUSE_WORDS = (
+    "contractor shall submit performance security tender bid bill quantities employer engineer clause "
+    "completion period defects liability road pavement bituminous concrete drainage culvert embankment "
+    "specification schedule payment price variation arbitration termination insurance works site"
+).split()
+
+
+def synthetic_pages(page_count: int, words_per_page: int = 550, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(CLAUSE_WORDS) for _ in range(words_per_page)) for _ in range(page_count)]
+
+
+def pdf_pages(paths: List[str]) -> List[str]:
+    pages = []
+    for path in paths:
+        with fitz.open(path) as doc:
+            pages.extend(" ".join(page.get_text().split()) for page in doc)
+    return [page for page in pages if page]
+
+
+def measure(name: str, chunk_pages, pages: List[str], embed_tokenizer, max_seq_length: int) -> Dict:
+    start = time.perf_counter()
+    chunks = chunk_pages(pages)
+    elapsed = time.perf_counter() - start
+
+    # Coverage: share of chunk word pieces that fit inside the embedding model's window
+    lengths = [len(ids) for ids in embed_tokenizer(chunks, add_special_tokens=True)["input_ids"]]
+    seen = sum(min(length, max_seq_length) for length in lengths)
+    return {
+        "strategy": name,
+        "pages": len(pages),
+        "chunks": len(chunks),
+        "seconds": round(elapsed, 4),
+        "pages_per_second": round(len(pages) / elapsed, 1) if elapsed else None,
+        "mean_wordpieces_per_chunk": round(sum(lengths) / len(lengths), 1) if lengths else 0,
+        "truncated_chunks": sum(1 for length in lengths if length > max_seq_length),
+        "embedding_coverage": round(seen / sum(lengths), 4) if lengths else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDFs to chunk (defaults to a synthetic corpus)")
+    parser.add_argument("--pages", type=int, default=300, help="synthetic page count when no PDFs are given")
+    parser.add_argument("--words", type=int, default=1000, help="word splitter chunk size")
+    parser.add_argument("--word-overlap", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=200, help="token chunker budget")
+    parser.add_argument("--token-overlap", type=int, default=30)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--max-seq-length", type=int, default=256)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    pages = pdf_pages(args.pdfs) if args.pdfs else synthetic_pages(args.pages)
+    tokenizer = tiktoken.get_encoding("cl100k_base")
+    embed_tokenizer = AutoTokenizer.from_pretrained(args.model)
+
+    def words(pages):
+        return [chunk for page in pages for chunk in split_words(page, args.words, args.word_overlap)]
+
+    def tokens(across_pages):
+        def run(pages):
+            chunker = TokenChunker(tokenizer, args.tokens, args.token_overlap, across_pages)
+            chunks = [content for page_num, page in enumerate(pages, 1) for content, _, _ in chunker.add_page(page, page_num)]
+            return chunks + [content for content, _, _ in chunker.flush()]
+        return run
+
+    results = [
+        measure("words", words, pages, embed_tokenizer, args.max_seq_length),
+        measure("tokens", tokens(False), pages, embed_tokenizer, args.max_seq_length),
+        measure("tokens_across_pages", tokens(True), pages, embed_tokenizer, args.max_seq_length),
+    ]
+
+    for result in results:
+        print(f"{result['strategy']:<20} {result['chunks']:>6} chunks  {result['pages_per_second']:>9} pages/s  "
+              f"coverage {result['embedding_coverage']:.1%}  truncated {result['truncated_chunks']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Embedding backends: throughput and parity with the PyTorch model.
+
+Encodes the same chunks with every backend, reports chunks/sec, and checks
+that the vectors agree with the "torch" reference (cosine similarity per
+chunk, and overlap of the top-k neighbours for a set of queries). Exits with
+status 1 when a backend falls below its cosine threshold. The same thresholds
+are asserted by tests/test_embedding_backends.py on a fixed set of sentences.
+
+    python -m benchmarks.embedding_backends
+    python -m benchmarks.embedding_backends --backends torch,onnx-int8 --quantization avx512_vnni --json backends.json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.core.embeddings import EMBEDDING_BACKENDS, MIN_COSINE, QUANTIZATION_TARGETS, load_embedding_model
+from app.modules.askai.services.chunking import split_words
+from benchmarks.chunking import synthetic_pages
+
+QUERIES = [
+    "What is the performance security amount?",
+    "defects liability period for bituminous pavement",
+    "price variation clause",
+    "culvert and drainage specification",
+    "termination and arbitration terms",
+    "completion period of the works",
+]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(query_vectors: np.ndarray, chunk_vectors: np.ndarray, k: int) -> List[set]:
+    scores = normalize(query_vectors) @ normalize(chunk_vectors).T
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+
+def measure(backend: str, model, chunks: List[str], batch_size: int, repeats: int) -> Dict:
+    model.encode(chunks[:batch_size], batch_size=batch_size, show_progress_bar=False)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        vectors = model.encode(chunks, batch_size=batch_size, show_progress_bar=False)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "backend": backend,
+        "chunks": len(chunks),
+        "seconds": round(best, 4),
+        "chunks_per_second": round(len(chunks) / best, 1) if best else None,
+        "vectors": vectors,
+        "query_vectors": model.encode(QUERIES, show_progress_bar=False),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS), help="comma-separated; torch is always run as the reference")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--quantization", default="avx2", choices=QUANTIZATION_TARGETS)
+    parser.add_argument("--export-dir", help="where ONNX exports go (defaults to a temporary directory)")
+    parser.add_argument("--pages", type=int, default=40, help="synthetic pages to chunk")
+    parser.add_argument("--words", type=int, default=150, help="words per chunk")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = [b for b in backends if b not in EMBEDDING_BACKENDS]
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(unknown)}")
+    backends = ["torch"] + [b for b in backends if b != "torch"]
+
+    chunks = [chunk for page in synthetic_pages(args.pages) for chunk in split_words(page, args.words, 0)]
+    export_dir = args.export_dir or tempfile.mkdtemp(prefix="embedding-backends-")
+
+    results = []
+    for backend in backends:
+        model = load_embedding_model(args.model, backend, export_dir, args.quantization)
+        results.append(measure(backend, model, chunks, args.batch_size, args.repeats))
+
+    reference = results[0]
+    reference_vectors = normalize(reference["vectors"])
+    reference_neighbours = top_k(reference["query_vectors"], reference["vectors"], args.top_k)
+    failed = []
+    for result in results:
+        vectors, query_vectors = result.pop("vectors"), result.pop("query_vectors")
+        cosines = np.sum(normalize(vectors) * reference_vectors, axis=1)
+        neighbours = top_k(query_vectors, vectors, args.top_k)
+        overlap = [len(a & b) / args.top_k for a, b in zip(neighbours, reference_neighbours)]
+        result["min_cosine"] = round(float(cosines.min()), 6)
+        result["mean_cosine"] = round(float(cosines.mean()), 6)
+        result["top_k_overlap"] = round(float(np.mean(overlap)), 4)
+        result["speedup"] = round(result["chunks_per_second"] / reference["chunks_per_second"], 2)
+        result["passed"] = bool(result["min_cosine"] >= MIN_COSINE[result["backend"]])
+        if not result["passed"]:
+            failed.append(result["backend"])
+
+    for result in results:
+        print(f"{result['backend']:<10} {result['chunks_per_second']:>9} chunks/s  x{result['speedup']:<5} "
+              f"cosine min {result['min_cosine']:.4f} mean {result['mean_cosine']:.4f}  "
+              f"top-{args.top_k} overlap {result['top_k_overlap']:.0%}  {'ok' if result['passed'] else 'FAIL'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        print(f"❌ Below the cosine threshold: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
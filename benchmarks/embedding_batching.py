@@ -0,0 +1,190 @@
+"""
+Fixed-size vs length-bucketed batching for chunk embeddings.
+
+Chunks a tender-like PDF (clause pages interleaved with bill-of-quantities
+tables, or real PDFs given on the command line) with PDFProcessor and encodes
+them the way add_chunks does, INGEST_BATCH_SIZE chunks at a time in document
+order, with:
+
+- fixed: encode(batch, batch_size=32), the previous behaviour
+- bucketed: encode_bucketed with the EMBEDDING_BUCKET_* settings
+
+Reports chunks/sec, the share of encoded word pieces that were padding, and
+the cosine agreement between the two (they should be identical up to float
+noise). --embedder simulated replaces the model with a stand-in whose cost is
+proportional to the padded batch size, for machines without the model.
+
+    python -m benchmarks.embedding_batching --pages 60
+    python -m benchmarks.embedding_batching tender.pdf boq.pdf --ingest-batches 64,512 --json batching.json
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import fitz  # PyMuPDF
+import numpy as np
+import tiktoken
+
+from app.config import settings
+from app.core.embeddings import EMBEDDING_BACKENDS, encode_bucketed, length_buckets, load_embedding_model, token_lengths
+from app.modules.askai.services.document_service import PDFProcessor
+from app.utils import batched
+from benchmarks.ingestion import _table_page, _text_page
+
+FIXED_BATCH_SIZE = 32
+
+
+def tender_pdf(pages: int, directory: str, seed: int = 7) -> str:
+    """Clause text with a bill-of-quantities table every third page."""
+    rng = random.Random(seed)
+    path = os.path.join(directory, f"tender_{pages}p.pdf")
+    with fitz.open() as doc:
+        for index in range(pages):
+            (_table_page if index % 3 == 2 else _text_page)(doc, rng)
+        doc.save(path)
+    return path
+
+
+def document_chunks(paths: List[str], embedding_model) -> List[str]:
+    processor = PDFProcessor(embedding_model, tiktoken.get_encoding("cl100k_base"))
+    processor.has_llamaparse = False
+    try:
+        return [chunk["content"] for path in paths
+                for chunk in processor.iter_chunks(None, path, "benchmark", os.path.basename(path), {})]
+    finally:
+        processor.close()
+
+
+class SimulatedEncoder:
+    """
+    Stand-in for a transformer encoder: work is proportional to batch size x longest
+    text, like a padded forward pass. Batches internally the way SentenceTransformer
+    does (longest texts first, `batch_size` at a time).
+    """
+
+    max_seq_length = 256
+
+    def __init__(self, dimensions: int = 384, seed: int = 0):
+        self.weights = np.random.default_rng(seed).standard_normal((dimensions, dimensions)).astype(np.float32) / dimensions
+        self.dimensions = dimensions
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimensions
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        lengths = token_lengths(self, texts)
+        hidden = np.zeros((len(texts), max(lengths), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            seeds = [hash(word) % self.dimensions for word in text.split()[:lengths[row]]]
+            hidden[row, np.arange(len(seeds)), seeds] = 1.0
+        for _ in range(6):  # layers
+            hidden = np.tanh(hidden @ self.weights)
+        mask = np.arange(hidden.shape[1])[None, :] < np.array(lengths)[:, None]
+        return (hidden * mask[..., None]).sum(axis=1) / np.array(lengths)[:, None]
+
+    def encode(self, sentences: List[str], batch_size: int = 32, show_progress_bar: bool = None, **kwargs) -> np.ndarray:
+        order = np.argsort([-len(text) for text in sentences])
+        vectors = np.empty((len(sentences), self.dimensions), dtype=np.float32)
+        for start in range(0, len(sentences), batch_size):
+            part = order[start:start + batch_size]
+            vectors[part] = self._embed([sentences[i] for i in part])
+        return vectors
+
+
+def padded_tokens(lengths: List[int], batches: List[List[int]]) -> int:
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches if batch)
+
+
+def fixed_batches(texts: List[str]) -> List[List[int]]:
+    # SentenceTransformer sorts by character length within one encode call
+    order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+    return [order[start:start + FIXED_BATCH_SIZE] for start in range(0, len(order), FIXED_BATCH_SIZE)]
+
+
+def measure(encode: Callable[[List[str]], np.ndarray], chunks: List[str], ingest_batch: int, repeats: int):
+    encode(chunks[:ingest_batch])  # warm-up
+    best, vectors = None, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parts = [encode(list(batch)) for batch in batched(chunks, ingest_batch)]
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best, vectors = elapsed, np.concatenate(parts)
+    return best, vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDFs to chunk (defaults to a synthetic tender)")
+    parser.add_argument("--pages", type=int, default=60, help="synthetic tender page count when no PDFs are given")
+    parser.add_argument("--embedder", choices=("model", "simulated"), default="model")
+    parser.add_argument("--backend", default=settings.EMBEDDING_BACKEND, choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--ingest-batches", default=str(settings.INGEST_BATCH_SIZE),
+                        help="comma-separated chunk counts per add_chunks call to try")
+    parser.add_argument("--token-budget", type=int, default=settings.EMBEDDING_BUCKET_TOKEN_BUDGET or 8192)
+    parser.add_argument("--max-batch", type=int, default=settings.EMBEDDING_BUCKET_MAX_BATCH)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.embedder == "model":
+        model = load_embedding_model(settings.EMBEDDING_MODEL, args.backend, settings.EMBEDDING_EXPORT_DIR, settings.EMBEDDING_QUANTIZATION)
+    else:
+        model = SimulatedEncoder()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chunks = document_chunks(args.pdfs or [tender_pdf(args.pages, tmp)], model)
+    lengths = token_lengths(model, chunks)
+    print(f"{len(chunks)} chunks, {min(lengths)}-{max(lengths)} word pieces (median {int(np.median(lengths))})")
+
+    strategies = {
+        "fixed": lambda texts: model.encode(texts, batch_size=FIXED_BATCH_SIZE, show_progress_bar=False),
+        "bucketed": lambda texts: encode_bucketed(model, texts, args.token_budget, args.max_batch),
+    }
+    groupings = {
+        "fixed": lambda texts, lengths: fixed_batches(texts),
+        "bucketed": lambda texts, lengths: length_buckets(lengths, args.token_budget, args.max_batch),
+    }
+
+    results = []
+    for ingest_batch in [int(size) for size in args.ingest_batches.split(",") if size.strip()]:
+        reference = None
+        for name, encode in strategies.items():
+            seconds, vectors = measure(encode, chunks, ingest_batch, args.repeats)
+            padded = 0
+            for start in range(0, len(chunks), ingest_batch):
+                texts, part = chunks[start:start + ingest_batch], lengths[start:start + ingest_batch]
+                padded += padded_tokens(part, groupings[name](texts, part))
+            result = {
+                "strategy": name,
+                "ingest_batch": ingest_batch,
+                "chunks": len(chunks),
+                "seconds": round(seconds, 4),
+                "chunks_per_second": round(len(chunks) / seconds, 1) if seconds else None,
+                "padding_share": round(1 - sum(lengths) / padded, 4),
+            }
+            if reference is None:
+                reference = (result, vectors)
+            else:
+                a = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+                b = reference[1] / np.linalg.norm(reference[1], axis=1, keepdims=True)
+                result["min_cosine_vs_fixed"] = round(float(np.sum(a * b, axis=1).min()), 6)
+                result["speedup"] = round(result["chunks_per_second"] / reference[0]["chunks_per_second"], 2)
+            results.append(result)
+
+    for result in results:
+        print(f"{result['strategy']:<9} ingest batch {result['ingest_batch']:>5}  {result['chunks_per_second']:>9} chunks/s  "
+              f"padding {result['padding_share']:>6.1%}" + (f"  x{result['speedup']}  cosine {result['min_cosine_vs_fixed']:.6f}"
+                                                             if "speedup" in result else ""))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"embedder": args.embedder, "backend": args.backend, "token_budget": args.token_budget,
+                       "max_batch": args.max_batch, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
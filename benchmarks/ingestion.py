@@ -0,0 +1,345 @@
+"""
+PDF ingestion throughput benchmark.
+
+Generates synthetic corpora (text-only, scanned, table-heavy and mixed PDFs),
+runs each through PDFProcessor's streaming pipeline and the same
+embed/index/save steps as the ingestion worker, and times every stage.
+Weaviate and Postgres are replaced by local stand-ins (an in-memory
+collection and SQLite), so the numbers measure this code, not the services.
+
+Stages: extract (text layer + OCR, summed over pages), tables (prefilter +
+detection, summed over pages), chunk, embed, index and db_save. With a
+worker pool the per-page stages add up to more than the wall-clock time.
+
+    python -m benchmarks.ingestion --pages 50 --json ingestion.json
+    python -m benchmarks.ingestion --corpora scanned --strategies default,single_worker
+    python -m benchmarks.ingestion --embedder hash --compare baseline.json
+
+Strategies are settings overrides (see STRATEGIES); LlamaParse is skipped
+unless --llamaparse is given, since it is a remote service.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List
+
+import fitz  # PyMuPDF
+import numpy as np
+import tiktoken
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.db.database import Base
+from app.db.vector_store import VectorStoreManager
+from app.modules.askai.db.models import Document, DocumentChunk
+from app.modules.askai.db.repository import DocumentRepository
+from app.modules.askai.services.document_service import PDFProcessor
+from app.utils import batched
+
+CLAUSE_WORDS = (
+    "contractor shall submit performance security tender bid bill quantities employer engineer clause "
+    "completion period defects liability road pavement bituminous concrete drainage culvert embankment "
+    "specification schedule payment price variation arbitration termination insurance works site"
+).split()
+
+CORPORA = ("text", "scanned", "tables", "mixed")
+
+# Settings overridden for each strategy; everything else comes from the environment
+STRATEGIES = {
+    "default": {},  # the configured settings (CHUNKING_STRATEGY defaults to "words")
+    "single_worker": {"PDF_EXTRACTION_WORKERS": 1},
+    "no_table_prefilter": {"PDF_TABLE_PREFILTER": False},
+    "token_chunks": {"CHUNKING_STRATEGY": "tokens"},
+}
+
+STAGES = ("extract", "tables", "chunk", "embed", "index", "db_save")
+
+PAGE_RECT = fitz.paper_rect("a4")
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(CLAUSE_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _text_page(doc: fitz.Document, rng: random.Random) -> None:
+    page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+    text = "\n\n".join(_paragraph(rng, rng.randint(40, 90)) for _ in range(6))
+    page.insert_textbox(PAGE_RECT + (50, 50, -50, -50), text, fontsize=10)
+
+
+def _scanned_page(doc: fitz.Document, rng: random.Random, dpi: int = 150) -> None:
+    # Render a text page and keep only the image, like a scan with no text layer
+    with fitz.open() as source:
+        _text_page(source, rng)
+        pixmap = source[0].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+    page.insert_image(page.rect, stream=pixmap.tobytes("png"))
+
+
+def _table_page(doc: fitz.Document, rng: random.Random, rows: int = 18, cols: int = 5) -> None:
+    page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+    page.insert_text((50, 60), "Bill of Quantities", fontsize=14)
+    left, top, width, height = 50, 80, PAGE_RECT.width - 100, 20
+    col_width = width / cols
+    for row in range(rows + 1):
+        page.draw_line((left, top + row * height), (left + width, top + row * height))
+    for col in range(cols + 1):
+        page.draw_line((left + col * col_width, top), (left + col * col_width, top + rows * height))
+    for row in range(rows):
+        for col in range(cols):
+            if row == 0:
+                cell = ("Item", "Description", "Unit", "Qty", "Rate")[col % 5]
+            elif col == 1:
+                cell = " ".join(rng.choice(CLAUSE_WORDS) for _ in range(3))
+            else:
+                cell = f"{rng.randint(1, 9999)}"
+            page.insert_text((left + col * col_width + 3, top + row * height + 14), cell, fontsize=8)
+
+
+def generate_corpus(kind: str, pages: int, directory: str, seed: int = 7) -> str:
+    """Write a synthetic PDF of the given kind and return its path."""
+    rng = random.Random(f"{kind}-{seed}")
+    makers = {"text": [_text_page], "scanned": [_scanned_page], "tables": [_table_page],
+              "mixed": [_text_page, _text_page, _table_page, _scanned_page]}[kind]
+    path = os.path.join(directory, f"{kind}_{pages}p.pdf")
+    with fitz.open() as doc:
+        for index in range(pages):
+            makers[index % len(makers)](doc, rng)
+        doc.save(path)
+    return path
+
+
+class HashEmbedder:
+    """Deterministic stand-in for SentenceTransformer: hashed bag of words, no model download."""
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False, batch_size: int = 32) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % self.dimensions] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class TimedEmbedder:
+    """Wraps an embedding model and accumulates the time spent in encode()."""
+
+    def __init__(self, model):
+        self.model = model
+        self.seconds = 0.0
+
+    def encode(self, texts, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.model.encode(texts, **kwargs)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+class MemoryCollection:
+    """Stand-in for a Weaviate collection: keeps properties and vectors in memory."""
+
+    name = "Benchmark"
+
+    def __init__(self):
+        self.objects = []
+        self.batch = self
+        self.failed_objects = []
+
+    @contextmanager
+    def dynamic(self):
+        yield self
+
+    def add_object(self, properties: Dict, vector) -> None:
+        self.objects.append((properties, np.asarray(vector, dtype=np.float32)))
+
+
+@contextmanager
+def overridden_settings(overrides: Dict):
+    previous = {name: getattr(settings, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+
+def run(pdf_path: str, corpus: str, strategy: str, embedding_model, tokenizer, use_llamaparse: bool) -> Dict:
+    with overridden_settings(STRATEGIES[strategy]):
+        processor = PDFProcessor(embedding_model, tokenizer)
+        processor.has_llamaparse = processor.has_llamaparse and use_llamaparse
+
+        # Chunking happens inside iter_chunks; time the two methods that build chunks
+        chunk_seconds = 0.0
+        def timed(method):
+            def wrapper(*args, **kwargs):
+                nonlocal chunk_seconds
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    chunk_seconds += time.perf_counter() - start
+            return wrapper
+        processor._page_chunks = timed(processor._page_chunks)
+        processor._table_chunks = timed(processor._table_chunks)
+
+        embedder = TimedEmbedder(embedding_model)
+        # add_chunks only needs a client to be set; objects go to the in-memory collection
+        vector_store = VectorStoreManager(object(), embedder)
+        collection = MemoryCollection()
+
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[Document.__table__, DocumentChunk.__table__])
+        db = sessionmaker(bind=engine)()
+        document = Document(id=uuid.uuid4(), filename=os.path.basename(pdf_path), file_hash=uuid.uuid4().hex,
+                            file_size=os.path.getsize(pdf_path), status="processing", uploaded_at=datetime.now())
+        db.add(document)
+        db.commit()
+        repo = DocumentRepository(db)
+
+        stats: Dict = {}
+        index_seconds = db_seconds = 0.0
+        chunk_count = 0
+        started = time.perf_counter()
+        try:
+            # Same loop as process_uploaded_document: batches are embedded, indexed and saved as they stream in
+            for batch in batched(processor.iter_chunks(None, pdf_path, str(document.id), document.filename, stats), settings.INGEST_BATCH_SIZE):
+                embed_before = embedder.seconds
+                start = time.perf_counter()
+                vector_store.add_chunks(collection, batch)
+                index_seconds += time.perf_counter() - start - (embedder.seconds - embed_before)
+                start = time.perf_counter()
+                repo.add_chunks(document, batch)
+                db_seconds += time.perf_counter() - start
+                chunk_count += len(batch)
+            wall = time.perf_counter() - started
+        finally:
+            processor.close()
+            db.close()
+            engine.dispose()
+
+    stage_timings = stats.get("stage_timings", {})
+    pages = stats.get("page_count", 0)
+    return {
+        "corpus": corpus,
+        "strategy": strategy,
+        "pages": pages,
+        "chunks": chunk_count,
+        "indexed": len(collection.objects),
+        "seconds": round(wall, 3),
+        "pages_per_second": round(pages / wall, 2) if wall else None,
+        "stages": {
+            "extract": round(stage_timings.get("text", 0.0) + stage_timings.get("ocr", 0.0), 3),
+            "tables": round(stage_timings.get("table_prefilter", 0.0) + stage_timings.get("tables", 0.0), 3),
+            "chunk": round(chunk_seconds, 3),
+            "embed": round(embedder.seconds, 3),
+            "index": round(index_seconds, 3),
+            "db_save": round(db_seconds, 3),
+        },
+        "ocr_pages": stats.get("ocr_pages", 0),
+        "table_candidate_pages": stats.get("table_candidate_pages", 0),
+        "tables_found": stats.get("tables", 0),
+    }
+
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Runs whose throughput fell more than `tolerance` below the baseline's."""
+    with open(baseline_path) as f:
+        baseline = {(entry["corpus"], entry["strategy"], entry["pages"]): entry for entry in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get((result["corpus"], result["strategy"], result["pages"]))
+        if not before or not before.get("pages_per_second") or not result.get("pages_per_second"):
+            continue
+        change = result["pages_per_second"] / before["pages_per_second"] - 1
+        if change < -tolerance:
+            regressions.append(f"{result['corpus']}/{result['strategy']}: {before['pages_per_second']} -> "
+                               f"{result['pages_per_second']} pages/s ({change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=30, help="pages per synthetic PDF")
+    parser.add_argument("--corpora", default=",".join(CORPORA), help=f"comma-separated subset of {', '.join(CORPORA)}")
+    parser.add_argument("--strategies", default="default", help=f"comma-separated subset of {', '.join(STRATEGIES)}")
+    parser.add_argument("--embedder", choices=("model", "hash"), default="model",
+                        help="'model' loads all-MiniLM-L6-v2 like the app; 'hash' is a fast local stand-in")
+    parser.add_argument("--llamaparse", action="store_true", help="let PDFProcessor call LlamaParse when configured")
+    parser.add_argument("--keep", help="write the generated PDFs to this directory instead of a temporary one")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline results JSON; exit non-zero on throughput regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop against the baseline")
+    args = parser.parse_args()
+
+    corpora = [name.strip() for name in args.corpora.split(",") if name.strip()]
+    strategies = [name.strip() for name in args.strategies.split(",") if name.strip()]
+    unknown = [name for name in corpora if name not in CORPORA] + [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        parser.error(f"unknown corpus or strategy: {', '.join(unknown)}")
+
+    if args.embedder == "model":
+        from sentence_transformers import SentenceTransformer
+        embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+    else:
+        embedding_model = HashEmbedder()
+    tokenizer = tiktoken.get_encoding("cl100k_base")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.keep or tmp
+        os.makedirs(directory, exist_ok=True)
+        for corpus in corpora:
+            pdf_path = generate_corpus(corpus, args.pages, directory)
+            for strategy in strategies:
+                try:
+                    results.append(run(pdf_path, corpus, strategy, embedding_model, tokenizer, args.llamaparse))
+                except Exception as e:
+                    # e.g. a scanned corpus without Tesseract installed yields no text
+                    print(f"❌ {corpus}/{strategy} failed: {e}")
+                    results.append({"corpus": corpus, "strategy": strategy, "pages": args.pages, "error": str(e)})
+
+    print(f"\n{'corpus':<8} {'strategy':<20} {'pages/s':>8} {'chunks':>7}  " + "  ".join(f"{stage:>8}" for stage in STAGES))
+    for result in results:
+        if "error" in result:
+            print(f"{result['corpus']:<8} {result['strategy']:<20} failed: {result['error']}")
+            continue
+        print(f"{result['corpus']:<8} {result['strategy']:<20} {result['pages_per_second']:>8} {result['chunks']:>7}  "
+              + "  ".join(f"{seconds:>7.2f}s" for seconds in result["stages"].values()))
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "embedder": args.embedder,
+        "settings": {name: getattr(settings, name) for name in (
+            "PDF_EXTRACTION_WORKERS", "PDF_PAGE_BATCH_SIZE", "PDF_OCR_PAGE_BATCH_SIZE", "PDF_TABLE_PREFILTER",
+            "CHUNKING_STRATEGY", "CHUNK_SIZE_TOKENS", "INGEST_BATCH_SIZE")},
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"❌ Regression: {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Per-chat collections vs one multi-tenant collection, at many chats.
+
+Creates --chats chats with --chunks chunks each in both layouts (through
+VectorStoreManager, with hashed vectors so no model is needed), then reports
+setup time, query latency over random chats and Weaviate's heap in use
+(from its Prometheus endpoint, if --metrics-url is given). Restarting
+Weaviate between layouts (--restart-cmd) also measures startup time with
+that many collections or tenants on disk.
+
+Run it against a throwaway Weaviate (PROMETHEUS_MONITORING_ENABLED=true for
+memory figures); it creates and deletes Chat_<uuid> collections.
+
+    python -m benchmarks.weaviate_tenancy --chats 10000 --metrics-url http://localhost:2112/metrics
+    python -m benchmarks.weaviate_tenancy --chats 20000 --modes multi_tenant --restart-cmd "docker restart weaviate_container"
+"""
+import argparse
+import json
+import random
+import re
+import subprocess
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import weaviate
+
+from app.config import settings
+from app.db.vector_store import VectorStoreManager
+from benchmarks.ingestion import CLAUSE_WORDS, HashEmbedder, overridden_settings
+
+MODES = {"per_chat": {"WEAVIATE_MULTI_TENANCY": False}, "multi_tenant": {"WEAVIATE_MULTI_TENANCY": True}}
+
+
+def heap_bytes(metrics_url: Optional[str]) -> Optional[int]:
+    if not metrics_url:
+        return None
+    with urllib.request.urlopen(metrics_url, timeout=10) as response:
+        text = response.read().decode()
+    match = re.search(r"^go_memstats_heap_inuse_bytes\s+(\S+)$", text, re.MULTILINE)
+    return int(float(match.group(1))) if match else None
+
+
+def wait_ready(timeout: float = 600) -> float:
+    """Seconds until a fresh client sees Weaviate ready."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with weaviate.connect_to_local() as client:
+                if client.is_ready():
+                    return time.perf_counter() - start
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("Weaviate did not become ready")
+
+
+def synthetic_chunks(rng: random.Random, chat_id: str, count: int) -> List[Dict]:
+    return [{"content": " ".join(rng.choice(CLAUSE_WORDS) for _ in range(60)),
+             "metadata": {"source": "bench.pdf", "page": i + 1, "doc_id": chat_id, "doc_type": "pdf", "type": "text"}}
+            for i in range(count)]
+
+
+def percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)) * 1000, 2)
+
+
+def run(mode: str, args, chat_ids: List[str]) -> Dict:
+    with overridden_settings(MODES[mode]):
+        client = weaviate.connect_to_local()
+        vector_store = VectorStoreManager(client, HashEmbedder())
+        rng = random.Random(7)
+        heap_before = heap_bytes(args.metrics_url)
+
+        def create(chat_id: str) -> None:
+            collection = vector_store.get_or_create_collection(chat_id, refresh=True)
+            vector_store.add_chunks(collection, synthetic_chunks(random.Random(chat_id), chat_id, args.chunks))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(create, chat_ids))
+        setup = time.perf_counter() - start
+        heap_loaded = heap_bytes(args.metrics_url)
+
+        startup = None
+        if args.restart_cmd:
+            client.close()
+            subprocess.run(args.restart_cmd, shell=True, check=True)
+            startup = wait_ready()
+            client = weaviate.connect_to_local()
+            vector_store = VectorStoreManager(client, HashEmbedder())
+
+        # Cold: first query per chat in this process (handle lookup included); hot: cached handle
+        latencies = {"cold": [], "hot": []}
+        for chat_id in rng.sample(chat_ids, min(args.queries, len(chat_ids))):
+            for phase in ("cold", "hot"):
+                query = " ".join(rng.choice(CLAUSE_WORDS) for _ in range(8))
+                start = time.perf_counter()
+                vector_store.query(vector_store.get_or_create_collection(chat_id), query, n_results=settings.RAG_TOP_K)
+                latencies[phase].append(time.perf_counter() - start)
+        heap_queried = heap_bytes(args.metrics_url)
+
+        if not args.keep:
+            for chat_id in chat_ids:
+                vector_store.delete_collection(chat_id)
+            if mode == "multi_tenant" and client.collections.exists(settings.WEAVIATE_TENANT_COLLECTION):
+                client.collections.delete(settings.WEAVIATE_TENANT_COLLECTION)
+        client.close()
+
+    return {
+        "mode": mode,
+        "chats": len(chat_ids),
+        "chunks_per_chat": args.chunks,
+        "setup_seconds": round(setup, 1),
+        "startup_seconds": round(startup, 1) if startup is not None else None,
+        "query_ms": {phase: {"p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99)}
+                     for phase, values in latencies.items()},
+        "heap_mb": {name: round((value - (heap_before or 0)) / 2**20, 1) if value is not None else None
+                    for name, value in (("after_setup", heap_loaded), ("after_queries", heap_queried))},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=10000)
+    parser.add_argument("--chunks", type=int, default=20, help="chunks per chat")
+    parser.add_argument("--queries", type=int, default=500, help="chats sampled for query latency")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"comma-separated subset of {', '.join(MODES)}")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent chat setups")
+    parser.add_argument("--metrics-url", help="Weaviate Prometheus endpoint, e.g. http://localhost:2112/metrics")
+    parser.add_argument("--restart-cmd", help="shell command restarting Weaviate, to time startup after setup")
+    parser.add_argument("--keep", action="store_true", help="leave the benchmark chats in Weaviate")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+
+    chat_ids = [str(uuid.UUID(int=random.Random(index).getrandbits(128))) for index in range(args.chats)]
+    results = [run(mode, args, chat_ids) for mode in modes]
+
+    for r in results:
+        print(f"{r['mode']:<13} {r['chats']} chats  setup {r['setup_seconds']}s  startup {r['startup_seconds']}s  "
+              f"query p50/p99 cold {r['query_ms']['cold']['p50']}/{r['query_ms']['cold']['p99']}ms "
+              f"hot {r['query_ms']['hot']['p50']}/{r['query_ms']['hot']['p99']}ms  heap {r['heap_mb']['after_queries']}MB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
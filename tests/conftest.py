@@ -0,0 +1,5 @@
+import os
+
+# app.config refuses to load without these; the tests never call the APIs
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("LLAMA_CLOUD_API_KEY", "test")
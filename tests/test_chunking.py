@@ -0,0 +1,96 @@
+from typing import List
+
+import pytest
+
+from app.modules.askai.services.chunking import TokenChunker, split_words
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word, so offsets are easy to reason about."""
+
+    def __init__(self):
+        self.vocab: List[str] = []
+        self.ids = {}
+
+    def encode(self, text: str) -> List[int]:
+        tokens = []
+        for word in text.split():
+            if word not in self.ids:
+                self.ids[word] = len(self.vocab)
+                self.vocab.append(word)
+            tokens.append(self.ids[word])
+        return tokens
+
+    def decode(self, tokens: List[int]) -> str:
+        return " ".join(self.vocab[token] for token in tokens)
+
+
+def page(number: int, words: int) -> str:
+    return " ".join(f"p{number}w{i}" for i in range(words))
+
+
+def chunk_pages(chunker: TokenChunker, pages: List[str]):
+    chunks = []
+    for number, text in enumerate(pages, start=1):
+        chunks.extend(chunker.add_page(text, number))
+    return chunks + chunker.flush()
+
+
+def test_token_chunks_overlap_and_stay_within_budget():
+    chunks = chunk_pages(TokenChunker(WordTokenizer(), 10, 3), [page(1, 25)])
+
+    assert [size for _, _, size in chunks] == [10, 10, 10, 4]
+    for (previous, _, _), (current, _, _) in zip(chunks, chunks[1:]):
+        assert previous.split()[-3:] == current.split()[:3]
+    # Every word is covered, in order
+    words = chunks[0][0].split() + [word for content, _, _ in chunks[1:] for word in content.split()[3:]]
+    assert words == page(1, 25).split()
+
+
+def test_chunks_stop_at_page_boundaries_by_default():
+    chunks = chunk_pages(TokenChunker(WordTokenizer(), 10, 3), [page(1, 15), page(2, 12)])
+
+    assert [label for _, label, _ in chunks] == ["1", "1", "2", "2"]
+    assert chunks[1][0].split()[-1] == "p1w14"
+    assert chunks[2][0].split()[0] == "p2w0"
+
+
+def test_chunks_across_pages_are_labelled_with_the_page_span():
+    chunks = chunk_pages(TokenChunker(WordTokenizer(), 10, 3, across_pages=True), [page(1, 15), page(2, 12)])
+
+    assert [label for _, label, _ in chunks] == ["1", "1-2", "1-2", "2"]
+    assert chunks[1][0].split() == page(1, 15).split()[7:] + ["p2w0", "p2w1"]
+    assert chunks[-1][0].split()[-1] == "p2w11"
+
+
+def test_flush_emits_nothing_when_the_tail_is_only_overlap():
+    chunker = TokenChunker(WordTokenizer(), 10, 3, across_pages=True)
+
+    assert [size for _, _, size in chunker.add_page(page(1, 17), 1)] == [10]
+    assert chunker.flush() == [("p1w7 p1w8 p1w9 p1w10 p1w11 p1w12 p1w13 p1w14 p1w15 p1w16", "1", 10)]
+    assert chunker.flush() == []
+    assert chunker.chunk_count == 2
+
+
+def test_empty_pages_produce_no_chunks():
+    chunker = TokenChunker(WordTokenizer(), 10, 3, across_pages=True)
+
+    assert chunker.add_page("   ", 1) == []
+    assert [label for _, label, _ in chunk_pages(chunker, [page(1, 4)])] == ["1"]
+
+
+def test_overlap_must_be_smaller_than_the_budget():
+    with pytest.raises(ValueError):
+        TokenChunker(WordTokenizer(), 10, 10)
+
+
+def test_split_words_overlaps_windows():
+    text = " ".join(str(i) for i in range(25))
+
+    assert split_words(text, 10, 3) == [
+        " ".join(str(i) for i in range(0, 10)),
+        " ".join(str(i) for i in range(7, 17)),
+        " ".join(str(i) for i in range(14, 24)),
+        " ".join(str(i) for i in range(21, 25)),
+    ]
+    assert split_words("short text", 10, 3) == ["short text"]
@@ -0,0 +1,115 @@
+import importlib
+import sys
+import types
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.modules.askai.db.models import Chat, Document, DocumentChunk, chat_document_association
+from app.modules.askai.services.ingestion_service import PermanentJobError
+
+
+class WorkerKilled(BaseException):
+    """Stands in for the worker process dying: no `except Exception` cleanup runs."""
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.vectors = {}  # (collection, doc_id) -> chunk count
+
+    def get_or_create_collection(self, chat_id, refresh=False):
+        return chat_id
+
+    def add_chunks(self, collection, chunks, stats=None):
+        doc_id = chunks[0]["metadata"]["doc_id"]
+        self.vectors[(collection, doc_id)] = self.vectors.get((collection, doc_id), 0) + len(chunks)
+        return len(chunks)
+
+    def delete_document(self, collection, doc_id):
+        self.vectors.pop((collection, doc_id), None)
+
+
+class FakePDFProcessor:
+    def __init__(self):
+        self.crash_after = None
+
+    def iter_chunks(self, reporter, file_path, doc_id, filename, stats, file_hash=None):
+        for i in range(4):
+            if self.crash_after is not None and i == self.crash_after:
+                raise WorkerKilled()
+            yield {"content": f"chunk {i}", "metadata": {"doc_id": doc_id, "page": i + 1}}
+
+
+@pytest.fixture
+def services(monkeypatch):
+    # app.core.services loads the models and connects to Weaviate at import; the service only needs these three
+    fake = types.SimpleNamespace(vector_store=FakeVectorStore(), pdf_processor=FakePDFProcessor(), excel_processor=None)
+    monkeypatch.setitem(sys.modules, "app.core.services", fake)
+    monkeypatch.delitem(sys.modules, "app.modules.askai.services.document_processing_service", raising=False)
+    return fake
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Chat.metadata.create_all(engine, tables=[Chat.__table__, Document.__table__, DocumentChunk.__table__, chat_document_association])
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def process(services, session_factory, monkeypatch):
+    module = importlib.import_module("app.modules.askai.services.document_processing_service")
+    monkeypatch.setattr(module, "SessionLocal", session_factory)
+    monkeypatch.setattr(module.settings, "INGEST_BATCH_SIZE", 2)
+    return module.process_uploaded_document
+
+
+def test_retry_after_a_worker_crash_reprocesses_the_leftover_document(process, services, session_factory, tmp_path):
+    upload = tmp_path / "tender.pdf"
+    upload.write_bytes(b"%PDF-1.4 tender")
+    now = datetime.now()
+    chat_id = uuid.uuid4()
+    with session_factory() as db:
+        db.add(Chat(id=chat_id, title="Tenders", created_at=now, updated_at=now, drive_folders=[]))
+        db.commit()
+
+    # First attempt: the worker dies after indexing one batch
+    services.pdf_processor.crash_after = 2
+    with pytest.raises(WorkerKilled):
+        process(str(upload), str(chat_id), "tender.pdf", "job-1", "hash-1")
+    with session_factory() as db:
+        [leftover] = db.get(Chat, chat_id).documents
+        assert leftover.status == "processing"
+        leftover_id = str(leftover.id)
+    assert services.vector_store.vectors == {(str(chat_id), leftover_id): 2}
+
+    # The requeued job runs again and must not treat its own leftover as a duplicate
+    services.pdf_processor.crash_after = None
+    assert process(str(upload), str(chat_id), "tender.pdf", "job-1", "hash-1") == 4
+    with session_factory() as db:
+        [document] = db.get(Chat, chat_id).documents
+        assert str(document.id) != leftover_id
+        assert document.status == "active"
+        assert len(document.chunks) == 4
+        assert db.get(Document, uuid.UUID(leftover_id)) is None
+        assert db.query(DocumentChunk).count() == 4
+    assert services.vector_store.vectors == {(str(chat_id), str(document.id)): 4}
+
+
+def test_another_job_uploading_the_same_file_is_still_a_duplicate(process, services, session_factory, tmp_path):
+    upload = tmp_path / "tender.pdf"
+    upload.write_bytes(b"%PDF-1.4 tender")
+    now = datetime.now()
+    chat_id = uuid.uuid4()
+    with session_factory() as db:
+        db.add(Chat(id=chat_id, title="Tenders", created_at=now, updated_at=now, drive_folders=[]))
+        db.commit()
+
+    process(str(upload), str(chat_id), "tender.pdf", "job-1", "hash-1")
+    with pytest.raises(PermanentJobError, match="already in this chat"):
+        process(str(upload), str(chat_id), "tender.pdf", "job-2", "hash-1")
@@ -0,0 +1,45 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.modules.askai.db.models import Chat, Document, DocumentChunk, chat_document_association
+from app.modules.askai.db.repository import DocumentRepository, DriveSource
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Chat.metadata.create_all(engine, tables=[Chat.__table__, Document.__table__, DocumentChunk.__table__, chat_document_association])
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def new_chat(db, title: str) -> Chat:
+    now = datetime.now()
+    chat = Chat(id=uuid.uuid4(), title=title, created_at=now, updated_at=now, drive_folders=[])
+    db.add(chat)
+    db.commit()
+    return chat
+
+
+def test_drive_metadata_is_kept_per_chat(db):
+    first, second = new_chat(db, "first"), new_chat(db, "second")
+    # Same content, synced from a different Drive file in each chat
+    document = Document(id=uuid.uuid4(), filename="tender.pdf", file_hash="md5", file_size=1, uploaded_at=datetime.now(), status="active")
+    repo = DocumentRepository(db)
+    repo.add_document_to_chat(first, document)
+    repo.add_document_to_chat(second, document)
+    repo.set_drive_metadata(first, document, "file-a", "md5", "2026-01-01T00:00:00Z")
+    repo.set_drive_metadata(second, document, "file-b", "md5", "2026-02-01T00:00:00Z")
+
+    assert repo.get_drive_sources(first.id) == {document.id: DriveSource("file-a", "md5", "2026-01-01T00:00:00Z")}
+    assert repo.get_drive_sources(second.id) == {document.id: DriveSource("file-b", "md5", "2026-02-01T00:00:00Z")}
+
+    repo.remove_document_from_chat(first, document)
+    assert repo.get_drive_sources(first.id) == {}
+    assert repo.get_drive_sources(second.id) == {document.id: DriveSource("file-b", "md5", "2026-02-01T00:00:00Z")}
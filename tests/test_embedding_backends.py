@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("optimum.onnxruntime")
+
+from app.core.embeddings import MIN_COSINE, load_embedding_model
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+TOP_K = 3
+
+SENTENCES = [
+    "The contractor shall furnish a performance security of five percent of the contract price.",
+    "The defects liability period for bituminous pavement is twelve months from completion.",
+    "Price variation is payable on bitumen, cement and steel using the published indices.",
+    "Box culverts shall be cast in situ with M25 grade reinforced concrete.",
+    "Either party may refer a dispute to arbitration under the Arbitration and Conciliation Act.",
+    "The works shall be completed within eighteen months of the appointed date.",
+    "Embankment layers shall be compacted to 97 percent of the modified Proctor density.",
+    "Insurance of the works shall cover the full replacement cost until taking over.",
+    "Item 4.2: Dense bituminous macadam, 50 mm thick, per cubic metre, 1,250 m3.",
+    "Lane closures require the engineer's approval forty-eight hours in advance.",
+    "Interim payment certificates are issued monthly against measured quantities.",
+    "Bidders must attend the pre-bid meeting at the employer's office on the stated date.",
+]
+
+QUERIES = [
+    "How much is the performance security?",
+    "defects liability period of the road surface",
+    "price adjustment for bitumen and steel",
+    "culvert concrete grade",
+    "how are disputes resolved",
+    "time for completion",
+]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def ranking(model) -> np.ndarray:
+    scores = normalize(model.encode(QUERIES, show_progress_bar=False)) @ normalize(model.encode(SENTENCES, show_progress_bar=False)).T
+    return np.argsort(-scores, axis=1)[:, :TOP_K]
+
+
+@pytest.fixture(scope="module")
+def export_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("onnx")
+
+
+@pytest.fixture(scope="module")
+def torch_model():
+    try:
+        return load_embedding_model(MODEL_NAME, "torch")
+    except OSError as e:
+        pytest.skip(f"{MODEL_NAME} is not available: {e}")
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_backend_matches_torch(backend, torch_model, export_dir):
+    model = load_embedding_model(MODEL_NAME, backend, export_dir, "avx2")
+
+    reference = normalize(torch_model.encode(SENTENCES, show_progress_bar=False))
+    vectors = normalize(model.encode(SENTENCES, show_progress_bar=False))
+    assert vectors.shape == reference.shape
+
+    cosines = np.sum(reference * vectors, axis=1)
+    assert cosines.min() >= MIN_COSINE[backend], f"lowest cosine {cosines.min():.5f} for: {SENTENCES[int(cosines.argmin())]}"
+    np.testing.assert_array_equal(ranking(model), ranking(torch_model))
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.core.embedding_batcher import EmbeddingBatcher
+
+TIMEOUT = 5
+
+
+class StubEncoder:
+    """Encodes a text as [len(text), index of the call]; `gate` holds encode() until it is set."""
+
+    def __init__(self, error: Exception = None):
+        self.calls = []
+        self.error = error
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def encode(self, texts, batch_size=None, show_progress_bar=None):
+        self.calls.append(list(texts))
+        self.entered.set()
+        assert self.gate.wait(TIMEOUT)
+        if self.error:
+            raise self.error
+        return np.array([[len(text), len(self.calls) - 1] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def encoder():
+    return StubEncoder()
+
+
+@pytest.fixture
+def make_batcher():
+    batchers = []
+
+    def make(model, **kwargs):
+        batchers.append(EmbeddingBatcher(model, **kwargs))
+        return batchers[-1]
+
+    yield make
+    for batcher in batchers:
+        batcher.close()
+
+
+def hold_first_batch(batcher, encoder):
+    """Occupy the batcher thread with one encode, so later submissions queue up behind it."""
+    encoder.gate.clear()
+    first = batcher.submit("first")
+    assert encoder.entered.wait(TIMEOUT)
+    return first
+
+
+def test_identical_texts_in_a_batch_are_encoded_once(encoder, make_batcher):
+    batcher = make_batcher(encoder, max_batch_size=10, max_wait_ms=50)
+    first = hold_first_batch(batcher, encoder)
+    futures = [batcher.submit(text) for text in ["a", "bb", "a", "ccc", "bb"]]
+    encoder.gate.set()
+
+    results = [future.result(TIMEOUT) for future in futures]
+    assert first.result(TIMEOUT).tolist() == [5, 0]
+    assert encoder.calls[1] == ["a", "bb", "ccc"]
+    assert [result.tolist() for result in results] == [[1, 1], [2, 1], [1, 1], [3, 1], [2, 1]]
+    assert (batcher.batches, batcher.texts) == (2, 6)
+
+
+def test_a_full_batch_is_encoded_without_waiting(encoder, make_batcher):
+    batcher = make_batcher(encoder, max_batch_size=3, max_wait_ms=60_000)
+    futures = [batcher.submit(f"text {i}") for i in range(4)]
+
+    for future in futures[:3]:
+        future.result(TIMEOUT)
+    assert encoder.calls == [["text 0", "text 1", "text 2"]]
+    # The fourth text waits for its own batch to fill or time out
+    time.sleep(0.05)
+    assert not futures[3].done()
+
+
+def test_a_partial_batch_is_encoded_after_max_wait(encoder, make_batcher):
+    batcher = make_batcher(encoder, max_batch_size=100, max_wait_ms=20)
+    started = time.monotonic()
+    assert batcher.encode_one("alone", timeout=TIMEOUT).tolist() == [5, 0]
+    assert time.monotonic() - started < TIMEOUT
+    assert encoder.calls == [["alone"]]
+
+
+def test_an_encoder_error_reaches_every_waiting_caller(make_batcher):
+    encoder = StubEncoder(error=ValueError("model unavailable"))
+    batcher = make_batcher(encoder, max_batch_size=10, max_wait_ms=50)
+    first = hold_first_batch(batcher, encoder)
+    futures = [batcher.submit(text) for text in ["a", "b", "a"]]
+    encoder.gate.set()
+
+    for future in [first, *futures]:
+        with pytest.raises(ValueError, match="model unavailable"):
+            future.result(TIMEOUT)
+    # The thread survives the error and serves the next batch
+    encoder.error = None
+    assert batcher.encode_one("again", timeout=TIMEOUT).tolist() == [5, 2]
+
+
+def test_close_finishes_pending_requests_and_rejects_new_ones(encoder, make_batcher):
+    batcher = make_batcher(encoder, max_batch_size=2, max_wait_ms=10)
+    first = hold_first_batch(batcher, encoder)
+    pending = [batcher.submit(f"text {i}") for i in range(5)]
+
+    closing = threading.Thread(target=batcher.close)
+    closing.start()
+    encoder.gate.set()
+    closing.join(TIMEOUT)
+
+    assert not closing.is_alive()
+    assert all(future.result(TIMEOUT) is not None for future in [first, *pending])
+    with pytest.raises(RuntimeError):
+        batcher.submit("late")
+
+
+def test_close_without_use_starts_no_thread(encoder):
+    batcher = EmbeddingBatcher(encoder)
+    batcher.close()
+    assert batcher._thread is None
+    assert encoder.calls == []
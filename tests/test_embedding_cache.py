@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.core.embedding_cache import EmbeddingCache
+
+DIMENSIONS = 1024  # 256 vectors per MB keeps the caches small
+ONE_MB_OF_VECTORS = 1024 * 1024 // (DIMENSIONS * 4)
+
+
+def vectors(count: int, offset: int = 0) -> np.ndarray:
+    return np.arange(offset, offset + count * DIMENSIONS, dtype=np.float32).reshape(count, DIMENSIONS)
+
+
+def test_round_trip_and_eviction(tmp_path):
+    cache = EmbeddingCache(tmp_path, "model", DIMENSIONS, 1)
+    texts = [f"chunk {i}" for i in range(cache.capacity)]
+    cache.put_many(texts, vectors(len(texts)))
+
+    found = cache.get_many(["chunk 0", "unknown", "chunk 5"])
+    assert sorted(found) == [0, 2]
+    np.testing.assert_array_equal(found[2], vectors(1, 5 * DIMENSIONS)[0])
+
+    # Full: the least recently used entry gives up its slot
+    cache.get_many(texts[2:])
+    cache.put_many(["new"], vectors(1, -DIMENSIONS))
+    assert cache.get_many(["chunk 1"]) == {}
+    np.testing.assert_array_equal(cache.get_many(["new"])[0], vectors(1, -DIMENSIONS)[0])
+
+
+def test_shrinking_the_cache_starts_a_new_one(tmp_path):
+    large = EmbeddingCache(tmp_path, "model", DIMENSIONS, 2)
+    texts = [f"chunk {i}" for i in range(2 * ONE_MB_OF_VECTORS)]
+    large.put_many(texts, vectors(len(texts)))
+
+    small = EmbeddingCache(tmp_path, "model", DIMENSIONS, 1)
+    assert small.directory != large.directory
+    # Slots past the end of the smaller matrix are never looked up
+    assert small.get_many(texts[-3:]) == {}
+    small.put_many(texts[-1:], vectors(1))
+    np.testing.assert_array_equal(small.get_many(texts[-1:])[0], vectors(1)[0])
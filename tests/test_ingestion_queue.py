@@ -0,0 +1,301 @@
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, delete, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import worker
+from app.core import global_stores
+from app.modules.askai.db.models import Chat, IngestionJob
+from app.modules.askai.db.repository import IngestionJobRepository
+from app.modules.askai.models.document import ProgressEvent
+from app.modules.askai.services import ingestion_service
+
+LEASE_SECONDS = 60
+
+
+@pytest.fixture
+def session_factory():
+    # One shared connection, so every session (and the worker's heartbeat thread) sees the same in-memory database
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Chat.metadata.create_all(engine, tables=[Chat.__table__, IngestionJob.__table__])
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def chat_id(db):
+    now = datetime.now()
+    chat = Chat(id=uuid.uuid4(), title="Tenders", created_at=now, updated_at=now, drive_folders=[])
+    db.add(chat)
+    db.commit()
+    return chat.id
+
+
+def create_job(db, chat_id, filename="tender.pdf", payload=None, job_type=ingestion_service.JOB_TYPE_PDF, **fields):
+    return IngestionJobRepository(db).create(job_type, chat_id, filename, payload or {}, **fields)
+
+
+def backdate(db, job_id, **fields):
+    db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(**fields))
+    db.commit()
+
+
+def reload(db, job_id) -> IngestionJob:
+    db.expire_all()
+    return db.get(IngestionJob, job_id)
+
+
+def test_claim_takes_highest_priority_runnable_job(db, chat_id):
+    repo = IngestionJobRepository(db)
+    low = create_job(db, chat_id, "drive.pdf", priority=0)
+    high = create_job(db, chat_id, "upload.pdf", priority=10)
+    later = create_job(db, chat_id, "later.pdf", priority=20)
+    backdate(db, later.id, run_after=datetime.now() + timedelta(minutes=5))
+
+    job = repo.claim_next("w1")
+    assert (job.id, job.status, job.locked_by, job.attempts) == (high.id, "processing", "w1", 1)
+    assert repo.claim_next("w2").id == low.id
+    assert repo.claim_next("w3") is None
+
+
+def test_claimed_job_is_not_handed_out_again(db, chat_id):
+    create_job(db, chat_id)
+    repo = IngestionJobRepository(db)
+    assert repo.claim_next("w1") is not None
+    assert repo.claim_next("w2") is None
+
+
+def test_failed_job_is_retried_with_growing_delay_until_max_attempts(db, chat_id):
+    repo = IngestionJobRepository(db)
+    job_id = create_job(db, chat_id, max_attempts=2).id
+
+    job = repo.claim_next("w1")
+    before = datetime.now()
+    assert repo.fail(job_id, "w1", job.attempts, "boom", 30 * job.attempts) == "queued"
+    job = reload(db, job_id)
+    assert (job.status, job.locked_by, job.error) == ("queued", None, "boom")
+    assert before + timedelta(seconds=30) <= job.run_after <= datetime.now() + timedelta(seconds=30)
+    assert repo.claim_next("w1") is None  # not runnable before its delay
+
+    backdate(db, job_id, run_after=datetime.now())
+    job = repo.claim_next("w2")
+    assert job.attempts == 2
+    assert repo.fail(job_id, "w2", 2, "boom again", 30 * 2) == "failed"
+    job = reload(db, job_id)
+    assert (job.status, job.error) == ("failed", "boom again")
+    assert job.finished_at is not None
+
+
+def test_non_retryable_failure_fails_on_first_attempt(db, chat_id):
+    repo = IngestionJobRepository(db)
+    job_id = create_job(db, chat_id, max_attempts=3).id
+    repo.claim_next("w1")
+    assert repo.fail(job_id, "w1", 1, "already in this chat", 30, retry=False) == "failed"
+    assert reload(db, job_id).attempts == 1
+
+
+def test_requeue_stale_recovers_expired_leases_only(db, chat_id):
+    repo = IngestionJobRepository(db)
+    stale_id = create_job(db, chat_id, "stale.pdf").id
+    fresh_id = create_job(db, chat_id, "fresh.pdf").id
+    spent_id = create_job(db, chat_id, "spent.pdf", max_attempts=1).id
+    download_id = create_job(db, chat_id, "download.pdf", status="downloading").id
+    for _ in range(3):
+        repo.claim_next("w1")
+    expired = datetime.now() - timedelta(seconds=LEASE_SECONDS + 1)
+    for job_id in (stale_id, spent_id, download_id):
+        backdate(db, job_id, updated_at=expired)
+
+    assert repo.requeue_stale(LEASE_SECONDS) == 1
+    assert reload(db, stale_id).status == "queued"
+    assert reload(db, stale_id).locked_by is None
+    assert reload(db, fresh_id).status == "processing"
+    assert reload(db, spent_id).status == "failed"
+    assert reload(db, download_id).status == "failed"
+
+
+def test_heartbeat_keeps_a_slow_job_leased(db, chat_id):
+    repo = IngestionJobRepository(db)
+    job_id = create_job(db, chat_id).id
+    repo.claim_next("w1")
+    backdate(db, job_id, updated_at=datetime.now() - timedelta(seconds=LEASE_SECONDS + 1))
+
+    assert repo.heartbeat(job_id, "w1", 1)
+    assert repo.requeue_stale(LEASE_SECONDS) == 0
+    assert reload(db, job_id).status == "processing"
+
+
+def test_worker_that_lost_its_lease_cannot_finish_or_fail_the_job(db, chat_id):
+    repo = IngestionJobRepository(db)
+    job_id = create_job(db, chat_id).id
+    repo.claim_next("slow")
+    backdate(db, job_id, updated_at=datetime.now() - timedelta(seconds=LEASE_SECONDS + 1))
+    repo.requeue_stale(LEASE_SECONDS)
+    assert repo.claim_next("fast").attempts == 2
+
+    assert not repo.heartbeat(job_id, "slow", 1)
+    assert not repo.finish(job_id, "slow", 1, chunks_added=5)
+    assert repo.fail(job_id, "slow", 1, "late failure", 0) is None
+    job = reload(db, job_id)
+    assert (job.status, job.locked_by, job.error) == ("processing", "fast", None)
+
+    assert repo.finish(job_id, "fast", 2, chunks_added=7)
+    job = reload(db, job_id)
+    assert (job.status, job.chunks_added, job.locked_by) == ("finished", 7, None)
+
+
+@pytest.mark.parametrize("name, mime_type, job_type", [
+    ("tender.pdf", "application/pdf", ingestion_service.JOB_TYPE_PDF),
+    ("scan", "application/pdf", ingestion_service.JOB_TYPE_PDF),
+    ("boq.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ingestion_service.JOB_TYPE_EXCEL),
+    ("rates.xlsm", "application/octet-stream", ingestion_service.JOB_TYPE_EXCEL),
+    ("notes", "application/vnd.google-apps.document", None),
+    ("site.jpg", "image/jpeg", None),
+    ("letter.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", None),
+])
+def test_drive_files_are_queued_only_when_ingestible(name, mime_type, job_type):
+    assert ingestion_service.drive_job_type(name, mime_type) == job_type
+
+
+@pytest.fixture
+def run_one_job(session_factory, monkeypatch):
+    """Run worker.job_loop until it has handled one job, with `handler(job, on_progress)` in place of handle_job."""
+    removed = []
+    monkeypatch.setattr(worker, "SessionLocal", session_factory)
+    monkeypatch.setattr(global_stores, "notify_job_changed", lambda *args: None)
+    monkeypatch.setattr(ingestion_service, "remove_upload", removed.append)
+
+    def run(handler):
+        stop = threading.Event()
+
+        def handle_job(job, on_progress):
+            stop.set()
+            return handler(job, on_progress)
+
+        monkeypatch.setattr(worker, "handle_job", handle_job)
+        worker.job_loop("w1", stop)
+        return removed
+
+    return run
+
+
+def test_job_loop_does_not_retry_permanent_errors(db, chat_id, run_one_job):
+    job_id = create_job(db, chat_id, payload={"file_path": "/uploads/a.pdf"}).id
+
+    def already_linked(job, on_progress):
+        raise ingestion_service.PermanentJobError("'a.pdf' is already in this chat.")
+
+    assert run_one_job(already_linked) == ["/uploads/a.pdf"]
+    job = reload(db, job_id)
+    assert (job.status, job.attempts, job.error) == ("failed", 1, "'a.pdf' is already in this chat.")
+
+
+def test_job_loop_retries_other_errors(db, chat_id, run_one_job):
+    job_id = create_job(db, chat_id, payload={"file_path": "/uploads/a.pdf"}).id
+
+    def flaky(job, on_progress):
+        raise RuntimeError("LlamaParse timed out")
+
+    assert run_one_job(flaky) == []
+    assert reload(db, job_id).status == "queued"
+
+
+def test_job_loop_keeps_the_upload_when_its_lease_was_lost(db, chat_id, run_one_job):
+    job_id = create_job(db, chat_id, payload={"file_path": "/uploads/a.pdf"}).id
+
+    def taken_over(job, on_progress):
+        # Meanwhile the reaper requeued the job and another worker claimed it
+        backdate(db, job_id, locked_by="other", attempts=2)
+        return 3
+
+    assert run_one_job(taken_over) == []
+    job = reload(db, job_id)
+    assert (job.status, job.locked_by) == ("processing", "other")
+
+
+def test_progress_is_only_written_while_the_lease_holds(db, chat_id, session_factory, monkeypatch):
+    monkeypatch.setattr(global_stores, "SessionLocal", session_factory)
+    monkeypatch.setattr(global_stores, "notify_job_changed", lambda *args: None)
+    repo = IngestionJobRepository(db)
+    job_id = create_job(db, chat_id).id
+    repo.claim_next("slow")
+    monkeypatch.setitem(global_stores.job_leases, str(job_id), ("slow", 1))
+
+    def report(progress):
+        global_stores.persist_progress_event(ProgressEvent(job_id=str(job_id), chat_id=str(chat_id), timestamp=0, progress=progress))
+
+    report(40)
+    assert reload(db, job_id).progress == 40
+
+    expired = datetime.now() - timedelta(seconds=LEASE_SECONDS + 1)
+    backdate(db, job_id, updated_at=expired)
+    repo.requeue_stale(LEASE_SECONDS)
+    repo.claim_next("fast")
+    backdate(db, job_id, progress=5, updated_at=expired)
+    report(80)
+    job = reload(db, job_id)
+    assert (job.progress, job.updated_at) == (5, expired)
+
+
+def test_job_loop_progress_is_fenced_by_lease(db, chat_id, run_one_job):
+    job_id = create_job(db, chat_id, job_type=ingestion_service.JOB_TYPE_DRIVE_SYNC).id
+    reported = []
+
+    def sync(job, on_progress):
+        reported.append(on_progress(50))
+        backdate(db, job_id, locked_by="other", attempts=2)
+        reported.append(on_progress(90))
+        return 0
+
+    run_one_job(sync)
+    assert reported == [True, False]
+    assert reload(db, job_id).progress == 50
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="set TEST_DATABASE_URL to a Postgres database to test SKIP LOCKED")
+def test_concurrent_claims_never_share_a_job():
+    engine = create_engine(os.environ["TEST_DATABASE_URL"])
+    tables = [Chat.__table__, IngestionJob.__table__]
+    Chat.metadata.create_all(engine, tables=tables)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    now = datetime.now()
+    chat_id = uuid.uuid4()
+    with Session() as session:
+        session.add(Chat(id=chat_id, title="SKIP LOCKED", created_at=now, updated_at=now, drive_folders=[]))
+        session.commit()
+        job_ids = {create_job(session, chat_id, f"{i}.pdf").id for i in range(40)}
+
+    claimed, lock = [], threading.Lock()
+
+    def claim_all(worker_id):
+        with Session() as session:
+            repo = IngestionJobRepository(session)
+            while job := repo.claim_next(worker_id):
+                with lock:
+                    claimed.append(job.id)
+
+    try:
+        threads = [threading.Thread(target=claim_all, args=(f"w{i}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(claimed) == sorted(job_ids)
+    finally:
+        with Session() as session:
+            session.execute(delete(IngestionJob).where(IngestionJob.chat_id == chat_id))
+            session.execute(delete(Chat).where(Chat.id == chat_id))
+            session.commit()
+        engine.dispose()